@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cost of error recovery per logical request (get setting) under different
+fault profiles. No hardware needed - simulated HW bridge is used.
+
+    $ python benchmarks/fault_recovery.py --requests 2000 --latency 0.001
+
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from concon.HW_bridge_uniprot import Bridge  # noqa: E402
+from concon.simulator import UniprotSimulator  # noqa: E402
+from concon.transport.faults import FaultInjectionTransport  # noqa: E402
+from concon.utils import ConConError  # noqa: E402
+
+timer = getattr(time, 'perf_counter', time.time)
+
+PROFILES = [
+    ("clean", {}),
+    ("drop 1%", {'drop': 0.01}),
+    ("corrupt 1%", {'corrupt': 0.01}),
+    ("duplicate 1%", {'duplicate': 0.01}),
+    ("reset 0.1%", {'reset': 0.001}),
+    ("delay 1%", {'delay': 0.01, 'delay_time': 0.005}),
+    ("mixed", {'drop': 0.005, 'corrupt': 0.005, 'duplicate': 0.005,
+               'reset': 0.0005}),
+]
+
+
+def make_model(num_of_settings):
+    settings = [{'name': "setting {0}".format(i),
+                 'descriptor': "Benchmark setting {0}".format(i),
+                 'in_type': 'uint16', 'in_min': 0, 'in_max': 1000,
+                 'value': i}
+                for i in range(num_of_settings)]
+    return {'devices': [{'descriptor': "Benchmark device", 'serial': 1,
+                         'settings': settings}]}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    index = int(math.ceil(fraction * len(sorted_values))) - 1
+    return sorted_values[max(0, index)]
+
+
+def run_profile(model, faults, args):
+    device = UniprotSimulator.from_model(
+        model, report_latency=args.latency,
+        processing_delay=args.processing_delay)
+    transport = FaultInjectionTransport(device, seed=args.seed, **faults)
+
+    # Initialization must pass -> try more times
+    bridge = None
+    for _ in range(10):
+        try:
+            bridge = Bridge(0, 0, args.timeout, transport=transport)
+            break
+        except ConConError:
+            try:
+                transport.close()
+            except ConConError:
+                pass
+    if bridge is None:
+        return None
+
+    max_cmd_id = bridge.device_metadata[0].max_cmd_id
+    reports = transport.tx_reports + transport.rx_reports
+    latencies = []
+    failures = 0
+    for i in range(args.requests):
+        start = timer()
+        try:
+            bridge.get_setting_from_device(0, i % (max_cmd_id + 1))
+        except ConConError:
+            failures += 1
+            continue
+        latencies.append(timer() - start)
+
+    reports = transport.tx_reports + transport.rx_reports - reports
+    bridge.close()
+
+    latencies.sort()
+    mean = sum(latencies) / len(latencies) if latencies else float('nan')
+    return {'mean': mean,
+            'p50': percentile(latencies, 0.50),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else float('nan'),
+            'reports': float(reports) / args.requests,
+            'failures': failures,
+            'injected': sum(transport.injected.values())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--settings', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Simulated time per report [s]")
+    parser.add_argument('--processing-delay', type=float, default=0.0,
+                        help="Simulated firmware processing time [s]")
+    parser.add_argument('--timeout', type=int, default=700,
+                        help="Uniprot time out [ms]")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Recovery paths log a lot on WARNING level
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    model = make_model(args.settings)
+    print("{0:<14} {1:>10} {2:>10} {3:>10} {4:>10} {5:>9} {6:>8} {7:>8}"
+          .format("profile", "mean [ms]", "p50 [ms]", "p99 [ms]",
+                  "max [ms]", "reports", "faults", "failed"))
+    for name, faults in PROFILES:
+        result = run_profile(model, faults, args)
+        if result is None:
+            print("{0:<14} initialization failed".format(name))
+            continue
+        print("{0:<14} {1:>10.3f} {2:>10.3f} {3:>10.3f} {4:>10.3f} "
+              "{5:>9.2f} {6:>8} {7:>8}".format(
+                  name, result['mean'] * 1000, result['p50'] * 1000,
+                  result['p99'] * 1000, result['max'] * 1000,
+                  result['reports'], result['injected'],
+                  result['failures']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Startup time of concon command line interface. Import time of every module
+is measured by ``python -X importtime`` (Python 3.7+), whole invocation by
+wall clock. No device needed.
+
+    $ python benchmarks/startup.py --runs 20 --top 15
+
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+timer = getattr(time, 'perf_counter', time.time)
+
+# import time: self [us] | cumulative | imported package
+IMPORTTIME_LINE = re.compile(
+    r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)')
+
+COMMANDS = [
+    ("import concon.cli", ['-c', 'import concon.cli']),
+    ("concon --version", ['-m', 'concon.cli', '--version']),
+    ("concon --help", ['-m', 'concon.cli', '--help']),
+    ("concon read --help", ['-m', 'concon.cli', 'read', '--help']),
+]
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def run(args, importtime=False):
+    """ Run Python with given arguments.
+
+    :return: (wall time [s], stderr)
+    """
+    command = [sys.executable] + (['-X', 'importtime'] if importtime
+                                  else []) + args
+    start = timer()
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    _, stderr = process.communicate()
+    elapsed = timer() - start
+    if process.returncode != 0:
+        raise RuntimeError("{0} failed:\n{1}".format(
+            " ".join(command), stderr.decode('utf-8', 'replace')))
+    return elapsed, stderr.decode('utf-8', 'replace')
+
+
+def parse_importtime(output):
+    """ :return: Dictionary module: (self [us], cumulative [us]) """
+    modules = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)),
+                                       int(match.group(2)))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--runs', type=int, default=10,
+                        help="Invocations of every command")
+    parser.add_argument('--top', type=int, default=10,
+                        help="Number of slowest imports listed")
+    args = parser.parse_args()
+
+    if sys.version_info < (3, 7):
+        parser.error("-X importtime requires Python 3.7 or newer")
+
+    print("{0:<22} {1:>12} {2:>12}".format("command", "median [ms]",
+                                           "min [ms]"))
+    for name, command in COMMANDS:
+        times = [run(command)[0] for _ in range(args.runs)]
+        print("{0:<22} {1:>12.1f} {2:>12.1f}".format(
+            name, median(times) * 1000, min(times) * 1000))
+
+    # Import time of every module (median of all runs)
+    samples = {}
+    for _ in range(args.runs):
+        modules = parse_importtime(run(COMMANDS[0][1], importtime=True)[1])
+        for module, times in modules.items():
+            samples.setdefault(module, []).append(times)
+
+    print("\nSlowest imports of concon.cli (self / cumulative [ms]):")
+    slowest = sorted(samples.items(),
+                     key=lambda item: -median([t[0] for t in item[1]]))
+    for module, times in slowest[:args.top]:
+        print("  {0:<48} {1:>8.1f} {2:>8.1f}".format(
+            module, median([t[0] for t in times]) / 1000.0,
+            median([t[1] for t in times]) / 1000.0))
+
+    heavy = [module for module in ('pkg_resources', 'yaml', 'usb')
+             if module in samples]
+    print("\nHeavy modules imported by concon.cli: {0}".format(
+        ", ".join(heavy) or "none"))
+
+
+if __name__ == '__main__':
+    main()
@@ -24,7 +24,8 @@ Functions for higher layer:
 """
 
 from .uniprot import *
-from .core import ConConError
+from .utils import ConConError
+from .scheduler import RequestScheduler
 
 # For binary operation
 import struct
@@ -32,6 +33,13 @@ import struct
 # For python version detection
 import sys
 
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 ##
 # @brief Get logging variable
 logger = logging.getLogger('Bridge HW <---> uniprot')
@@ -149,12 +157,64 @@ class BridgeMetadata(object):
             .format(self.descriptor, self.serial, self.max_cmd_id)
 
 
+class _SettingDecoder(object):
+    """ Worker thread decoding downloaded settings.
+
+    I/O thread only puts raw responses to the queue and continues with next
+    request, so host side processing is hidden behind USB latency.
+    """
+
+    def __init__(self, bridge, decoded, on_setting=None):
+        self._bridge = bridge
+        self._decoded = decoded
+        self._on_setting = on_setting
+        self._queue = queue.Queue()
+        self._error = None
+
+        self._thread = threading.Thread(target=self._run,
+                                        name="Bridge setting decoder")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, i_device_id, i_cmd_id, i_rx_buffer):
+        self._queue.put((i_device_id, i_cmd_id, i_rx_buffer))
+
+    def stop(self):
+        """ Process all queued responses and stop worker thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def check_error(self):
+        """ Re-raise exception from post-processing (if any)."""
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            # After first failure only drain the queue
+            if self._error is not None:
+                continue
+
+            try:
+                self._bridge._store_setting(self._decoded, item[0], item[1],
+                                            item[2], self._on_setting)
+            except Exception as e:
+                self._error = e
+
+
 class Bridge(object):
     MAX_RETRY_CNT = 3
 
     # In some cases should be defined maximum size of RX buffer
     MAX_RX_BUFFER_BYTES = 65530
 
+    # Number of requests sent in one scheduler slot (protocol v2)
+    SCHEDULER_CHUNK = 16
+
     # Following constants must be same as in firmware (HW_bridge_uniprot)
     STATE_WAITING_FOR_REQUEST = 0
     STATE_REQUEST_GET_SETTING = 1
@@ -165,11 +225,39 @@ class Bridge(object):
     STATE_SEND_RETURN_CODE_AND_METADATA = 6
     STATE_SEND_RETURN_CODE_AND_SETTING = 7
 
-    def __init__(self, vid, pid, timeout, progress_bar=None):
+    def __init__(self, vid, pid, timeout, progress_bar=None, trace=None,
+                 pipelined=True, on_setting=None,
+                 protocol_version=Uniprot.UNI_PROTOCOL_V1,
+                 window=Uniprot.UNI_DEFAULT_WINDOW, piggyback_ack=False,
+                 transport=None, scheduler=None, download_settings=True):
         """ Connect to the target device if possible.
 
         :param vid:  USB VID
         :param pid:  USB PID
+        :param trace: Optional :class:`~concon.wire_trace.WireTrace` for raw
+                      reports.
+        :param pipelined: Decode downloaded settings in worker thread
+                          meanwhile next request is on the wire.
+        :param on_setting: Optional callback(DID, CMD ID, setting) called
+                           for every decoded setting (from worker thread
+                           when pipelined). Use for higher layer
+                           post-processing.
+        :param protocol_version: Highest Uniprot protocol version to
+                                 negotiate. With protocol v2 settings are
+                                 downloaded with more outstanding requests.
+        :param window: Maximum number of outstanding requests (protocol v2).
+        :param piggyback_ack: Try to negotiate piggybacked ACKs (protocol
+                              v1). ACK of response is then sent as part of
+                              the next request.
+        :param transport: Optional :class:`~concon.transport.Transport`
+                          instance. USB device with given VID/PID is used
+                          by default.
+        :param scheduler: Optional :class:`~concon.scheduler.RequestScheduler`
+                          deciding order of requests from more threads.
+        :param download_settings: Download all settings to RAM. When False,
+                                  only metadata are downloaded and settings
+                                  are requested when used (see
+                                  :meth:`load_settings`).
         """
         self.vid = vid  # USB VendorID
         self.pid = pid  # USB ProductID
@@ -177,10 +265,24 @@ class Bridge(object):
         # Number of detected devices (-1 -> error -> so far none)
         self.i_num_of_devices = -1
         self._uniprot = None
+        self._trace = trace
+        self._scheduler = scheduler or RequestScheduler()
+        # Settings requested when used (all settings are not in RAM),
+        # indexed by (DID, CMD ID)
+        self._used_settings = {}
+
+        features = 0
+        if piggyback_ack:
+            features |= Uniprot.UNI_FEATURE_PIGGYBACK_ACK
 
         try:
             logger.debug("[__init__] Trying initialize uniprot")
-            self._uniprot = Uniprot(self.vid, self.pid, timeout=timeout)
+            self._uniprot = Uniprot(self.vid, self.pid, timeout=timeout,
+                                    trace=trace,
+                                    protocol_version=protocol_version,
+                                    window=window,
+                                    features=features,
+                                    transport=transport)
             logger.debug("[__init__] Getting num. of devices")
             self.get_number_of_devices_from_device()
 
@@ -233,11 +335,29 @@ class Bridge(object):
 
         # Show devices thru saved metadata
         for i in range(self.i_num_of_devices + 1):
-            logger.info("[__init__]" + str(self.s_metadata[i]))
+            logger.info("[__init__]%s", self.s_metadata[i])
 
         # Load actual configuration from device to RAM
         self.s_settings_in_RAM = []
-
+        if download_settings:
+            with self._scheduler.priority(RequestScheduler.BULK):
+                self.load_settings(progress_bar, pipelined, on_setting)
+
+    def load_settings(self, progress_bar=None, pipelined=True,
+                      on_setting=None):
+        """ Download all settings of all devices to RAM (see
+        :attr:`all_settings`). Called by constructor, call it again when
+        settings could be changed by someone else (firmware, other host).
+
+        :param progress_bar: Optional progress bar (``length`` and
+                             ``update()``).
+        :param pipelined: Decode settings in worker thread.
+        :param on_setting: Optional callback(DID, CMD ID, setting).
+
+        Device is held only for one setting (or chunk of settings with
+        protocol v2) at a time, so requests with higher priority
+        (see :attr:`scheduler`) are not blocked by the whole download.
+        """
         # Optional progressbar update
         if progress_bar:
             total_length = 0
@@ -245,61 +365,121 @@ class Bridge(object):
                 total_length += self.s_metadata[i_DID].max_cmd_id + 1
             progress_bar.length = total_length
 
-        # Go thru all devices
-        for i_DID in range(self.i_num_of_devices + 1):
-            # Thru all commands
-
-            temp = []
-            for i_CMD_ID in range(self.s_metadata[i_DID].max_cmd_id + 1):
-                try:
-                    logger.debug("[__init__] Trying to get setting from device"
-                                 "{0} (CMD: {1})".format(i_DID, i_CMD_ID))
-                    temp.append(
-                        self.get_setting_from_device(i_DID, i_CMD_ID))
-
-                    if progress_bar:
-                        progress_bar.update(1)
-
-                # And check all exceptions
-                except BridgeDeviceNotFound as e:
-                    logger.error("[__init__][Get setting]" + str(e))
-                    raise BridgeDeviceNotFound("[Get setting]"
-                                               + str(e))
+        # Decoded settings indexed by (DID, CMD ID)
+        decoded = {}
 
-                except BridgeDeviceRxBufferOverflow as e:
-                    logger.error("[__init__][Get setting]" + str(e))
-                    raise BridgeDeviceRxBufferOverflow(
-                        "[Get metadata]" + str(e))
+        # When pipelined, responses are decoded by worker thread meanwhile
+        # this thread already sends next request. Requests are still sent
+        # one by one, so uniprot ordering is not affected.
+        decoder = None
+        if pipelined:
+            decoder = _SettingDecoder(self, decoded, on_setting)
 
-                except BridgeNackFail as e:
-                    logger.critical("[__init__][Get setting]" + str(e))
-                    raise BridgeNackFail("[Get setting]" + str(e))
-
-                except BridgeResetFail as e:
-                    logger.critical("[__init__][Get setting]" + str(e))
-                    raise BridgeResetFail("[Get setting]" + str(e))
+        try:
+            # Go thru all devices
+            for i_DID in range(self.i_num_of_devices + 1):
+                cmd_ids = range(self.s_metadata[i_DID].max_cmd_id + 1)
+
+                # With protocol v2 more requests are on the wire at once
+                responses = None
+                if self.windowed:
+                    responses = self.send_requests_get_data(
+                        [self._get_setting_request(i_DID, i_CMD_ID)
+                         for i_CMD_ID in cmd_ids])
+
+                # Thru all commands
+                for i_CMD_ID in cmd_ids:
+                    try:
+                        logger.debug("[__init__] Trying to get setting from"
+                                     " device %s (CMD: %s)", i_DID, i_CMD_ID)
+                        if responses is None:
+                            i_rx_buffer = self.get_raw_setting_from_device(
+                                i_DID, i_CMD_ID)
+                        else:
+                            i_rx_buffer = self._check_setting_response(
+                                next(responses), i_DID, i_CMD_ID)
+
+                        if progress_bar:
+                            progress_bar.update(1)
+
+                    # And check all exceptions
+                    except BridgeDeviceNotFound as e:
+                        logger.error("[__init__][Get setting]" + str(e))
+                        raise BridgeDeviceNotFound("[Get setting]"
+                                                   + str(e))
+
+                    except BridgeDeviceRxBufferOverflow as e:
+                        logger.error("[__init__][Get setting]" + str(e))
+                        raise BridgeDeviceRxBufferOverflow(
+                            "[Get metadata]" + str(e))
+
+                    except BridgeNackFail as e:
+                        logger.critical("[__init__][Get setting]" + str(e))
+                        raise BridgeNackFail("[Get setting]" + str(e))
+
+                    except BridgeResetFail as e:
+                        logger.critical("[__init__][Get setting]" + str(e))
+                        raise BridgeResetFail("[Get setting]" + str(e))
+
+                    except Exception as e:
+                        logger.error("[__init__][Get setting] " + str(e))
+                        continue
+
+                    if decoder:
+                        decoder.put(i_DID, i_CMD_ID, i_rx_buffer)
+                    else:
+                        self._store_setting(decoded, i_DID, i_CMD_ID,
+                                            i_rx_buffer, on_setting)
 
-                except Exception as e:
-                    logger.error("[__init__][Get setting] " + str(e))
+                    # If OK, then show info
+                    logger.info("[__init__][Get setting] "
+                                "Get setting from DID: %s | CMD ID: %s OK\n",
+                                i_DID, i_CMD_ID)
+        finally:
+            if decoder:
+                decoder.stop()
 
-                # If OK, then show info
-                logger.info("[__init__][Get setting] "
-                            "Get setting from DID: " + str(i_DID) +
-                            " | CMD ID: " + str(i_CMD_ID) + " OK\n")
+        if decoder:
+            decoder.check_error()
 
-            self.s_settings_in_RAM.append(temp)
+        settings = []
+        for i_DID in range(self.i_num_of_devices + 1):
+            settings.append(
+                [decoded[(i_DID, i_CMD_ID)] for i_CMD_ID
+                 in range(self.s_metadata[i_DID].max_cmd_id + 1)
+                 if (i_DID, i_CMD_ID) in decoded])
+        self.s_settings_in_RAM = settings
 
         for i_DID in range(self.i_num_of_devices + 1):
             for i_CMD_ID in range(self.s_metadata[i_DID].max_cmd_id + 1):
-                logger.debug("DID: " + str(i_DID) + " | CMD: "
-                             + str(i_CMD_ID) + "\n" +
-                             str(self.s_settings_in_RAM[i_DID][i_CMD_ID]))
+                logger.debug("DID: %s | CMD: %s\n%s", i_DID, i_CMD_ID,
+                             self.s_settings_in_RAM[i_DID][i_CMD_ID])
+
+    def _store_setting(self, decoded, i_device_id, i_cmd_id, i_rx_buffer,
+                       on_setting=None):
+        """ Decode raw setting, store it and run optional post-processing.
+
+        Decoding errors are only logged (same as when setting can not be
+        downloaded).
+        """
+        try:
+            setting = self.decode_setting(i_rx_buffer)
+        except Exception as e:
+            logger.error("[__init__][Decode setting] " + str(e))
+            return
+
+        decoded[(i_device_id, i_cmd_id)] = setting
+
+        if on_setting is not None:
+            on_setting(i_device_id, i_cmd_id, setting)
 
     def close(self):
         """ Close device (stop using USB interface).
         """
         try:
-            self._uniprot.close()
+            # Wait for request of other thread
+            with self._scheduler.slot():
+                self._uniprot.close()
             logger.info("[close] Device closed")
         except UniprotExceptionDeviceNotFound as e:
             # Even if this exception occurs, program can re-initialize device
@@ -380,14 +560,102 @@ class Bridge(object):
                       ")\n"
             logger.error(message)
 
+    @property
+    def windowed(self):
+        """ True when more requests can be outstanding (protocol v2)."""
+        return self._uniprot.protocol_version >= Uniprot.UNI_PROTOCOL_V2
+
+    def send_requests_get_data(self, tx_buffers):
+        """ Send more requests and get responses (protocol v2).
+
+        Up to window requests are outstanding. When reset occurs, requests
+        which were not answered yet are sent again. Device is held by
+        scheduler for :attr:`SCHEDULER_CHUNK` requests at a time.
+
+        :param tx_buffers: List of data to send.
+        :return: Generator of received data (same order as requests).
+        """
+        tx_buffers = list(tx_buffers)
+        chunk = Bridge.SCHEDULER_CHUNK
+
+        for i_start in range(0, len(tx_buffers), chunk):
+            with self._scheduler.slot():
+                responses = self._transfer_window(
+                    tx_buffers[i_start:i_start + chunk])
+            for i_rx_buffer in responses:
+                yield i_rx_buffer
+
+    def _transfer_window(self, tx_buffers):
+        """ Send requests with more outstanding ones.
+
+        :return: List of received data
+        """
+        i_retry_cnt = 0
+        rx_buffers = []
+
+        while len(rx_buffers) < len(tx_buffers):
+            try:
+                with self._uniprot.lock:
+                    for i_rx_buffer in self._uniprot.usb_transfer_window(
+                            tx_buffers[len(rx_buffers):]):
+                        rx_buffers.append(i_rx_buffer)
+
+            except UniprotExceptionDeviceNotFound as e:
+                logger.error("[send_requests_get_data]" + str(e))
+                raise BridgeDeviceNotFound("[Uniprot transfer]" + str(e))
+
+            except UniprotExceptionNackFail as e:
+                logger.critical("[send_requests_get_data]" + str(e))
+                raise BridgeNackFail("[Uniprot transfer]" + str(e))
+
+            except UniprotExceptionRxBufferOverflow as e:
+                logger.critical("[send_requests_get_data]" + str(e))
+                raise BridgeDeviceRxBufferOverflow("[Uniprot transfer]"
+                                                   + str(e))
+
+            except UniprotExceptionResetSuccess as e:
+                logger.warn("[send_requests_get_data]" + str(e))
+                # Wait until 5 dummy time-out packets received
+                self._uniprot.usb_clear_rx_buffer(5)
+
+                i_retry_cnt = i_retry_cnt + 1
+                if i_retry_cnt > Bridge.MAX_RETRY_CNT:
+                    logger.critical("[send_requests_get_data]"
+                                    " Reset retry count reach maximum.\n")
+                    raise BridgeResetFail("Reset retry count reach maximum"
+                                          " (transfer).\n")
+        return rx_buffers
+
     def send_request_get_data(self, i_tx_buffer):
         """ Send request and get response.
 
         TX packet and RX packet must be configured before call this function
+        (see :meth:`_transact`).
 
         :param i_tx_buffer:  Data to send.
         :return:  received data.
         """
+        if self.windowed:
+            return list(self.send_requests_get_data([i_tx_buffer]))[0]
+
+        with self._scheduler.slot():
+            with self._uniprot.lock:
+                return self._send_request_get_data(i_tx_buffer)
+
+    def _transact(self, i_tx_buffer, i_rx_max_bytes):
+        """ Configure TX and RX packet (only for this request) and send
+        request. Device is not given to other thread meanwhile.
+
+        :param i_tx_buffer:  Data to send.
+        :param i_rx_max_bytes: Maximum number of received Bytes.
+        :return:  received data.
+        """
+        with self._scheduler.slot():
+            with self._uniprot.transaction(len(i_tx_buffer), i_rx_max_bytes):
+                return self.send_request_get_data(i_tx_buffer)
+
+    def _send_request_get_data(self, i_tx_buffer):
+
         # Reset retry count
         i_retry_cnt = 0
 
@@ -405,7 +673,7 @@ class Bridge(object):
             while True:
                 if i_retry_cnt > 0:
                     logger.warn("[send_request_get_data][Uniprot TX data]"
-                                " Retry count: " + str(i_retry_cnt) + "\n")
+                                " Retry count: %s\n", i_retry_cnt)
                 try:
                     # Try to send request
                     status = self._uniprot.usb_tx_data(i_tx_buffer)
@@ -452,7 +720,7 @@ class Bridge(object):
                     break
 
             logger.debug("[send_request_get_data]"
-                         " Request status: " + status + "\n")
+                         " Request status: %s\n", status)
 
             # Secondary loop - try RX data
 
@@ -460,7 +728,7 @@ class Bridge(object):
             while True:
                 if i_retry_cnt > 0:
                     logger.warn("[send_request_get_data][Uniprot RX data]"
-                                " Retry count: " + str(i_retry_cnt) + "\n")
+                                " Retry count: %s\n", i_retry_cnt)
                 try:
                     i_rx_buffer = self._uniprot.usb_rx_data()
                 except UniprotExceptionDeviceNotFound as e:
@@ -515,14 +783,9 @@ class Bridge(object):
         # Bridge command (request number)
         i_tx_buffer[1] = Bridge.STATE_REQUEST_GET_NUM_OF_DEV
 
-        # Configure TX packet
-        self._uniprot.config_tx_packet(2)
-
-        # Configure RX packet (expect 3B)
-        self._uniprot.config_rx_packet(3)
-
         try:
-            i_rx_buffer = self.send_request_get_data(i_tx_buffer)
+            # Configure TX and RX packet and send request
+            i_rx_buffer = self._transact(i_tx_buffer, 3)
         except BridgeDeviceNotFound as e:
             message = "[send_request_get_data]" + str(e)
             logger.error("[get_number_of_devices_from_device]" + message)
@@ -592,14 +855,10 @@ class Bridge(object):
         # Bridge command (request ID)
         i_tx_buffer[1] = Bridge.STATE_REQUEST_GET_METADATA
 
-        # Configure TX packet
-        self._uniprot.config_tx_packet(2)
-
-        # Configure RX packet
-        self._uniprot.config_rx_packet(Bridge.MAX_RX_BUFFER_BYTES)
-
         try:
-            i_rx_buffer = self.send_request_get_data(i_tx_buffer)
+            # Configure TX and RX packet and send request
+            i_rx_buffer = self._transact(i_tx_buffer,
+                                         Bridge.MAX_RX_BUFFER_BYTES)
         except BridgeDeviceNotFound as e:
             message = "[send_request_get_data]" + str(e)
             logger.error("[get_metadata_from_device]" + message)
@@ -683,8 +942,54 @@ class Bridge(object):
 
     # Try to get setting (one) from device
     def get_setting_from_device(self, i_device_id, i_cmd_id):
-        from .structs import SettingStruct
+        return self.decode_setting(
+            self.get_raw_setting_from_device(i_device_id, i_cmd_id))
+
+    def get_raw_setting_from_device(self, i_device_id, i_cmd_id):
+        """ Request setting from device and check response header.
+
+        Response is not decoded (see :meth:`decode_setting`), so decoding
+        can be done meanwhile next request is on the wire.
+
+        :param i_device_id: Device ID
+        :param i_cmd_id: Command ID
+        :return: Received data (raw)
+        """
+        i_tx_buffer = self._get_setting_request(i_device_id, i_cmd_id)
 
+        try:
+            # Configure TX and RX packet and send request
+            i_rx_buffer = self._transact(i_tx_buffer,
+                                         Bridge.MAX_RX_BUFFER_BYTES)
+        except BridgeDeviceNotFound as e:
+            message = "[send_request_get_data]" + str(e)
+            logger.error("[get_setting_from_device]" + message)
+            raise BridgeDeviceNotFound(message)
+
+        except BridgeNackFail as e:
+            message = "[send_request_get_data]" + str(e)
+            logger.error("[get_setting_from_device]" + message)
+            raise BridgeNackFail(message)
+
+        except BridgeDeviceRxBufferOverflow as e:
+            message = "[send_request_get_data]" + str(e)
+            logger.error("[get_setting_from_device]" + message)
+            raise BridgeDeviceRxBufferOverflow(message)
+
+        except BridgeResetFail as e:
+            message = "[send_request_get_data]" + str(e)
+            logger.error("[get_setting_from_device]" + message)
+            raise BridgeResetFail(message)
+
+        return self._check_setting_response(i_rx_buffer, i_device_id,
+                                            (i_tx_buffer[2] << 8) +
+                                            i_tx_buffer[3])
+
+    def _get_setting_request(self, i_device_id, i_cmd_id):
+        """ Check parameters and create get setting request.
+
+        :return: Data to send (TX buffer)
+        """
         # Check if Device ID is valid
         if i_device_id > self.i_num_of_devices:
             message = " Invalid Device ID. "
@@ -735,34 +1040,13 @@ class Bridge(object):
         i_tx_buffer[2] = i_cmd_id >> 8
         i_tx_buffer[3] = i_cmd_id & 0xFF
 
-        # Configure TX packet
-        self._uniprot.config_tx_packet(4)
-
-        # Configure RX packet
-        self._uniprot.config_rx_packet(Bridge.MAX_RX_BUFFER_BYTES)
-
-        try:
-            i_rx_buffer = self.send_request_get_data(i_tx_buffer)
-        except BridgeDeviceNotFound as e:
-            message = "[send_request_get_data]" + str(e)
-            logger.error("[get_setting_from_device]" + message)
-            raise BridgeDeviceNotFound(message)
-
-        except BridgeNackFail as e:
-            message = "[send_request_get_data]" + str(e)
-            logger.error("[get_setting_from_device]" + message)
-            raise BridgeNackFail(message)
-
-        except BridgeDeviceRxBufferOverflow as e:
-            message = "[send_request_get_data]" + str(e)
-            logger.error("[get_setting_from_device]" + message)
-            raise BridgeDeviceRxBufferOverflow(message)
+        return i_tx_buffer
 
-        except BridgeResetFail as e:
-            message = "[send_request_get_data]" + str(e)
-            logger.error("[get_setting_from_device]" + message)
-            raise BridgeResetFail(message)
+    def _check_setting_response(self, i_rx_buffer, i_device_id, i_cmd_id):
+        """ Check header of get setting response.
 
+        :return: Received data (unchanged)
+        """
         # Test if received DID is same
         if i_rx_buffer[0] != i_device_id:
             # This should not happen.
@@ -797,7 +1081,17 @@ class Bridge(object):
             logger.critical("[get_setting_from_device]" + message)
             raise BridgeError(message)
 
-        # Else all seems to be OK -> fill structure
+        return i_rx_buffer
+
+    def decode_setting(self, i_rx_buffer):
+        """ Convert raw response of get setting request to the structure.
+
+        :param i_rx_buffer: Raw data returned by
+                            :meth:`get_raw_setting_from_device`
+        :return: :class:`~concon.structs.SettingStruct`
+        """
+        from .structs import SettingStruct
+
         rx_config = SettingStruct()
 
         # Index for rx_buffer - begin at 4
@@ -934,6 +1228,12 @@ class Bridge(object):
         :param i_value:
         :return:
         """
+        # Write and read back is one request for other threads
+        with self._scheduler.slot():
+            return self._set_setting_to_device(i_device_id, i_cmd_id,
+                                               i_value)
+
+    def _set_setting_to_device(self, i_device_id, i_cmd_id, i_value):
         # Check Device ID
         if i_device_id > self.i_num_of_devices:
             message = " Invalid Device ID. "
@@ -971,7 +1271,7 @@ class Bridge(object):
             i_cmd_id = i_cmd_id & 0xFFFF
 
         # According to data type convert data
-        data_type = self.s_settings_in_RAM[i_device_id][i_cmd_id].in_type
+        data_type = self.get_setting(i_device_id, i_cmd_id).in_type
 
         # GROUP TYPE
         if data_type == DataTypes.GROUP:
@@ -1055,8 +1355,7 @@ class Bridge(object):
                       "code :/ This never should happen."
                 logger.critical(msg)
 
-        logger.debug("[set_setting_to_device] Value to send: {0}".format(
-            i_value))
+        logger.debug("[set_setting_to_device] Value to send: %s", i_value)
 
         # Fill TX buffer by zeros
         i_tx_buffer = [0x00] * 8
@@ -1073,14 +1372,10 @@ class Bridge(object):
         i_tx_buffer[6] = (i_value >> 8) & 0xFF
         i_tx_buffer[7] = i_value & 0xFF
 
-        # Configure TX packet
-        self._uniprot.config_tx_packet(8)
-
-        # Configure RX packet
-        self._uniprot.config_rx_packet(Bridge.MAX_RX_BUFFER_BYTES)
-
         try:
-            i_rx_buffer = self.send_request_get_data(i_tx_buffer)
+            # Configure TX and RX packet and send request
+            i_rx_buffer = self._transact(i_tx_buffer,
+                                         Bridge.MAX_RX_BUFFER_BYTES)
         except BridgeDeviceNotFound as e:
             message = "[send_request_get_data]" + str(e)
             logger.error("[set_setting_to_device]" + message)
@@ -1120,7 +1415,7 @@ class Bridge(object):
                        "  CMD: {3}  (CMD ID: {4})\n".format(
                         dev_code, self.s_metadata[i_device_id].descriptor,
                         i_device_id,
-                        self.s_settings_in_RAM[i_device_id][i_cmd_id].name,
+                        self.get_setting(i_device_id, i_cmd_id).name,
                         i_cmd_id))
             logger.warning("[set_setting_to_device]" + message)
             raise BridgeError(message)
@@ -1128,8 +1423,9 @@ class Bridge(object):
         # Setting was set, but program should update value -> call
         # get_setting_from_device and update data in RAM
         try:
-            self.s_settings_in_RAM[i_device_id][i_cmd_id] = \
-                self.get_setting_from_device(i_device_id, i_cmd_id)
+            self.update_setting(
+                i_device_id, i_cmd_id,
+                self.get_setting_from_device(i_device_id, i_cmd_id))
         except BridgeDeviceNotFound as e:
             message = "[get_setting_from_device]" + str(e)
             logger.error("[set_setting_to_device]" + message)
@@ -1153,6 +1449,47 @@ class Bridge(object):
         # If no exception occurred -> return result code as text
         return ResCodes.code_to_string(i_rx_buffer[1])
 
+    def get_setting(self, i_device_id, i_cmd_id):
+        """ Setting from RAM. When settings were not downloaded, it is
+        requested from device now (and kept).
+
+        :return: :class:`~concon.structs.SettingStruct`
+        """
+        settings = self.s_settings_in_RAM
+        if i_device_id < len(settings) and \
+                i_cmd_id < len(settings[i_device_id]):
+            return settings[i_device_id][i_cmd_id]
+
+        key = (i_device_id, i_cmd_id)
+        if key not in self._used_settings:
+            self._used_settings[key] = self.get_setting_from_device(
+                i_device_id, i_cmd_id)
+        return self._used_settings[key]
+
+    def update_setting(self, i_device_id, i_cmd_id, setting):
+        """ Keep setting read from device (e.g. when settings were not
+        downloaded), so :meth:`set_setting_to_device` does not ask for it
+        again.
+        """
+        settings = self.s_settings_in_RAM
+        if i_device_id < len(settings) and \
+                i_cmd_id < len(settings[i_device_id]):
+            settings[i_device_id][i_cmd_id] = setting
+        else:
+            self._used_settings[(i_device_id, i_cmd_id)] = setting
+
+    @property
+    def scheduler(self):
+        """ :class:`~concon.scheduler.RequestScheduler` of this bridge
+        """
+        return self._scheduler
+
+    @property
+    def trace(self):
+        """ Wire trace (:class:`~concon.wire_trace.WireTrace`) or None
+        """
+        return self._trace
+
     @property
     def device_metadata(self):
         """ Metadata of all devices as variable
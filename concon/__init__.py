@@ -3,8 +3,20 @@
 using the uniprot control protocol.
 """
 
-from .core import ConCon
+import sys
 
 __author__ = """Martin Stejskal"""
 __email__ = 'mstejskal@alps.cz'
 __version__ = '0.9.8'
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        # Importing core loads USB driver and whole bridge stack. It is
+        # imported when used, so "import concon.x" stays cheap.
+        if name == 'ConCon':
+            from .core import ConCon  # noqa: F811
+            return ConCon
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(
+            __name__, name))
+else:
+    from .core import ConCon  # noqa: F401
@@ -0,0 +1,585 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.agent
+    :synopsis: Serve local device to remote concon clients over TCP.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Agent owns the device through :class:`~concon.HW_bridge_uniprot.Bridge` and
+executes batches of operations sent by :class:`RemoteBridge`. Whole batch is
+one network round trip, so e.g. full configuration of the device costs only
+one request/response pair.
+
+.. code-block:: python
+
+     # Test rack host
+     agent = BridgeAgent(bridge, ('0.0.0.0', DEFAULT_PORT))
+     agent.serve_forever()
+
+     # Central server
+     remote = RemoteBridge(('rack-07', DEFAULT_PORT))
+     setting = remote.get_setting_from_device(0, 3)
+
+     batch = remote.batch()
+     for cmd_id, value in changes:
+         batch.set(0, cmd_id, value)
+     results = batch.execute()
+
+Messages are prefixed by header (big endian)::
+
+    length of payload (4B), codec (1B: 'M' - msgpack, 'J' - JSON), payload
+
+`msgpack <https://pypi.org/project/msgpack/>`_ is used when installed on both
+sides, otherwise JSON. Agent replies with the codec used by client.
+
+Request payload is ``{"ops": [[name, arg, ...], ...]}``, response payload is
+``{"results": [[0, value] | [1, error type, message], ...]}``.
+"""
+
+import json
+import logging
+import socket
+import struct
+import threading
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from .HW_bridge_uniprot import BridgeMetadata, BridgeException, \
+    BridgeDeviceNotFound, BridgeDeviceReconnect, \
+    BridgeDeviceRxBufferOverflow, BridgeNackFail, BridgeResetFail, \
+    BridgeError
+from .utils import ConConError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 5740
+
+_HEADER = struct.Struct('>IB')
+CODEC_JSON = ord('J')
+CODEC_MSGPACK = ord('M')
+
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+""" Larger messages are refused (protects agent from garbage)."""
+
+SETTING_FIELDS = ('name', 'descriptor', 'in_type', 'in_min', 'in_max',
+                  'out_type', 'out_min', 'out_max', 'out_value')
+METADATA_FIELDS = ('descriptor', 'serial', 'max_cmd_id')
+
+# Exceptions which are re-raised on client side with the same type
+_REMOTE_EXCEPTIONS = dict(
+    (cls.__name__, cls) for cls in (
+        BridgeException, BridgeDeviceNotFound, BridgeDeviceReconnect,
+        BridgeDeviceRxBufferOverflow, BridgeNackFail, BridgeResetFail,
+        BridgeError))
+
+
+class AgentException(ConConError):
+    pass
+
+
+class AgentProtocolError(AgentException):
+    """ Invalid message received."""
+    pass
+
+
+class RemoteBridgeError(AgentException):
+    """ Operation failed on agent side (error without local equivalent)."""
+    pass
+
+
+def encode_message(obj, codec=None):
+    """ Serialize message including header.
+
+    :param obj: Message (dict/list of basic types).
+    :param codec: :data:`CODEC_MSGPACK` or :data:`CODEC_JSON`. Default is
+                  msgpack when available.
+    """
+    if codec is None:
+        codec = CODEC_MSGPACK if msgpack is not None else CODEC_JSON
+
+    if codec == CODEC_MSGPACK:
+        payload = msgpack.packb(obj, use_bin_type=True)
+    else:
+        payload = json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    return _HEADER.pack(len(payload), codec) + payload
+
+
+def decode_payload(payload, codec):
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise AgentProtocolError("Message is encoded by msgpack, but "
+                                     "msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    if codec == CODEC_JSON:
+        return json.loads(payload.decode('utf-8'))
+    raise AgentProtocolError("Unknown codec {0}".format(codec))
+
+
+def _recv_exactly(sock, size):
+    """ Receive exactly size Bytes. Return None when connection is closed
+    before first Byte.
+    """
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 65536))
+        if not chunk:
+            if remaining == size:
+                return None
+            raise AgentProtocolError("Connection closed in the middle "
+                                     "of message")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    """ Receive one message.
+
+    :return: (message, codec) or (None, None) when connection was closed.
+    """
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None, None
+    length, codec = _HEADER.unpack(header)
+    if length > MAX_MESSAGE_SIZE:
+        raise AgentProtocolError("Message too long ({0} B)".format(length))
+    payload = _recv_exactly(sock, length) if length else b''
+    if payload is None:
+        raise AgentProtocolError("Connection closed in the middle "
+                                 "of message")
+    return decode_payload(payload, codec), codec
+
+
+def dispatch(target, op):
+    """ Call ``target._op_<name>(args)`` for operation ``[name, args...]``.
+
+    :return: ``[0, value]`` or ``[1, error type, message]``
+    """
+    try:
+        if not op:
+            raise AgentProtocolError("Empty operation")
+        handler = getattr(target, '_op_' + str(op[0]), None)
+        if handler is None:
+            raise AgentProtocolError("Unknown operation {0}".format(op[0]))
+        return [0, handler(*op[1:])]
+    except (ConConError, IndexError, TypeError, ValueError) as e:
+        logger.warning("[dispatch] Operation %s failed: %s", op, e)
+        return [1, type(e).__name__, str(e)]
+
+
+def setting_to_dict(setting):
+    return dict((field, getattr(setting, field)) for field in SETTING_FIELDS)
+
+
+def setting_from_dict(values):
+    from .structs import SettingStruct
+
+    setting = SettingStruct()
+    for field in SETTING_FIELDS:
+        setattr(setting, field, values[field])
+    return setting
+
+
+class BridgeAgent(object):
+    """ Execute batches of operations on one bridge.
+
+    Supported operations:
+
+    * ``["info"]`` - metadata of all devices
+    * ``["get", DID, CMD ID]`` - read setting from device
+    * ``["set", DID, CMD ID, value]`` - write setting (result code string)
+    * ``["read", DID]`` - read all settings of device (DID None -> all
+      devices)
+
+    Batches from more clients are executed one by one (bridge is not shared
+    in the middle of the batch).
+    """
+
+    def __init__(self, bridge, address=('127.0.0.1', DEFAULT_PORT)):
+        """
+        :param bridge: :class:`~concon.HW_bridge_uniprot.Bridge` instance.
+        :param address: (host, port) to listen on. Port 0 selects free port.
+        """
+        self.bridge = bridge
+        self._lock = threading.Lock()
+        self._server = self._create_server(address)
+        self._thread = None
+
+        # Statistics
+        self.batches = 0
+        self.operations = 0
+
+    def _create_server(self, address):
+        return AgentTCPServer(address, self)
+
+    @property
+    def address(self):
+        """ Address the agent is listening on."""
+        return self._server.server_address
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """ Serve from background thread."""
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        name="Bridge agent")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def shutdown(self):
+        """ Stop serving (does not close bridge)."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def execute(self, ops):
+        """ Execute batch of operations.
+
+        :param ops: List of operations ``[name, arg, ...]``
+        :return: List of results ``[0, value]`` or
+                 ``[1, error type, message]``
+        """
+        results = []
+        with self._lock:
+            self.batches += 1
+            self.operations += len(ops)
+
+            i = 0
+            while i < len(ops):
+                # Consecutive reads are pipelined when protocol allows it
+                j = i
+                while (j < len(ops) and self.bridge.windowed and
+                       ops[j] and ops[j][0] == 'get'):
+                    j += 1
+                if j - i > 1:
+                    results.extend(self._get_many(ops[i:j]))
+                    i = j
+                    continue
+
+                results.append(self._execute_one(ops[i]))
+                i += 1
+        return results
+
+    def _execute_one(self, op):
+        return dispatch(self, op)
+
+    def _get_many(self, ops):
+        """ Read more settings with more requests on the wire."""
+        bridge = self.bridge
+        results = [None] * len(ops)
+        pending = []
+        for index, op in enumerate(ops):
+            try:
+                pending.append((index, op[1], op[2],
+                                bridge._get_setting_request(op[1], op[2])))
+            except (ConConError, IndexError, TypeError) as e:
+                results[index] = [1, type(e).__name__, str(e)]
+
+        try:
+            responses = bridge.send_requests_get_data(
+                [request for _, _, _, request in pending])
+            for index, did, cmd_id, _ in pending:
+                try:
+                    setting = bridge.decode_setting(
+                        bridge._check_setting_response(next(responses), did,
+                                                       cmd_id))
+                    results[index] = [0, setting_to_dict(setting)]
+                except BridgeError as e:
+                    results[index] = [1, type(e).__name__, str(e)]
+        except ConConError as e:
+            for index, _, _, _ in pending:
+                if results[index] is None:
+                    results[index] = [1, type(e).__name__, str(e)]
+        return results
+
+    def _op_info(self):
+        return [dict((field, getattr(metadata, field))
+                     for field in METADATA_FIELDS)
+                for metadata in self.bridge.device_metadata]
+
+    def _op_get(self, did, cmd_id):
+        return setting_to_dict(
+            self.bridge.get_setting_from_device(did, cmd_id))
+
+    def _op_set(self, did, cmd_id, value=0):
+        return self.bridge.set_setting_to_device(did, cmd_id, value)
+
+    def _op_read(self, did=None):
+        if did is None:
+            dids = range(self.bridge.get_max_device_id() + 1)
+        else:
+            dids = [did]
+
+        settings = []
+        for i_did in dids:
+            ops = [['get', i_did, cmd_id] for cmd_id in
+                   range(self.bridge.device_metadata[i_did].max_cmd_id + 1)]
+            if self.bridge.windowed:
+                results = self._get_many(ops)
+            else:
+                results = [self._execute_one(op) for op in ops]
+            for result in results:
+                if result[0]:
+                    raise _remote_error(result[1], result[2])
+            settings.append([result[1] for result in results])
+        return settings
+
+
+class AgentRequestHandler(socketserver.BaseRequestHandler):
+    """ One client connection (more batches can be sent). Batches are
+    executed by ``server.agent.execute(ops)``.
+    """
+
+    def handle(self):
+        agent = self.server.agent
+        while True:
+            try:
+                message, codec = recv_message(self.request)
+            except AgentProtocolError as e:
+                logger.warning("[handle] %s: %s", self.client_address, e)
+                return
+            except socket.error:
+                return
+            if message is None:
+                return
+
+            try:
+                results = agent.execute(message['ops'])
+            except (KeyError, TypeError) as e:
+                logger.warning("[handle] Invalid message from %s: %s",
+                               self.client_address, e)
+                return
+
+            self.request.sendall(encode_message({'results': results}, codec))
+
+
+class AgentTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, agent):
+        self.agent = agent
+        socketserver.TCPServer.__init__(self, address, AgentRequestHandler)
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class AgentUnixServer(socketserver.ThreadingMixIn,
+                          socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, path, agent):
+            self.agent = agent
+            socketserver.UnixStreamServer.__init__(self, path,
+                                                   AgentRequestHandler)
+
+
+def _remote_error(error_type, message):
+    return _REMOTE_EXCEPTIONS.get(error_type, RemoteBridgeError)(message)
+
+
+class RemoteBatch(object):
+    """ Operations collected on client side and sent in one message."""
+
+    def __init__(self, remote):
+        self._remote = remote
+        self._ops = []
+        self._decoders = []
+
+    def __len__(self):
+        return len(self._ops)
+
+    def _add(self, op, decoder=None):
+        self._ops.append(op)
+        self._decoders.append(decoder)
+        return self
+
+    def get(self, did, cmd_id):
+        return self._add(['get', did, cmd_id], setting_from_dict)
+
+    def set(self, did, cmd_id, value=0):
+        return self._add(['set', did, cmd_id, value])
+
+    def read(self, did=None):
+        return self._add(['read', did], lambda devices: [
+            [setting_from_dict(values) for values in settings]
+            for settings in devices])
+
+    def info(self):
+        return self._add(['info'], lambda devices: [
+            _metadata_from_dict(values) for values in devices])
+
+    def execute(self, raise_errors=True):
+        """ Send all operations to the agent.
+
+        :param raise_errors: When True, first failed operation raises
+                             exception. Else exceptions are returned in
+                             results.
+        :return: List of results (same order as operations).
+        """
+        ops, decoders = self._ops, self._decoders
+        self._ops, self._decoders = [], []
+        if not ops:
+            return []
+
+        results = []
+        for result, decoder in zip(self._remote.call(ops), decoders):
+            if result[0]:
+                error = _remote_error(result[1], result[2])
+                if raise_errors:
+                    raise error
+                results.append(error)
+            else:
+                value = result[1]
+                results.append(decoder(value) if decoder else value)
+        return results
+
+
+def _metadata_from_dict(values):
+    metadata = BridgeMetadata()
+    for field in METADATA_FIELDS:
+        setattr(metadata, field, values[field])
+    return metadata
+
+
+class AgentClient(object):
+    """ Connection to the agent. Sends batches of operations."""
+
+    def __init__(self, address, timeout=10.0, codec=None):
+        """
+        :param address: (host, port) of the agent or path to Unix socket.
+        :param timeout: Network timeout [s].
+        :param codec: Force :data:`CODEC_JSON` or :data:`CODEC_MSGPACK`.
+        """
+        self._address = address
+        self._timeout = timeout
+        self._codec = codec
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        try:
+            if isinstance(self._address, str):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self._timeout)
+                try:
+                    sock.connect(self._address)
+                except socket.error:
+                    sock.close()
+                    raise
+                return sock
+            return socket.create_connection(self._address, self._timeout)
+        except socket.error as e:
+            raise AgentException("Can not connect to agent {0}: {1}".format(
+                self._address, e))
+
+    def connect(self):
+        """ Connect now (otherwise connection is created by first call)."""
+        with self._lock:
+            if self._sock is None:
+                self._sock = self._connect()
+
+    def call(self, ops):
+        """ Send operations and return raw results (one round trip)."""
+        with self._lock:
+            if self._sock is None:
+                self._sock = self._connect()
+            try:
+                self._sock.sendall(encode_message({'ops': ops}, self._codec))
+                message, _ = recv_message(self._sock)
+            except (socket.error, AgentProtocolError) as e:
+                self._close_socket()
+                raise AgentException("Communication with agent failed: "
+                                     "{0}".format(e))
+            if message is None:
+                self._close_socket()
+                raise AgentException("Agent closed connection")
+            return message['results']
+
+    def execute(self, ops):
+        """ Send operations and return their values. First failed operation
+        raises exception.
+        """
+        values = []
+        for result in self.call(ops):
+            if result[0]:
+                raise _remote_error(result[1], result[2])
+            values.append(result[1])
+        return values
+
+    def _close_socket(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def close(self):
+        with self._lock:
+            self._close_socket()
+
+
+class RemoteBridge(AgentClient):
+    """ Client of :class:`BridgeAgent`. Provides subset of
+    :class:`~concon.HW_bridge_uniprot.Bridge` interface.
+    """
+
+    def __init__(self, address, timeout=10.0, codec=None):
+        AgentClient.__init__(self, address, timeout, codec)
+        self._metadata = None
+        self._settings = None
+
+    def batch(self):
+        """ :return: :class:`RemoteBatch`"""
+        return RemoteBatch(self)
+
+    @property
+    def device_metadata(self):
+        if self._metadata is None:
+            self._metadata = self.batch().info().execute()[0]
+        return self._metadata
+
+    def get_max_device_id(self):
+        return len(self.device_metadata) - 1
+
+    @property
+    def all_settings(self):
+        """ Settings of all devices (downloaded on first access)."""
+        if self._settings is None:
+            self._settings = self.batch().read().execute()[0]
+        return self._settings
+
+    def get_setting_from_device(self, i_device_id, i_cmd_id):
+        return self.batch().get(i_device_id, i_cmd_id).execute()[0]
+
+    def set_setting_to_device(self, i_device_id, i_cmd_id, i_value=0):
+        return self.batch().set(i_device_id, i_cmd_id, i_value).execute()[0]
+
+    def get_settings_from_device(self, ids):
+        """ Read more settings in one round trip.
+
+        :param ids: Iterable of (DID, CMD ID)
+        """
+        batch = self.batch()
+        for did, cmd_id in ids:
+            batch.get(did, cmd_id)
+        return batch.execute()
+
+    def set_settings_to_device(self, values):
+        """ Write more settings in one round trip.
+
+        :param values: Iterable of (DID, CMD ID, value)
+        :return: List of result code strings
+        """
+        batch = self.batch()
+        for did, cmd_id, value in values:
+            batch.set(did, cmd_id, value)
+        return batch.execute()
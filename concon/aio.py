@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.aio
+    :synopsis: asyncio front-end for Bridge operations.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+USB transfers are blocking (pyusb has no non-blocking API), so every
+operation runs in a thread pool shared by all devices. Event loop is never
+blocked and one pool of worker threads serves any number of devices; thread
+is used only while a transfer is on the wire.
+
+.. code-block:: python
+
+     async def configure(vid, pid):
+         async with await AsyncBridge.open(vid, pid, 700) as bridge:
+             await bridge.set_setting(0, 3, 42)
+             async for did, cmd_id, setting in bridge.settings():
+                 print(did, cmd_id, setting.out_value)
+
+     await asyncio.gather(*[configure(vid, pid) for vid, pid in devices])
+
+Module requires Python 3.7 or newer (rest of the package does not import
+it).
+
+Requests are ordered by :class:`~concon.scheduler.RequestScheduler` of the
+bridge, so :meth:`AsyncBridge.get_setting` sent during
+:meth:`AsyncBridge.settings` iteration does not wait for the whole device.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .HW_bridge_uniprot import Bridge
+from .scheduler import RequestScheduler
+
+DEFAULT_MAX_WORKERS = 32
+""" Size of default (shared) thread pool."""
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def default_executor():
+    """ Thread pool shared by all :class:`AsyncBridge` instances."""
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(
+                DEFAULT_MAX_WORKERS, thread_name_prefix='concon-aio')
+        return _default_executor
+
+
+class AsyncBridge(object):
+    """ Awaitable interface of :class:`~concon.HW_bridge_uniprot.Bridge`.
+    """
+
+    ITERATION_CHUNK = 8
+    """ Number of settings read by one worker call during iteration."""
+
+    def __init__(self, bridge, executor=None):
+        """
+        :param bridge: Opened :class:`~concon.HW_bridge_uniprot.Bridge`.
+        :param executor: Optional :class:`concurrent.futures.Executor`.
+                         Shared thread pool is used by default.
+        """
+        self.bridge = bridge
+        self._executor = executor or default_executor()
+
+    @classmethod
+    async def open(cls, vid, pid, timeout, executor=None, **kwargs):
+        """ Open device (metadata and settings are downloaded in worker
+        thread).
+
+        :param kwargs: Passed to :class:`~concon.HW_bridge_uniprot.Bridge`
+        """
+        executor = executor or default_executor()
+        bridge = await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(Bridge, vid, pid, timeout, **kwargs))
+        return cls(bridge, executor)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _run(self, priority, function, *args):
+        """ Call blocking function in worker thread with given request
+        priority.
+        """
+        scheduler = self.bridge.scheduler
+
+        def call():
+            with scheduler.priority(priority):
+                return function(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, call)
+
+    @property
+    def device_metadata(self):
+        return self.bridge.device_metadata
+
+    def get_max_device_id(self):
+        return self.bridge.get_max_device_id()
+
+    @property
+    def all_settings(self):
+        """ Settings downloaded to RAM (no communication)."""
+        return self.bridge.all_settings
+
+    async def get_setting(self, did, cmd_id,
+                          priority=RequestScheduler.INTERACTIVE):
+        """ Read setting from device.
+
+        :return: :class:`~concon.structs.SettingStruct`
+        """
+        return await self._run(priority, self.bridge.get_setting_from_device,
+                               did, cmd_id)
+
+    async def set_setting(self, did, cmd_id, value=0,
+                          priority=RequestScheduler.NORMAL):
+        """ Write setting to device.
+
+        :return: Result code as text
+        """
+        return await self._run(priority, self.bridge.set_setting_to_device,
+                               did, cmd_id, value)
+
+    async def reload(self, priority=RequestScheduler.BULK):
+        """ Download all settings to RAM again."""
+        await self._run(priority, self.bridge.load_settings)
+
+    async def settings(self, did=None, priority=RequestScheduler.BULK):
+        """ Read settings from device.
+
+        :param did: Device ID. All devices by default.
+        :return: Asynchronous iterator of (DID, CMD ID, setting)
+        """
+        if did is None:
+            dids = range(self.get_max_device_id() + 1)
+        else:
+            dids = [did]
+
+        for i_did in dids:
+            cmd_ids = list(range(
+                self.device_metadata[i_did].max_cmd_id + 1))
+            for start in range(0, len(cmd_ids), self.ITERATION_CHUNK):
+                chunk = cmd_ids[start:start + self.ITERATION_CHUNK]
+                settings = await self._run(priority, self._read_chunk,
+                                           i_did, chunk)
+                for cmd_id, setting in zip(chunk, settings):
+                    yield i_did, cmd_id, setting
+
+    def _read_chunk(self, did, cmd_ids):
+        return [self.bridge.get_setting_from_device(did, cmd_id)
+                for cmd_id in cmd_ids]
+
+    async def close(self):
+        await self._run(RequestScheduler.NORMAL, self.bridge.close)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.async_logging
+    :synopsis: Move log file I/O out of the USB communication thread.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Loggers configured by a logging configuration file are redirected to a
+bounded queue. Records are written by a background
+:class:`logging.handlers.QueueListener` thread, so thread waiting for USB
+reports never blocks on file I/O. When queue is full, records are dropped
+(and counted) instead of slowing down communication.
+
+.. code-block:: python
+
+     pipeline = AsyncLogPipeline.from_file_config('logging_global.cfg')
+     ...
+     pipeline.stop()    # flush remaining records (at the end of program)
+
+"""
+
+import logging
+import logging.config
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class DroppingQueueHandler(QueueHandler):
+    """ Queue handler which never blocks. When queue is full, record is
+    dropped and counted.
+    """
+
+    def __init__(self, record_queue):
+        QueueHandler.__init__(self, record_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """ Do not format message in caller's thread. Only take snapshot
+        of list arguments (buffers are usually reused by caller).
+        """
+        if record.args and isinstance(record.args, tuple):
+            record.args = tuple([tuple(arg) if isinstance(arg, list) else arg
+                                 for arg in record.args])
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(QueueListener):
+    """ Queue listener which waits for free slot when stopping (queue is
+    bounded, so sentinel can not be put without blocking).
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class AsyncLogPipeline(object):
+    """ Redirect handlers of given loggers through one bounded queue."""
+
+    DEFAULT_QUEUE_SIZE = 10000
+    """ Maximum number of records waiting for background thread."""
+
+    def __init__(self, loggers, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        :param loggers: List of :class:`logging.Logger` objects. Their
+                        handlers are moved to the background thread.
+        :param queue_size: Maximum number of pending records.
+        """
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._queue_handler = DroppingQueueHandler(self._queue)
+
+        handlers = []
+        self._original_handlers = []
+        for log in loggers:
+            self._original_handlers.append((log, log.handlers))
+            for handler in log.handlers:
+                if handler not in handlers:
+                    handlers.append(handler)
+            log.handlers = [self._queue_handler]
+
+        self._handlers = handlers
+        self._listener = _QueueListener(self._queue, *handlers,
+                                        respect_handler_level=True)
+        self._listener.start()
+        self._running = True
+
+    @classmethod
+    def from_file_config(cls, config_file, queue_size=DEFAULT_QUEUE_SIZE):
+        """ Load logging configuration file and redirect all configured
+        loggers (including root) to the background thread.
+
+        :param config_file: Path to the :func:`logging.config.fileConfig`
+                            compatible file.
+        :param queue_size: Maximum number of pending records.
+        """
+        logging.config.fileConfig(config_file, None, False)
+
+        loggers = [logging.getLogger()]
+        for log in logging.Logger.manager.loggerDict.values():
+            if isinstance(log, logging.Logger) and log.handlers:
+                loggers.append(log)
+
+        return cls(loggers, queue_size=queue_size)
+
+    @property
+    def dropped(self):
+        """ Number of records dropped because of full queue."""
+        return self._queue_handler.dropped
+
+    def stop(self):
+        """ Write all pending records and stop background thread."""
+        if not self._running:
+            return
+        self._running = False
+
+        # Records logged from now on are written directly
+        for log, handlers in self._original_handlers:
+            log.handlers = handlers
+        self._listener.stop()
+
+        if self.dropped:
+            record = logging.makeLogRecord({
+                'name': __name__,
+                'levelno': logging.WARNING,
+                'levelname': logging.getLevelName(logging.WARNING),
+                'msg': "%s log records dropped (logging queue was full)",
+                'args': (self.dropped,)})
+            for handler in self._handlers:
+                handler.handle(record)
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.batch
+    :synopsis: Sequence of operations executed in one opened session.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Test sequences set values, call functions and check results. Device is
+opened once (metadata only, see :mod:`concon.schema`), names of all settings
+are resolved before the first operation and then every operation is just one
+round trip.
+
+Script (YAML) is list of operations, or dictionary with ``operations`` and
+optional ``stop_on_error`` (True by default):
+
+.. code-block:: yaml
+
+     stop_on_error: true
+     operations:
+         - set: "0:gain"          # Setting as DID:name
+           value: 7
+         - call: "0:calibrate"    # VOID input -> function is called
+         - wait: 0.5              # [s]
+         - get: "0:offset"
+         - assert: "0:temperature"
+           min: 10
+           max: 40
+
+From Python:
+
+.. code-block:: python
+
+     operations, stop_on_error = load_script('script.yml')
+     runner = BatchRunner(bridge, SchemaCache())
+     for result in runner.run(operations, stop_on_error):
+         print(result)
+"""
+
+import logging
+import time
+
+from .HW_bridge_uniprot import DataTypes
+from .schema import (SettingResolver, parse_setting_path, parse_value,
+                     write_setting)
+from .transport import monotonic
+from .utils import ConConError
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ('get', 'set', 'call', 'wait', 'assert')
+
+NUMBERS = (int, float)
+""" Types of assert limits."""
+
+
+class BatchError(ConConError):
+    pass
+
+
+class Operation(object):
+    """ One parsed operation of script."""
+
+    def __init__(self, index, op, did=None, name=None, value=None,
+                 minimum=None, maximum=None):
+        self.index = index
+        self.op = op
+        self.did = did
+        self.name = name
+        # Value to set or waiting time
+        self.value = value
+        self.minimum = minimum
+        self.maximum = maximum
+        # Filled by BatchRunner.prepare
+        self.cmd_id = None
+        self.setting = None
+
+    @property
+    def target(self):
+        """ Setting as "DID:name" (None for wait)."""
+        if self.name is None:
+            return None
+        return "{0}:{1}".format(self.did, self.name)
+
+
+def parse_operation(index, item):
+    """ Parse one operation of script.
+
+    :param index: Position in script (for error messages).
+    :param item: Dictionary like ``{'set': '0:gain', 'value': 7}``.
+    :return: :class:`Operation`
+    :raises: :class:`BatchError`
+    """
+    ops = [op for op in OPERATIONS if op in item] \
+        if isinstance(item, dict) else []
+    if len(ops) != 1:
+        raise BatchError("Operation #{0}: expected exactly one of {1}, got "
+                         "{2!r}".format(index, ", ".join(OPERATIONS), item))
+    op = ops[0]
+    argument = item[op]
+
+    if op == 'wait':
+        try:
+            seconds = float(argument)
+        except (TypeError, ValueError):
+            raise BatchError("Operation #{0}: invalid waiting time "
+                             "{1!r}".format(index, argument))
+        return Operation(index, op, value=seconds)
+
+    if not isinstance(argument, (str, type(u''))):
+        # YAML reads unquoted 0:5 as a number
+        raise BatchError("Operation #{0}: setting must be string "
+                         "\"DID:name\" (quote it), got {1!r}".format(
+                             index, argument))
+    try:
+        did, name = parse_setting_path(argument)
+    except ValueError as e:
+        raise BatchError("Operation #{0}: {1}".format(index, e))
+
+    operation = Operation(index, op, did, name)
+    if op == 'set':
+        if 'value' not in item:
+            raise BatchError("Operation #{0}: value to set is missing".format(
+                index))
+        operation.value = item['value']
+    elif op == 'assert':
+        operation.minimum = item.get('min')
+        operation.maximum = item.get('max')
+        if operation.minimum is None and operation.maximum is None:
+            raise BatchError("Operation #{0}: assert needs min and/or "
+                             "max".format(index))
+        for limit in (operation.minimum, operation.maximum):
+            if limit is not None and (isinstance(limit, bool) or
+                                      not isinstance(limit, NUMBERS)):
+                raise BatchError("Operation #{0}: min and max must be "
+                                 "numbers, got {1!r}".format(index, limit))
+    return operation
+
+
+def parse_script(script):
+    """ :param script: List of operations or dictionary (see module).
+    :return: (list of :class:`Operation`, stop on error)
+    """
+    stop_on_error = True
+    if isinstance(script, dict):
+        stop_on_error = bool(script.get('stop_on_error', True))
+        script = script.get('operations')
+    if not isinstance(script, list):
+        raise BatchError("Script must be list of operations")
+    return [parse_operation(index, item)
+            for index, item in enumerate(script)], stop_on_error
+
+
+def load_script(file_name):
+    """ Load YAML script. See :func:`parse_script`."""
+    import yaml
+    try:
+        with open(file_name, 'r') as f:
+            return parse_script(yaml.safe_load(f))
+    except (IOError, OSError, yaml.YAMLError) as e:
+        raise BatchError("Can not load script {0}: {1}".format(file_name, e))
+
+
+class BatchRunner(object):
+    """ Run operations on one opened device."""
+
+    def __init__(self, bridge, cache=None):
+        """
+        :param bridge: :class:`~concon.HW_bridge_uniprot.Bridge` (settings
+                       do not need to be downloaded).
+        :param cache: Optional :class:`~concon.schema.SchemaCache` of names.
+        """
+        self.bridge = bridge
+        self.resolver = SettingResolver(bridge, cache)
+        # (DID, name): (CMD ID, setting)
+        self._resolved = {}
+
+    def prepare(self, operations):
+        """ Resolve settings and check values of all operations, so invalid
+        script does not change anything on the device.
+
+        :raises: :class:`~concon.utils.ConConError`
+        """
+        for operation in operations:
+            if operation.name is None:
+                continue
+            key = (operation.did, operation.name)
+            if key not in self._resolved:
+                self._resolved[key] = self.resolver.resolve(*key)
+            operation.cmd_id, operation.setting = self._resolved[key]
+
+            if operation.op == 'set':
+                operation.value = parse_value(operation.setting,
+                                              str(operation.value))
+            elif operation.op == 'assert' and \
+                    operation.setting.out_type in (DataTypes.VOID,
+                                                   DataTypes.CHAR):
+                raise BatchError("Operation #{0}: range of {1} can not be "
+                                 "checked (output type is {2})".format(
+                                     operation.index, operation.target,
+                                     DataTypes.data_type_to_str(
+                                         operation.setting.out_type)))
+            elif operation.op == 'call' and \
+                    operation.setting.in_type != DataTypes.VOID:
+                raise BatchError("Operation #{0}: {1} is not a function "
+                                 "(input type is {2})".format(
+                                     operation.index, operation.target,
+                                     DataTypes.data_type_to_str(
+                                         operation.setting.in_type)))
+
+    def run(self, operations, stop_on_error=True):
+        """ Run operations in sequence. Operations are prepared first (see
+        :meth:`prepare`).
+
+        :param operations: List of :class:`Operation`
+        :param stop_on_error: Skip remaining operations after first failure.
+        :return: Generator of results (dictionary per operation: index, op,
+                 setting, value, ok, error, elapsed [s], result code).
+        """
+        self.prepare(operations)
+        failed = False
+        for operation in operations:
+            if failed and stop_on_error:
+                yield self._result(operation, error="Skipped", elapsed=0.0)
+                continue
+            result = self.execute(operation)
+            failed = failed or not result['ok']
+            yield result
+
+    def execute(self, operation):
+        """ Run one prepared operation. Communication errors are reported
+        in result.
+        """
+        start = monotonic()
+        try:
+            value, code, error = self._execute(operation)
+        except ConConError as e:
+            logger.error("[execute] #%d %s %s: %s", operation.index,
+                         operation.op, operation.target, e)
+            value, code, error = None, None, str(e)
+        return self._result(operation, value, code, error,
+                            monotonic() - start)
+
+    def _execute(self, operation):
+        bridge = self.bridge
+        op = operation.op
+        if op == 'wait':
+            time.sleep(operation.value)
+            return None, None, None
+
+        if op == 'set':
+            code, setting = write_setting(bridge, operation.did,
+                                          operation.cmd_id, operation.setting,
+                                          operation.value)
+        elif op == 'call':
+            code = bridge.set_setting_to_device(operation.did,
+                                                operation.cmd_id, 0)
+            setting = bridge.get_setting(operation.did, operation.cmd_id)
+        else:
+            code = None
+            setting = bridge.get_setting_from_device(operation.did,
+                                                     operation.cmd_id)
+
+        value = None
+        if setting.out_type != DataTypes.VOID:
+            value = setting.out_value
+
+        error = None
+        if op == 'assert':
+            if value is None:
+                error = "Setting has no value"
+            elif (operation.minimum is not None and
+                    value < operation.minimum) or \
+                    (operation.maximum is not None and
+                     value > operation.maximum):
+                error = "Value {0} out of range <{1} : {2}>".format(
+                    value, operation.minimum, operation.maximum)
+        return value, code, error
+
+    @staticmethod
+    def _result(operation, value=None, code=None, error=None, elapsed=0.0):
+        return {'index': operation.index,
+                'op': operation.op,
+                'setting': operation.target,
+                'value': value,
+                'code': code,
+                'ok': error is None,
+                'error': error,
+                'elapsed': elapsed}
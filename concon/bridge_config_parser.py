@@ -12,6 +12,8 @@ from .parser_utils import ConfigParserWithComments
 from .structs import SettingStructChangeParam, GroupParam
 
 from .HW_bridge_uniprot import *
+from .scheduler import RequestScheduler
+from .transport.usb import UsbTransport
 
 # For detection python version (2 or 3)
 if sys.version_info[0] == 2:
@@ -24,16 +26,27 @@ else:
 
 logger = logging.getLogger('Bridge config parser')
 
+# Name of setting which belongs to group "{group name}item name"
+GROUP_ITEM_PATTERN = re.compile("{([a-zA-Z0-9_ ]+)}")
+
 
 class BridgeConfigParser(object):
     MAX_RETRY_CNT = 3
 
-    def __init__(self, vid, pid, timeout, progress_bar=None):
+    def __init__(self, vid, pid, timeout, progress_bar=None, trace=None,
+                 transport=None):
         self.vid = vid  # USB VendorID
         self.pid = pid  # USB ProductID
         self._bridge = None
         self._s_cfg_settings = []
 
+        # Settings converted for config file. Filled by Bridge (decoder
+        # thread) meanwhile settings are still downloaded
+        wrapped = {}
+
+        def on_setting(did, cmd_id, setting):
+            self._wrap_setting(wrapped, did, cmd_id, setting)
+
         # Try initialize Bridge
         retry_cnt = -1
         while True:
@@ -44,9 +57,13 @@ class BridgeConfigParser(object):
                                 " Can not initialize Bridge\n")
                 raise Exception(" Can not initialize Bridge")
 
+            wrapped.clear()
             try:
                 self._bridge = Bridge(self.vid, self.pid, timeout,
-                                      progress_bar=progress_bar)
+                                      progress_bar=progress_bar,
+                                      trace=trace,
+                                      on_setting=on_setting,
+                                      transport=transport)
 
             except IOError as e:
                 logger.error("[__init__][Bridge]" + str(e))
@@ -56,74 +73,119 @@ class BridgeConfigParser(object):
                 break
 
         logger.info(" All configurations from device downloaded\n")
-
+        self._build_cfg_settings(wrapped)
+
+    @classmethod
+    def from_usb_device(cls, device, timeout, transport=None, **kwargs):
+        """ Open exactly given enumerated device (devices connected at the
+        same time usually share VID/PID, so it is opened by its unique ID).
+
+        :param device: :class:`~concon.usb_driver.UsbDevice`
+        :param transport: Optional transport of the device (e.g. recording),
+                          USB transport by unique ID when not given.
+        :param kwargs: Passed to :class:`BridgeConfigParser`
+        """
+        if transport is None:
+            transport = UsbTransport(device.vid, device.pid, timeout=timeout,
+                                     uid=device.uid, name=device.name)
+        return cls(device.vid, device.pid, timeout, transport=transport,
+                   **kwargs)
+
+    def _build_cfg_settings(self, wrapped):
+        """ Create settings for config file from wrapped settings (see
+        :meth:`_wrap_setting`).
+        """
         # Copy whole settings to array s_cfg_settings - go thru all devices
+        self._s_cfg_settings = []
         num_of_dev = self._bridge.get_max_device_id()
 
         for did in range(num_of_dev + 1):
-            # Copy thru all commands
-            # Get max CMD ID for actual device
-
             # Temporary array for settings
             temp = []
 
             # Dictionary for groups (CMD_ID and "group name")
             groups = {}
 
-            cnt = 0
+            # Group items (group name, setting)
+            group_items = []
+
             # Go thru all CMD_ID
-            for setting in self._bridge.all_settings[did]:
+            for cmd_id in range(self._bridge.device_metadata[did].max_cmd_id
+                                + 1):
+                if (did, cmd_id) not in wrapped:
+                    # Download failed (already logged)
+                    continue
+
+                tmpst, group_name = wrapped[(did, cmd_id)]
 
                 # Test if group header found
-                if setting.in_type == DataTypes.GROUP:
-                    # Create key in dictionary (will be filled later)
-                    tmpst = GroupParam(setting)
+                if tmpst.in_type == DataTypes.GROUP:
                     groups[tmpst.name] = tmpst
-                    logger.debug(
-                        "[Init] Found group header: {0}\n".format(setting))
-                else:
-                    tmpst = SettingStructChangeParam(setting)
 
-                # Anyway: always set changed variable to false (so far
-                # nothing was changed)
-                tmpst.changed = False
-
-                tmpst.CMD_ID = cnt
-
-                # Add to temp array
-                temp.append(tmpst)
-
-                cnt = cnt + 1
-
-            items_to_remove = []
-            for setting in temp:
-                # Compare with group pattern
-                match_result = re.match("{([a-zA-Z0-9_ ]+)}",
-                                        setting.name)
-
-                # If match -> add actual setting move to groups
-                if match_result:
-                    logger.debug("[__init__][Search groups] Found group item:"
-                                 + str(setting) + "\n")
-
-                    # Add group to dictionary
-                    groups[match_result.group(1)].add_choice_param(setting)
-                    items_to_remove.append(setting)
+                if group_name is None:
+                    temp.append(tmpst)
+                else:
+                    group_items.append((group_name, tmpst))
 
-            # Remove duplicated items (this cannot be done in the for cycle
-            # above)
-            for item in items_to_remove:
-                temp.remove(item)
+            # Add group items to their groups (group header may be defined
+            # after item, so this is done when all settings are known)
+            for group_name, setting in group_items:
+                logger.debug("[__init__][Search groups] Found group item:"
+                             "%s\n", setting)
+                groups[group_name].add_choice_param(setting)
 
             # And add all CMD ID for actual device to s_cfg_settings
             self._s_cfg_settings.append(temp)
 
         for did in range(num_of_dev + 1):
             for setting in self._bridge.all_settings[did]:
-                logger.debug("[__init__][Summary] {0}".format(setting))
+                logger.debug("[__init__][Summary] %s", setting)
 
         logger.info(" Actual configuration saved\n")
 
+    def reload_settings(self, progress_bar=None):
+        """ Download all settings from device again (device stays opened).
+        Changes loaded from file and not written to device are lost.
+        """
+        wrapped = {}
+
+        def on_setting(did, cmd_id, setting):
+            self._wrap_setting(wrapped, did, cmd_id, setting)
+
+        with self._bridge.scheduler.priority(RequestScheduler.BULK):
+            self._bridge.load_settings(progress_bar, on_setting=on_setting)
+        self._build_cfg_settings(wrapped)
+
+    @staticmethod
+    def _wrap_setting(wrapped, did, cmd_id, setting):
+        """ Convert downloaded setting into structure used for config file.
+
+        :param wrapped: Dictionary filled with (structure, group name)
+                        tuples indexed by (DID, CMD ID). Group name is None
+                        when setting is not a group item.
+        """
+        # Test if group header found
+        if setting.in_type == DataTypes.GROUP:
+            tmpst = GroupParam(setting)
+            logger.debug("[Init] Found group header: %s\n", setting)
+        else:
+            tmpst = SettingStructChangeParam(setting)
+            # Parse descriptor now (it is needed for export later)
+            if tmpst.descriptor != "":
+                tmpst.descriptor_comment
+
+        # Anyway: always set changed variable to false (so far
+        # nothing was changed)
+        tmpst.changed = False
+
+        tmpst.CMD_ID = cmd_id
+
+        # Compare with group pattern
+        match_result = GROUP_ITEM_PATTERN.match(setting.name)
+        group_name = match_result.group(1) if match_result else None
+
+        wrapped[(did, cmd_id)] = (tmpst, group_name)
+
         # --------------------------------------------------------------------#
 
     # ------------------------------------------------------------------------#
@@ -193,9 +255,9 @@ class BridgeConfigParser(object):
                                            try_fix_errors)
 
                 if setting.changed:
-                    logger.debug("[read_setting_from_file] Changed <{0}>"
-                                 " Actual value: {1}\n".format(
-                                        setting.name, setting.out_value))
+                    logger.debug("[read_setting_from_file] Changed <%s>"
+                                 " Actual value: %s\n",
+                                 setting.name, setting.out_value)
 
         logger.info("[read_setting_from_file] All configuration items read\n")
 
@@ -204,6 +266,11 @@ class BridgeConfigParser(object):
     # @brief Read processed s_cfg_settings and if there are any changes, then
     # will be send to AVR
     def write_setting_to_device(self, progress_bar=None):
+        # Requests of other threads (status polling) go first
+        with self._bridge.scheduler.priority(RequestScheduler.BULK):
+            self._write_setting_to_device(progress_bar)
+
+    def _write_setting_to_device(self, progress_bar=None):
         # Go through all settings and check if "changed" flag is set
         num_of_dev = self._bridge.get_max_device_id()
 
@@ -228,24 +295,42 @@ class BridgeConfigParser(object):
                         # default)
                         self._bridge.set_setting_to_device(
                             did, setting.out_value)
-                        msg = "[write_setting_to_device] In group "
-                        msg = msg + "<{0}> was selected option {1}\n".format(
-                            setting.name,
-                            setting.out_value)
-                        logger.debug(msg)
+                        logger.debug("[write_setting_to_device] In group "
+                                     "<%s> was selected option %s\n",
+                                     setting.name, setting.out_value)
                     else:
                         self._bridge.set_setting_to_device(
                             did, setting.CMD_ID, setting.out_value)
-                        msg = "[write_setting_to_device] In item "
-                        msg = msg + "<{0}> was changed value to: {1}".format(
-                            setting.name, setting.out_value)
-                        logger.debug(msg)
+                        logger.debug("[write_setting_to_device] In item "
+                                     "<%s> was changed value to: %s",
+                                     setting.name, setting.out_value)
 
                 if progress_bar:
                     progress_bar.update(1)
 
         logger.info("[write_setting_to_device] Device configured\n")
 
+    @property
+    def device_metadata(self):
+        return self._bridge.device_metadata
+
+    def changed_settings(self):
+        """ Settings changed by :meth:`read_setting_from_file` and not
+        written yet.
+
+        :return: List of (DID, setting)
+        """
+        return [(did, setting)
+                for did, settings in enumerate(self._s_cfg_settings)
+                for setting in settings if setting.changed]
+
+    def find_setting(self, did, name):
+        """ Setting (as in configuration file) with given name or None."""
+        for setting in self._s_cfg_settings[did]:
+            if setting.name == name:
+                return setting
+        return None
+
     # ------------------------------------------------------------------------#
     def close_device(self):
         self._bridge.close()
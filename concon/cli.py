@@ -1,21 +1,25 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-"""Console script for concon."""
+"""Console script for concon.
 
-import click
-import pkg_resources
+Scripts call concon many times, so startup is kept short: USB driver,
+bridge stack and YAML are imported only by commands which use them and
+devices are enumerated only by commands which need a device (not for
+``--help`` or ``--version``).
+"""
+
+import os
 import logging
-import logging.config
-import yaml
-from .supported_devices import SupportedDevices
-from .usb_driver import UsbDriver
-from .bridge_config_parser import BridgeConfigParser
-from .core import ConConError
+import click
+from . import __version__
+from .utils import ConConError, resource_filename
+from .fleet import DEFAULT_MAX_WORKERS
 
 # DEFAULT_CONFIG = 'config/config.json'
 DEFAULT_CONFIG = 'config/config.yml'
 DEFAULT_LOG_CONFIG = 'config/logging_global.cfg'
+DEFAULT_TRACE_FILE = 'Trace.txt'
 
 # logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger('ConCon')
@@ -28,92 +32,186 @@ def report_errors(err):
     click.echo(err, err=True)
 
 
+def dump_trace(ctx):
+    """ Dump wire trace (if enabled) after communication failure."""
+    trace = ctx.obj.get('trace')
+    if trace is None:
+        return
+    cnt = trace.dump(DEFAULT_TRACE_FILE)
+    click.secho("Wire trace ({0} reports) written to {1}".format(
+        cnt, DEFAULT_TRACE_FILE), fg='yellow', err=True)
+
+
+def make_transport(ctx, device):
+    """ Transport for selected device. None (default USB transport) unless
+    session is recorded.
+    """
+    record = ctx.obj.get('record')
+    if record is None:
+        return None
+    from .transport.usb import UsbTransport
+    from .transport.replay import RecordingTransport
+    transport = RecordingTransport(
+        UsbTransport(device.vid, device.pid,
+                     timeout=get_config(ctx)['usb']['timeout'],
+                     uid=device.uid, name=device.name),
+        record)
+    ctx.call_on_close(transport.finish)
+    return transport
+
+
+def get_config(ctx):
+    """ Application configuration (loaded when needed)."""
+    if 'config' not in ctx.obj:
+        import yaml
+        config = ctx.obj['config_file']
+        try:
+            # TODO: Add cascaded configuration
+            if config is None:
+                config = resource_filename(DEFAULT_CONFIG)
+
+            with open(config, 'r') as cf:
+                ctx.obj['config'] = yaml.safe_load(cf)
+        except OSError as e:
+            msg = " Invalid file path or configuration file: {0}!\n".format(
+                str(e))
+            report_errors(msg)
+            raise click.Abort()
+    return ctx.obj['config']
+
+
+def get_supported_devices(ctx):
+    """ :class:`~concon.supported_devices.SupportedDevices` of
+    configuration.
+    """
+    if 'supported_devices' not in ctx.obj:
+        from .supported_devices import SupportedDevices
+        ctx.obj['supported_devices'] = SupportedDevices(
+            **get_config(ctx)['devices'])
+    return ctx.obj['supported_devices']
+
+
+def get_found_devices(ctx):
+    """ Connected supported devices sorted by name (enumerated when
+    needed). Exits when there is none.
+    """
+    if 'found_devices' not in ctx.obj:
+        # Devices are enumerated in one pass, enumerated devices are
+        # connected (no need to "ping" them)
+        found_devices = get_supported_devices(ctx).get_connected_devices()
+
+        # Test if there is at least one device
+        if len(found_devices) == 0:
+            msg = "No supported device found! Please make sure, that " \
+                  "device is\n" + \
+                  " properly connected. Also check if device is in " \
+                  "supported\n" + \
+                  " devices list.\n"
+            click.secho(msg, fg='yellow')
+            ctx.exit()
+
+        ctx.obj['found_devices'] = sorted(found_devices,
+                                          key=lambda device: device.name)
+    return ctx.obj['found_devices']
+
+
+def get_daemon(ctx):
+    """ Client of running daemon. When daemon is running, device is already
+    opened there, so read, write and list are just forwarded.
+
+    :return: :class:`~concon.daemon.DaemonClient` or None
+    """
+    if 'daemon' not in ctx.obj:
+        client = None
+        # Traffic can be traced or recorded only locally
+        if not (ctx.obj['trace'] or ctx.obj['record']):
+            from .daemon import DaemonClient
+            client = DaemonClient.connect_if_running(ctx.obj['socket'])
+            if client is not None:
+                ctx.call_on_close(client.close)
+        ctx.obj['daemon'] = client
+    return ctx.obj['daemon']
+
+
+def get_device(ctx):
+    """ Device selected by -d option (the only one when just one is
+    connected).
+    """
+    found_devices = get_found_devices(ctx)
+    if len(found_devices) == 1:
+        return found_devices[0]
+
+    device = ctx.obj['device_index']
+    if device is None:
+        # Show device selection prompt
+        click.secho("More than one configurable devices detected.\n"
+                    "Choose one from below and run concon with"
+                    " -d [0 ~ {0}] option.".format(len(found_devices) - 1),
+                    fg='yellow')
+        ctx.invoke(device_list)
+        raise click.Abort()
+
+    try:
+        return found_devices[int(device)]
+    except (IndexError, ValueError):
+        report_errors('Invalid device number "{0}". '
+                      'Choose between 0~{1}'.format(device,
+                                                    len(found_devices) - 1))
+        ctx.invoke(device_list)
+        raise click.Abort()
+
+
 @click.group()
-@click.version_option()
+# Explicit version -> package metadata are not searched
+@click.version_option(version=__version__)
 @click.option('--config', default=None,
               help="Application specific configuration file.")
 @click.option('-d', '--device', default=None,
               help="Selected device to configure.")
 @click.option('--verbose/--quiet', default=False,
               help="Enable / disable logging to Log.txt file")
+@click.option('--trace', is_flag=True, default=False,
+              help="Record raw USB traffic in memory and dump it to "
+                   "{0} when communication fails".format(DEFAULT_TRACE_FILE))
+@click.option('--record', default=None, metavar='FILE',
+              help="Record all reports of this session into binary trace "
+                   "FILE (can be replayed later)")
+@click.option('--socket', 'socket_path', default=None, metavar='PATH',
+              help="Unix socket of concon daemon.")
 @click.pass_context
-def main(ctx, config, device, verbose, args=None):
+def main(ctx, config, device, verbose, trace, record, socket_path,
+         args=None):
     """Tool for configuration of devices implementing "Uniprot" communication
     layer over USB (HID profile).
     """
     ctx.obj = {}
+    ctx.obj['config_file'] = config
+    ctx.obj['device_index'] = device
+    ctx.obj['record'] = record
+    ctx.obj['socket'] = socket_path
+    if trace:
+        from .wire_trace import WireTrace
+        ctx.obj['trace'] = WireTrace()
+    else:
+        ctx.obj['trace'] = None
     logging.basicConfig(level=logging.ERROR)
     
     # Check if verbose mode is on
     if(verbose):
-        logging.config.fileConfig(
-        pkg_resources.resource_filename('concon',
-                                        DEFAULT_LOG_CONFIG),
-        None,
-        False)
+        from .async_logging import AsyncLogPipeline
+        # Log file is written by background thread, so file I/O does not
+        # affect timing of USB communication
+        log_pipeline = AsyncLogPipeline.from_file_config(
+            resource_filename(DEFAULT_LOG_CONFIG))
+        ctx.call_on_close(log_pipeline.stop)
     # /if verbose
     
     # TODO: Config doesn't work...
     # logging.config.fileConfig(
-    #     pkg_resources.resource_filename('concon', DEFAULT_LOG_CONFIG)
+    #     resource_filename(DEFAULT_LOG_CONFIG)
     # )
-
-    try:
-        # TODO: Add cascaded configuration
-        if config is None:
-            config = pkg_resources.resource_filename('concon', DEFAULT_CONFIG)
-
-        with open(config, 'r') as cf:
-            conf = yaml.load(cf)
-    except OSError as e:
-        msg = " Invalid file path or configuration file: {0}!\n".format(str(e))
-        report_errors(msg)
-        raise click.Abort()
-
-    devices = SupportedDevices(**conf['devices'])
-    usb = UsbDriver(timeout=conf['usb']['timeout'])
-    ctx.obj['config'] = conf
-    dev_list = devices.get_connected_devices()
-
-    # Now try to "ping" every supported device. If device found, add it to list
-    found_devices = []
-    for dev in dev_list:
-        status = dev.ping()
-        # If 1 -> device connected
-        if status == 1:
-            found_devices.append(dev)
-
-    # Test if there is at least one device
-    if len(found_devices) == 0:
-        msg = "No supported device found! Please make sure, that device is\n" + \
-              " properly connected. Also check if device is in supported\n" + \
-              " devices list.\n"
-        click.secho(msg, fg='yellow')
-        exit()
-
-    found_devices = sorted(found_devices, key=lambda device: device.name)
-    ctx.obj['found_devices'] = found_devices
-
-    if len(found_devices) == 1:
-        ctx.obj['device'] = found_devices[0]
-    else:
-        if device is None:
-            # Show device selection prompt
-            click.secho("More than one configurable devices detected.\n"
-                        "Choose one from below and run concon with"
-                        " -d [0 ~ {0}] option.".format(len(found_devices) - 1),
-                        fg='yellow')
-            ctx.invoke(device_list)
-            raise click.Abort()
-
-        try:
-            ctx.obj['device'] = found_devices[int(device)]
-        except (IndexError, ValueError):
-            report_errors('Invalid device number "{0}". '
-                          'Choose between 0~{1}'.format(device,
-                                                        len(found_devices) - 1))
-            ctx.invoke(device_list)
-            raise click.Abort()
+    # Configuration is loaded and devices are found by commands which need
+    # them (see get_device, get_daemon)
 
 
 @main.command()
@@ -121,16 +219,20 @@ def main(ctx, config, device, verbose, args=None):
 @click.pass_context
 def write(ctx, file_name):
     """ Write a configuration file to a given device."""
+    if get_daemon(ctx):
+        return forward_to_daemon(ctx, 'write', file_name)
 
-    device = ctx.obj['device']
+    from .bridge_config_parser import BridgeConfigParser
+    device = get_device(ctx)
     label = "Connecting to {0}".format(device.name)
     # Try to initialize bridge
     cfg_pars = None
     try:
         with click.progressbar(length=10, show_eta=False, label=label) as bar:
-            cfg_pars = BridgeConfigParser(device.vid, device.pid,
-                                          ctx.obj['config']['usb']['timeout'],
-                                          progress_bar=bar)
+            cfg_pars = BridgeConfigParser.from_usb_device(
+                device, get_config(ctx)['usb']['timeout'],
+                progress_bar=bar, trace=ctx.obj['trace'],
+                transport=make_transport(ctx, device))
 
         click.echo("Reading configuration from: {0}".format(file_name))
         cfg_pars.read_setting_from_file(file_name,
@@ -146,6 +248,7 @@ def write(ctx, file_name):
                     "to the device {0}".format(device.name), fg='green')
     except ConConError as ce:
         report_errors(ce)
+        dump_trace(ctx)
     finally:
         # If something fails -> try at least close device properly
         if cfg_pars:
@@ -157,36 +260,437 @@ def write(ctx, file_name):
 @click.pass_context
 def read(ctx, file_name):
     """ Read given device configuration and store it in a configuration file."""
+    if get_daemon(ctx):
+        return forward_to_daemon(ctx, 'read', file_name)
 
-    device = ctx.obj['device']
+    from .bridge_config_parser import BridgeConfigParser
+    device = get_device(ctx)
     label = "Reading configuration from {0}".format(device.name)
 
     # Try to initialize bridge
     cfg_pars = None
     try:
         with click.progressbar(length=10, show_eta=False, label=label) as bar:
-            cfg_pars = BridgeConfigParser(device.vid, device.pid,
-                                          ctx.obj['config']['usb']['timeout'],
-                                          progress_bar=bar)
+            cfg_pars = BridgeConfigParser.from_usb_device(
+                device, get_config(ctx)['usb']['timeout'],
+                progress_bar=bar, trace=ctx.obj['trace'],
+                transport=make_transport(ctx, device))
 
         cfg_pars.write_setting_to_cfg_file(file_name)
         click.secho("Device configuration written to file {0}".format(
             file_name), fg='green')
     except ConConError as ce:
         report_errors(ce)
+        dump_trace(ctx)
     finally:
         if cfg_pars:
             cfg_pars.close_device()
 
 
+def parse_setting_path(path):
+    from .schema import parse_setting_path as parse
+    try:
+        return parse(path)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def open_transport(ctx, device):
+    """ Transport of exactly selected device (opened by its unique ID, other
+    devices may have the same VID/PID).
+    """
+    from .transport.usb import UsbTransport
+    return make_transport(ctx, device) or \
+        UsbTransport(device.vid, device.pid,
+                     timeout=get_config(ctx)['usb']['timeout'],
+                     uid=device.uid, name=device.name)
+
+
+def open_bridge(ctx, device):
+    """ Bridge with metadata only (settings are requested when needed)."""
+    from .HW_bridge_uniprot import Bridge
+    return Bridge(device.vid, device.pid, get_config(ctx)['usb']['timeout'],
+                  trace=ctx.obj['trace'],
+                  transport=open_transport(ctx, device),
+                  download_settings=False)
+
+
+def setting_resolver(bridge, use_cache):
+    from .schema import SettingResolver, SchemaCache
+    return SettingResolver(bridge, SchemaCache() if use_cache else None)
+
+
+@main.command(name="get")
+@click.argument("settings", nargs=-1, required=True, metavar="DID:NAME...")
+@click.option('--cache/--no-cache', default=True,
+              help="Use cached names of settings (schema).")
+@click.pass_context
+def get_settings(ctx, settings, cache):
+    """ Print actual value of given settings. Only these settings are
+    requested from device.
+    """
+    from .schema import format_value
+    paths = [parse_setting_path(path) for path in settings]
+    device = get_device(ctx)
+    bridge = None
+    try:
+        bridge = open_bridge(ctx, device)
+        resolver = setting_resolver(bridge, cache)
+        for did, name in paths:
+            _, setting = resolver.resolve(did, name)
+            click.echo("{0}:{1} = {2}".format(did, setting.name,
+                                              format_value(setting)))
+    except ConConError as ce:
+        report_errors(ce)
+        dump_trace(ctx)
+        ctx.exit(1)
+    finally:
+        if bridge:
+            bridge.close()
+
+
+@main.command(name="set")
+@click.argument("assignments", nargs=-1, required=True,
+                metavar="DID:NAME=VALUE...")
+@click.option('--cache/--no-cache', default=True,
+              help="Use cached names of settings (schema).")
+@click.pass_context
+def set_settings(ctx, assignments, cache):
+    """ Change given settings and print values read back from device.
+    Only these settings are requested from device. Value of group is CMD ID
+    of selected item.
+    """
+    from .schema import parse_value, format_value, write_setting
+    changes = []
+    for assignment in assignments:
+        path, sep, value = assignment.partition('=')
+        if not sep:
+            raise click.BadParameter('Expected "DID:name=value", got '
+                                     '"{0}"'.format(assignment))
+        changes.append(parse_setting_path(path) + (value,))
+
+    device = get_device(ctx)
+    bridge = None
+    try:
+        bridge = open_bridge(ctx, device)
+        resolver = setting_resolver(bridge, cache)
+        # Resolve and check all values before anything is changed
+        resolved = []
+        for did, name, text in changes:
+            cmd_id, setting = resolver.resolve(did, name)
+            resolved.append((did, cmd_id, setting,
+                             parse_value(setting, text)))
+
+        for did, cmd_id, setting, value in resolved:
+            result, current = write_setting(bridge, did, cmd_id, setting,
+                                            value)
+            click.echo("{0}:{1} = {2} ({3})".format(
+                did, setting.name, format_value(current), result))
+    except ConConError as ce:
+        report_errors(ce)
+        dump_trace(ctx)
+        ctx.exit(1)
+    finally:
+        if bridge:
+            bridge.close()
+
+
+@main.command()
+@click.argument("script")
+@click.option('--cache/--no-cache', default=True,
+              help="Use cached names of settings (schema).")
+@click.option('--keep-going', is_flag=True, default=False,
+              help="Run remaining operations after a failure.")
+@click.pass_context
+def batch(ctx, script, cache, keep_going):
+    """ Run operations of YAML script (get, set, call, wait, assert) in one
+    session. One JSON line per operation is printed to standard output.
+    """
+    import json
+    from .batch import BatchRunner, load_script
+    from .schema import SchemaCache
+    from .transport import monotonic
+    device = get_device(ctx)
+    bridge = None
+    failed = 0
+    try:
+        operations, stop_on_error = load_script(script)
+        start = monotonic()
+        bridge = open_bridge(ctx, device)
+        runner = BatchRunner(bridge, SchemaCache() if cache else None)
+        for result in runner.run(operations,
+                                 stop_on_error and not keep_going):
+            click.echo(json.dumps(result, sort_keys=True))
+            if not result['ok']:
+                failed += 1
+    except ConConError as ce:
+        report_errors(ce)
+        dump_trace(ctx)
+        ctx.exit(1)
+    finally:
+        if bridge:
+            bridge.close()
+
+    total = len(operations)
+    elapsed = monotonic() - start
+    if failed:
+        click.secho("{0} of {1} operation(s) failed ({2:.2f} s)".format(
+            failed, total, elapsed), fg='red', err=True)
+        ctx.exit(1)
+    click.secho("{0} operation(s) OK ({1:.2f} s)".format(total, elapsed),
+                fg='green', err=True)
+
+
+def forward_to_daemon(ctx, command, file_name):
+    """ Run read/write command by running daemon."""
+    client = get_daemon(ctx)
+    try:
+        if command == 'read':
+            client.read(ctx.obj['device_index'], file_name)
+            click.secho("Device configuration written to file {0}".format(
+                file_name), fg='green')
+        else:
+            client.write(ctx.obj['device_index'], file_name)
+            click.secho("Configuration successfully downloaded "
+                        "to the device", fg='green')
+    except ConConError as ce:
+        report_errors(ce)
+
+
+def run_on_all_devices(ctx, function, jobs, per_bus):
+    """ Run function(parser, device) on all found devices in parallel,
+    print summary and exit with non-zero code when any device fails.
+    """
+    from .bridge_config_parser import BridgeConfigParser
+    from .fleet import BusScheduler, format_results, format_bus_stats
+
+    devices = get_found_devices(ctx)
+    timeout = get_config(ctx)['usb']['timeout']
+    if per_bus is None:
+        per_bus = get_config(ctx)['usb'].get('jobs_per_bus',
+                                             BusScheduler.DEFAULT_PER_BUS)
+
+    def run(device, report):
+        report("connecting")
+        parser = BridgeConfigParser.from_usb_device(device, timeout)
+        try:
+            return function(parser, device, report)
+        finally:
+            parser.close_device()
+
+    def on_progress(index, device, message):
+        click.echo(" Dev# {0} <{1}>: {2}".format(index, device.name, message))
+
+    click.echo("Processing {0} device(s), {1} at a time ({2} per USB "
+               "bus)".format(len(devices), min(jobs, len(devices)),
+                             per_bus))
+    scheduler = BusScheduler(jobs, per_bus)
+    results = scheduler.run(devices, run, on_progress=on_progress)
+
+    click.echo()
+    for line in format_results(results):
+        click.echo(line)
+    click.echo()
+    for line in format_bus_stats(scheduler.stats()):
+        click.echo(line)
+    if not all(result.ok for result in results):
+        click.secho("Some devices failed", fg='red', err=True)
+        ctx.exit(1)
+    click.secho("All devices done", fg='green')
+
+
+@main.command(name="write-all")
+@click.argument("file_name")
+@click.option('-j', '--jobs', default=DEFAULT_MAX_WORKERS, type=int,
+              help="Number of devices configured at the same time.")
+@click.option('--per-bus', default=None, type=int,
+              help="Number of devices served at the same time on one USB "
+                   "bus (default from configuration file).")
+@click.pass_context
+def write_all(ctx, file_name, jobs, per_bus):
+    """ Write a configuration file to all connected devices."""
+    def write_device(parser, device, report):
+        parser.read_setting_from_file(file_name,
+                                      ignore_errors=False,
+                                      try_fix_errors=False)
+        report("writing configuration")
+        parser.write_setting_to_device()
+
+    run_on_all_devices(ctx, write_device, jobs, per_bus)
+
+
+@main.command(name="read-all")
+@click.argument("directory")
+@click.option('-j', '--jobs', default=DEFAULT_MAX_WORKERS, type=int,
+              help="Number of devices read at the same time.")
+@click.option('--per-bus', default=None, type=int,
+              help="Number of devices served at the same time on one USB "
+                   "bus (default from configuration file).")
+@click.pass_context
+def read_all(ctx, directory, jobs, per_bus):
+    """ Read configuration of all connected devices into a directory (one
+    file per device).
+    """
+    from .fleet import device_file_name
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    def read_device(parser, device, report):
+        file_name = os.path.join(directory, device_file_name(device))
+        parser.write_setting_to_cfg_file(file_name)
+        report("written to {0}".format(file_name))
+        return file_name
+
+    run_on_all_devices(ctx, read_device, jobs, per_bus)
+
+
+@main.command()
+@click.argument("file_name")
+@click.option('-j', '--jobs', default=DEFAULT_MAX_WORKERS, type=int,
+              help="Number of worker processes.")
+@click.option('--verify/--no-verify', default=True,
+              help="Read written settings back and compare them.")
+@click.pass_context
+def provision(ctx, file_name, jobs, verify):
+    """ Provision all connected devices with a golden configuration file.
+    One JSON line per device is printed to standard output.
+    """
+    if not os.path.isfile(file_name):
+        report_errors(" Configuration file not found: {0}".format(file_name))
+        ctx.exit(2)
+
+    import json
+    from .provision import provision as provision_devices
+
+    failed = 0
+    devices = get_found_devices(ctx)
+    results = provision_devices(devices, os.path.abspath(file_name),
+                                get_config(ctx)['usb']['timeout'],
+                                max_workers=jobs, verify=verify)
+    for result in results:
+        click.echo(json.dumps(result, sort_keys=True))
+        if not result['ok']:
+            failed += 1
+
+    total = len(devices)
+    if failed:
+        click.secho("{0} of {1} device(s) failed".format(failed, total),
+                    fg='red', err=True)
+        ctx.exit(1)
+    click.secho("{0} device(s) provisioned".format(total), fg='green',
+                err=True)
+
+
+@main.command()
+@click.option('--host', default='127.0.0.1',
+              help="Interface to listen on (0.0.0.0 for all).")
+@click.option('--port', default=None, type=int,
+              help="TCP port to listen on (5740 by default).")
+@click.pass_context
+def agent(ctx, host, port):
+    """ Serve selected device to remote concon clients."""
+    from .agent import BridgeAgent, DEFAULT_PORT
+    from .HW_bridge_uniprot import Bridge
+
+    if port is None:
+        port = DEFAULT_PORT
+    device = get_device(ctx)
+    label = "Connecting to {0}".format(device.name)
+
+    bridge = None
+    try:
+        with click.progressbar(length=10, show_eta=False, label=label) as bar:
+            bridge = Bridge(device.vid, device.pid,
+                            get_config(ctx)['usb']['timeout'],
+                            progress_bar=bar, trace=ctx.obj['trace'],
+                            transport=open_transport(ctx, device))
+
+        server = BridgeAgent(bridge, (host, port))
+        click.secho("Serving {0} on {1}:{2} (Ctrl+C to stop)".format(
+            device.name, *server.address[:2]), fg='green')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+    except ConConError as ce:
+        report_errors(ce)
+        dump_trace(ctx)
+    finally:
+        if bridge:
+            bridge.close()
+
+
+@main.command()
+@click.pass_context
+def daemon(ctx):
+    """ Keep devices opened and serve following concon invocations."""
+    from .daemon import ConConDaemon
+    try:
+        server = ConConDaemon(get_found_devices(ctx),
+                              get_config(ctx)['usb']['timeout'],
+                              path=ctx.obj['socket'])
+    except ConConError as ce:
+        report_errors(ce)
+        raise click.Abort()
+
+    click.secho("Serving {0} device(s) on {1} (Ctrl+C to stop)".format(
+        len(server.devices), server.path), fg='green')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+@main.command()
+@click.option('--prefetch', is_flag=True, default=False,
+              help="Download configuration of connected devices in "
+                   "background.")
+@click.pass_context
+def watch(ctx, prefetch):
+    """ Print connected and disconnected devices (until Ctrl+C)."""
+    messages = {'add': ("connected", None),
+                'remove': ("disconnected", 'yellow'),
+                'ready': ("configuration downloaded", 'green'),
+                'error': ("configuration download failed", 'red')}
+
+    def on_event(event, device):
+        message, color = messages[event]
+        click.secho(" <{0}> (UID {1:x}): {2}".format(
+            device.name, device.uid, message), fg=color)
+
+    import time
+    from .hotplug import DeviceRegistry
+
+    registry = DeviceRegistry(get_supported_devices(ctx),
+                              get_config(ctx)['usb']['timeout'],
+                              prefetch=prefetch)
+    registry.subscribe(on_event)
+    registry.start()
+    click.echo("Watching USB devices ({0}, Ctrl+C to stop)".format(
+        registry.method))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        registry.stop()
+
+
 @main.command(name="list")
 @click.pass_context
 def device_list(ctx):
     """ List all available Uniprot devices."""
-    found_devices = ctx.obj['found_devices']
-    for i in range(len(found_devices)):
-        click.echo(" Dev# {0} <{1}>".format(
-            i, found_devices[i].name))
+    if get_daemon(ctx):
+        names = get_daemon(ctx).list_devices()
+    else:
+        names = [device.name for device in get_found_devices(ctx)]
+    for i in range(len(names)):
+        click.echo(" Dev# {0} <{1}>".format(i, names[i]))
 
 
 if __name__ == "__main__":
@@ -1,9 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from .supported_devices import SupportedDevices
-from .usb_driver import UsbDriver
-from .utils import ConConError
-import pkg_resources
+from .utils import ConConError, resource_filename
 import logging
 import logging.config
 import yaml
@@ -22,11 +20,10 @@ class ConCon(object):
         #
         try:
             if config is None:
-                conf_file = pkg_resources.resource_filename('concon',
-                                                            DEFAULT_CONFIG)
+                conf_file = resource_filename(DEFAULT_CONFIG)
 
                 with open(conf_file, 'r') as cf:
-                    config = yaml.load(cf)
+                    config = yaml.safe_load(cf)
 
         except OSError as e:
             msg = " Invalid file path or configuration file: {0}!\n".format(
@@ -34,25 +31,47 @@ class ConCon(object):
             logger.error("[SupportedDevices]" + msg)
 
         self._config = config
+        self._supported_devices = None
+
+    @property
+    def supported_devices(self):
+        """ :class:`~concon.supported_devices.SupportedDevices` (caches
+        enumeration of connected devices).
+        """
+        if self._supported_devices is None:
+            self._supported_devices = SupportedDevices(
+                **self._config['devices'])
+        return self._supported_devices
+
+    def invalidate(self):
+        """ Enumerate devices again on next request (device was connected
+        or disconnected).
+        """
+        self.supported_devices.invalidate()
+
+    def registry(self, prefetch=False):
+        """ Registry of connected devices updated by hotplug events (not
+        started).
+
+        :param prefetch: Download configuration of new devices in
+                         background.
+        :return: :class:`~concon.hotplug.DeviceRegistry`
+        """
+        # Hotplug monitor (threads, netlink) is imported only when used
+        from .hotplug import DeviceRegistry
+        return DeviceRegistry(self.supported_devices,
+                              self._config['usb']['timeout'],
+                              prefetch=prefetch)
 
     def get_device_list(self):
         """
         :return: List of :class:`~concon.core.ConConDevice` sorted
                     alphabetically by the device name.
         """
-        devices = SupportedDevices(**self._config['devices'])
-        usb = UsbDriver(timeout=self._config['usb']['timeout'])
-        dev_list = devices.get_connected_devices()
-
-        # Now try to "ping" every supported device.
-        # If device is found, add it to list
-        found_devices = []
-        for dev in dev_list:
-            status = dev.ping()
-            # If 1 -> device connected
-            if status == 1:
-                found_devices.append(ConConDevice(dev, self._config))
-            pass
+        # Enumerated devices are connected, so there is no need to "ping"
+        # them again
+        found_devices = [ConConDevice(dev, self._config) for dev
+                         in self.supported_devices.get_connected_devices()]
         return sorted(found_devices, key=lambda device: device.name)
 
     def get_devices(self):
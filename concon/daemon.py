@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.daemon
+    :synopsis: Keep devices opened and serve CLI invocations locally.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Every CLI invocation enumerates USB, opens the device and downloads all
+metadata and settings before it does requested work. :class:`ConConDaemon`
+does this only once per device and keeps the device opened. CLI then only
+forwards the command over Unix domain socket (see :class:`DaemonClient`).
+
+.. code-block:: console
+
+     $ concon daemon &
+     $ concon read config-file.cfg     # served by daemon when running
+
+Messages use the same framing as :mod:`concon.agent`. Operations:
+
+* ``["list"]`` - names of devices
+* ``["read", index, file name]`` - write configuration file
+* ``["write", index, file name]`` - configure device from file
+* ``["reload", index]`` - download settings from device again
+* ``["shutdown"]``
+"""
+
+import logging
+import os
+import tempfile
+import threading
+
+from .agent import AgentClient, dispatch
+from .bridge_config_parser import BridgeConfigParser
+from .HW_bridge_uniprot import BridgeException
+from .utils import ConConError
+
+logger = logging.getLogger(__name__)
+
+
+class DaemonError(ConConError):
+    pass
+
+
+def default_socket_path():
+    """ Per-user socket path (``$XDG_RUNTIME_DIR`` when defined)."""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'concon.sock')
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(),
+                        'concon-{0}.sock'.format(uid))
+
+
+class ConConDaemon(object):
+    """ Serve opened devices over Unix domain socket."""
+
+    def __init__(self, devices, timeout, path=None, parser_factory=None):
+        """
+        :param devices: List of found devices (``name``, ``vid``, ``pid``,
+                        ``uid``).
+        :param timeout: USB timeout [ms].
+        :param path: Unix socket path. Default is
+                     :func:`default_socket_path`.
+        :param parser_factory: Optional callable(device) returning
+                               :class:`~concon.bridge_config_parser.\
+BridgeConfigParser`. Device is opened by its unique ID by default.
+        """
+        # Unix sockets are not available on all platforms
+        from .agent import AgentUnixServer
+
+        self.devices = list(devices)
+        self.timeout = timeout
+        self.path = path or default_socket_path()
+        self._parser_factory = parser_factory or self._open_parser
+        # Opened devices indexed by device index
+        self._parsers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+        _remove_stale_socket(self.path)
+        self._server = AgentUnixServer(self.path, self)
+        # Socket is accessible only by owner
+        os.chmod(self.path, 0o600)
+
+    def _open_parser(self, device):
+        return BridgeConfigParser.from_usb_device(device, self.timeout)
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """ Serve from background thread."""
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        name="ConCon daemon")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def shutdown(self):
+        """ Stop serving, close devices and remove socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        with self._lock:
+            for index in list(self._parsers):
+                self._close(index)
+
+    def execute(self, ops):
+        with self._lock:
+            return [dispatch(self, op) for op in ops]
+
+    def _parser(self, index):
+        """ Opened device (opened now when used for the first time)."""
+        if index is None:
+            if len(self.devices) != 1:
+                raise DaemonError(
+                    "More than one configurable devices detected. Choose "
+                    "one with -d [0 ~ {0}] option.".format(
+                        len(self.devices) - 1))
+            index = 0
+        index = int(index)
+        if not 0 <= index < len(self.devices):
+            raise DaemonError('Invalid device number "{0}". Choose between '
+                              '0~{1}'.format(index, len(self.devices) - 1))
+
+        if index not in self._parsers:
+            logger.info("[_parser] Opening %s", self.devices[index].name)
+            self._parsers[index] = self._parser_factory(self.devices[index])
+        return index, self._parsers[index]
+
+    def _close(self, index):
+        parser = self._parsers.pop(index, None)
+        if parser is None:
+            return
+        try:
+            parser.close_device()
+        except ConConError as e:
+            logger.warning("[_close] %s", e)
+
+    def _with_parser(self, index, function):
+        """ Run function(parser). When communication fails, device is closed
+        and opened again by next request.
+        """
+        index, parser = self._parser(index)
+        try:
+            return function(parser)
+        except BridgeException:
+            self._close(index)
+            raise
+
+    def _op_list(self):
+        return [device.name for device in self.devices]
+
+    def _op_read(self, index, file_name):
+        return self._with_parser(
+            index, lambda parser: parser.write_setting_to_cfg_file(file_name))
+
+    def _op_write(self, index, file_name):
+        def write(parser):
+            try:
+                parser.read_setting_from_file(file_name,
+                                              ignore_errors=False,
+                                              try_fix_errors=False)
+                parser.write_setting_to_device()
+            finally:
+                # Firmware can change other settings too (groups,
+                # functions) and unwritten changes must not stay
+                parser.reload_settings()
+        return self._with_parser(index, write)
+
+    def _op_reload(self, index):
+        return self._with_parser(index,
+                                 lambda parser: parser.reload_settings())
+
+    def _op_shutdown(self):
+        # Can not wait for server here (called from request handler)
+        thread = threading.Thread(target=self._server.shutdown)
+        thread.daemon = True
+        thread.start()
+
+
+def _remove_stale_socket(path):
+    """ Remove socket left by daemon which did not exit properly. Running
+    daemon is not disturbed.
+    """
+    if not os.path.exists(path):
+        return
+    client = DaemonClient(path, timeout=1.0)
+    try:
+        client.connect()
+    except ConConError:
+        os.unlink(path)
+    else:
+        raise DaemonError("Daemon is already running ({0})".format(path))
+    finally:
+        client.close()
+
+
+class DaemonClient(AgentClient):
+    """ Forward CLI commands to the running daemon."""
+
+    def __init__(self, path=None, timeout=600.0, codec=None):
+        AgentClient.__init__(self, path or default_socket_path(), timeout,
+                             codec)
+
+    @classmethod
+    def connect_if_running(cls, path=None):
+        """ :return: Connected client or None when daemon is not running."""
+        client = cls(path)
+        if not os.path.exists(client._address):
+            return None
+        try:
+            client.connect()
+        except ConConError:
+            return None
+        return client
+
+    def list_devices(self):
+        return self.execute([['list']])[0]
+
+    def read(self, index, file_name):
+        self.execute([['read', index, os.path.abspath(file_name)]])
+
+    def write(self, index, file_name):
+        self.execute([['write', index, os.path.abspath(file_name)]])
+
+    def reload(self, index=None):
+        self.execute([['reload', index]])
+
+    def shutdown(self):
+        self.execute([['shutdown']])
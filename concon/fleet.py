@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.fleet
+    :synopsis: Run the same operation on many devices in parallel.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Most of the time spent with one device is waiting for USB responses, so
+devices are served from a bounded pool of threads. Every device is opened by
+its unique ID (devices in a rack usually share VID/PID).
+
+.. code-block:: python
+
+     def write(device, report):
+         parser = open_parser(device)
+         try:
+             report("writing")
+             parser.read_setting_from_file('rack.cfg')
+             parser.write_setting_to_device()
+         finally:
+             parser.close_device()
+
+     results = run_on_devices(found_devices, write, max_workers=8)
+     for line in format_results(results):
+         print(line)
+
+Devices sharing one USB bus share its bandwidth, so
+:class:`BusScheduler` limits number of devices served at the same time on
+every bus and records per-bus throughput:
+
+.. code-block:: python
+
+     scheduler = BusScheduler(max_workers=16, per_bus=4)
+     results = scheduler.run(found_devices, write)
+     for line in format_bus_stats(scheduler.stats()):
+         print(line)
+"""
+
+import logging
+import re
+import threading
+from collections import Counter, OrderedDict, deque
+
+from .transport import monotonic
+from .utils import ConConError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+""" Number of devices served at the same time."""
+
+
+class DeviceResult(object):
+    """ Result of operation on one device."""
+
+    def __init__(self, index, device, value=None, error=None, elapsed=0.0):
+        self.index = index
+        self.device = device
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return "DeviceResult({0}, {1}, {2})".format(
+            self.index, self.device.name,
+            "OK" if self.ok else repr(self.error))
+
+
+class BusStats(object):
+    """ Throughput of one USB bus."""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.devices = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.max_concurrent = 0
+        self._first_start = None
+        self._last_end = None
+
+    def started(self, now, concurrent):
+        if self._first_start is None:
+            self._first_start = now
+        self.max_concurrent = max(self.max_concurrent, concurrent)
+
+    def finished(self, now, result):
+        self.devices += 1
+        self.failed += 0 if result.ok else 1
+        self.busy_time += result.elapsed
+        self._last_end = now
+
+    @property
+    def wall_time(self):
+        if self._last_end is None:
+            return 0.0
+        return self._last_end - self._first_start
+
+    def as_dict(self):
+        wall_time = self.wall_time
+        return {'bus': self.bus,
+                'devices': self.devices,
+                'failed': self.failed,
+                'busy_time': self.busy_time,
+                'wall_time': wall_time,
+                'max_concurrent': self.max_concurrent,
+                'devices_per_minute':
+                    60.0 * self.devices / wall_time if wall_time else 0.0}
+
+
+def _bus(device):
+    return getattr(device, 'bus', None)
+
+
+def _hub(device):
+    return (_bus(device),) + tuple(getattr(device, 'port_path', ()))[:-1]
+
+
+class BusScheduler(object):
+    """ Run operation on many devices with limited concurrency per USB bus.
+
+    Too many devices talking at the same time through one root hub exhaust
+    its interrupt schedule and responses time out, while other buses stay
+    idle. Next device is therefore taken from the least loaded bus (bus with
+    more waiting devices first) and, within the bus, from the least loaded
+    hub. Devices with unknown bus (``bus`` is None) are not limited.
+    """
+
+    DEFAULT_PER_BUS = 4
+    """ Number of devices served at the same time on one bus."""
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS,
+                 per_bus=DEFAULT_PER_BUS):
+        """
+        :param max_workers: Maximum number of devices served at the same
+                            time.
+        :param per_bus: Maximum number of devices served at the same time on
+                        one bus. None means no limit.
+        """
+        self.max_workers = max_workers
+        self.per_bus = per_bus
+        self._stats = {}
+        self._cond = threading.Condition()
+
+    def stats(self):
+        """ Statistics of every bus used so far.
+
+        :return: List of dictionaries (see :meth:`BusStats.as_dict`)
+        """
+        with self._cond:
+            return [self._stats[bus].as_dict() for bus in
+                    sorted(self._stats, key=lambda bus: (bus is None, bus))]
+
+    def run(self, devices, function, on_progress=None):
+        """ Call ``function(device, report)`` for every device.
+
+        Failure of one device does not affect the others (USB drivers do not
+        raise only :class:`~concon.utils.ConConError`, so any exception is
+        reported as failure of the device).
+
+        :param devices: Devices with ``name`` (``uid``, ``bus`` and
+                        ``port_path``) attribute.
+        :param on_progress: Optional callable(index, device, message).
+                            Called from worker threads by
+                            ``report(message)`` and when device is finished.
+        :return: List of :class:`DeviceResult` in order of devices.
+        """
+        devices = list(devices)
+        results = [None] * len(devices)
+        # Waiting devices of every bus
+        pending = OrderedDict()
+        for index, device in enumerate(devices):
+            pending.setdefault(_bus(device), deque()).append((index, device))
+        active_buses = Counter()
+        active_hubs = Counter()
+
+        def take():
+            """ Next device to serve (None when all buses are busy)."""
+            buses = [bus for bus, queue in pending.items() if queue and (
+                bus is None or self.per_bus is None or
+                active_buses[bus] < self.per_bus)]
+            if not buses:
+                return None
+            bus = min(buses, key=lambda bus: (active_buses[bus],
+                                              -len(pending[bus])))
+            job = min(pending[bus], key=lambda job: active_hubs[_hub(job[1])])
+            pending[bus].remove(job)
+            return job
+
+        def worker():
+            while True:
+                with self._cond:
+                    while True:
+                        if not any(pending.values()):
+                            return
+                        job = take()
+                        if job is not None:
+                            break
+                        self._cond.wait()
+                    index, device = job
+                    bus = _bus(device)
+                    active_buses[bus] += 1
+                    active_hubs[_hub(device)] += 1
+                    stats = self._stats.setdefault(bus, BusStats(bus))
+                    stats.started(monotonic(), active_buses[bus])
+
+                result = _run_one(index, device, function, on_progress)
+                with self._cond:
+                    results[index] = result
+                    active_buses[bus] -= 1
+                    active_hubs[_hub(device)] -= 1
+                    stats.finished(monotonic(), result)
+                    self._cond.notify_all()
+
+        threads = [threading.Thread(target=worker,
+                                    name="ConCon fleet {0}".format(i))
+                   for i in range(min(self.max_workers, len(devices)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+
+def _run_one(index, device, function, on_progress):
+    def notify(message):
+        if on_progress is not None:
+            on_progress(index, device, message)
+
+    start = monotonic()
+    try:
+        value = function(device, notify)
+    except Exception as e:
+        if isinstance(e, (ConConError, IOError)):
+            logger.error("[run_on_devices] %s: %s", device.name, e)
+        else:
+            logger.exception("[run_on_devices] %s", device.name)
+        result = DeviceResult(index, device, error=e,
+                              elapsed=monotonic() - start)
+        notify("FAILED: {0}".format(e))
+    else:
+        result = DeviceResult(index, device, value=value,
+                              elapsed=monotonic() - start)
+        notify("done")
+    return result
+
+
+def run_on_devices(devices, function, max_workers=DEFAULT_MAX_WORKERS,
+                   on_progress=None, per_bus=None):
+    """ Call ``function(device, report)`` for every device (see
+    :meth:`BusScheduler.run`).
+
+    :param max_workers: Maximum number of devices served at the same time.
+    :param per_bus: Maximum number of devices served at the same time on
+                    one bus. Not limited by default.
+    :return: List of :class:`DeviceResult` in order of devices.
+    """
+    return BusScheduler(max_workers, per_bus).run(devices, function,
+                                                  on_progress)
+
+
+def device_file_name(device):
+    """ Configuration file name unique for given device."""
+    name = re.sub(r'[^\w.-]+', '_', str(device.name)).strip('_') or 'device'
+    return "{0}-{1:x}.cfg".format(name, device.uid)
+
+
+def _format_table(rows):
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return [" ".join(cell.ljust(width) for cell, width
+                     in zip(row, widths)).rstrip() for row in rows]
+
+
+def format_results(results):
+    """ Summary table of :func:`run_on_devices` results.
+
+    :return: List of lines
+    """
+    rows = [("Dev#", "Device", "UID", "Result", "Time [s]")]
+    for result in results:
+        rows.append((str(result.index), str(result.device.name),
+                     "{0:x}".format(result.device.uid),
+                     "OK" if result.ok else "FAILED",
+                     "{0:.2f}".format(result.elapsed)))
+    lines = _format_table(rows)
+
+    failed = [result for result in results if not result.ok]
+    for result in failed:
+        lines.append(" Dev# {0} <{1}>: {2}".format(
+            result.index, result.device.name,
+            str(result.error).strip()))
+    lines.append("{0} of {1} device(s) OK".format(
+        len(results) - len(failed), len(results)))
+    return lines
+
+
+def format_bus_stats(stats):
+    """ Table of :meth:`BusScheduler.stats`.
+
+    :return: List of lines
+    """
+    rows = [("Bus", "Devices", "Failed", "Max parallel", "Time [s]",
+             "Devices/min")]
+    for bus in stats:
+        rows.append(("?" if bus['bus'] is None else str(bus['bus']),
+                     str(bus['devices']), str(bus['failed']),
+                     str(bus['max_concurrent']),
+                     "{0:.2f}".format(bus['wall_time']),
+                     "{0:.1f}".format(bus['devices_per_minute'])))
+    return _format_table(rows)
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.hotplug
+    :synopsis: Registry of connected devices updated by USB hotplug events.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+:class:`DeviceRegistry` keeps list of connected supported devices. On Linux
+it listens to kernel uevents (netlink socket), so USB is enumerated only
+when some USB device is connected or disconnected. Elsewhere (or when
+netlink socket can not be opened) USB is enumerated periodically.
+
+With ``prefetch`` enabled, metadata and settings of every new device are
+downloaded in background as soon as the device appears:
+
+.. code-block:: python
+
+     registry = DeviceRegistry(SupportedDevices(**config['devices']),
+                               timeout=700, prefetch=True)
+     registry.subscribe(lambda event, device: print(event, device.name))
+     registry.start()
+
+     # Later (configuration is usually already downloaded)
+     parser = registry.take_parser(device)
+     parser.write_setting_to_cfg_file('device.cfg')
+
+Events passed to subscribers: ``"add"``, ``"remove"``, ``"ready"``
+(configuration downloaded) and ``"error"`` (download failed).
+"""
+
+import logging
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .bridge_config_parser import BridgeConfigParser
+
+logger = logging.getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+""" Netlink protocol of kernel uevents."""
+
+_KERNEL_GROUP = 1
+
+
+def parse_uevent(data):
+    """ Parse kernel uevent message.
+
+    :param data: Message (``ACTION@DEVPATH\\0KEY=VALUE\\0...``).
+    :return: Dictionary of KEY: VALUE
+    """
+    event = {}
+    for item in data.split(b'\0')[1:]:
+        key, sep, value = item.partition(b'=')
+        if sep:
+            event[key.decode('ascii', 'replace')] = \
+                value.decode('ascii', 'replace')
+    return event
+
+
+def uevent_product(event):
+    """ (VID, PID) of USB device uevent, None for other events."""
+    if event.get('SUBSYSTEM') != 'usb' or \
+            event.get('DEVTYPE') != 'usb_device':
+        return None
+    try:
+        vid, pid = event['PRODUCT'].split('/')[:2]
+        return int(vid, 16), int(pid, 16)
+    except (KeyError, ValueError):
+        return None
+
+
+class UeventMonitor(object):
+    """ Kernel uevents (Linux only)."""
+
+    BUFFER_SIZE = 16384
+
+    def __init__(self):
+        """ :raises: ``OSError`` (``socket.error``) when netlink is not
+            available.
+        """
+        if not hasattr(socket, 'AF_NETLINK'):
+            raise OSError("Netlink sockets are not supported")
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                   NETLINK_KOBJECT_UEVENT)
+        try:
+            self._sock.bind((0, _KERNEL_GROUP))
+        except socket.error:
+            self._sock.close()
+            raise
+
+    def receive(self, timeout):
+        """ Wait for uevents.
+
+        :param timeout: Maximum waiting time [s].
+        :return: List of parsed events (empty on time out).
+        """
+        self._sock.settimeout(timeout)
+        events = []
+        try:
+            events.append(parse_uevent(self._sock.recv(self.BUFFER_SIZE)))
+            # Collect already received ones too
+            self._sock.settimeout(0)
+            while True:
+                events.append(
+                    parse_uevent(self._sock.recv(self.BUFFER_SIZE)))
+        except (socket.timeout, socket.error):
+            pass
+        return events
+
+    def close(self):
+        self._sock.close()
+
+
+class DeviceRegistry(object):
+    """ Connected supported devices, updated in background."""
+
+    POLL_INTERVAL = 1.0
+    """ Enumeration period when uevents are not available [s]."""
+
+    SETTLE_TIME = 0.3
+    """ Delay between uevent and enumeration. Device is not ready right
+    after "add" event and more events usually come together [s].
+    """
+
+    def __init__(self, supported_devices, timeout, prefetch=False,
+                 opener=None, poll_interval=POLL_INTERVAL, use_uevents=True,
+                 max_workers=4):
+        """
+        :param supported_devices: :class:`~concon.supported_devices.\
+SupportedDevices`
+        :param timeout: USB timeout [ms].
+        :param prefetch: Download configuration of new devices in background.
+        :param opener: Optional callable(device) returning
+                       :class:`~concon.bridge_config_parser.\
+BridgeConfigParser`. Device is opened by its unique ID by default.
+        :param use_uevents: Listen to kernel uevents when available.
+        :param max_workers: Number of devices downloaded at the same time.
+        """
+        self.supported_devices = supported_devices
+        self.timeout = timeout
+        self.prefetch = prefetch
+        self.poll_interval = poll_interval
+        self._opener = opener or self._open_parser
+        self._use_uevents = use_uevents
+        self._max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._devices = {}
+        # Downloads of configuration (futures) indexed as devices
+        self._prefetched = {}
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._monitor = None
+        self._executor = None
+
+    def _open_parser(self, device):
+        return BridgeConfigParser.from_usb_device(device, self.timeout)
+
+    @staticmethod
+    def _key(device):
+        return device.uid, device.vid, device.pid
+
+    @property
+    def method(self):
+        """ How are changes detected ("uevent" or "polling")."""
+        return "uevent" if self._monitor is not None else "polling"
+
+    def subscribe(self, callback):
+        """ Register callable(event, device). It is called from background
+        threads.
+        """
+        self._subscribers.append(callback)
+
+    def _notify(self, event, device):
+        for callback in list(self._subscribers):
+            try:
+                callback(event, device)
+            except Exception:
+                logger.exception("[_notify] Subscriber failed")
+
+    def devices(self):
+        """ Connected devices sorted by name."""
+        with self._lock:
+            devices = list(self._devices.values())
+        return sorted(devices, key=lambda device: device.name)
+
+    def start(self):
+        """ Enumerate devices and watch for changes in background."""
+        if self._use_uevents:
+            try:
+                self._monitor = UeventMonitor()
+            except (OSError, socket.error) as e:
+                logger.info("[start] Uevents not available (%s), polling",
+                            e)
+        if self.prefetch:
+            self._executor = ThreadPoolExecutor(self._max_workers)
+        self._stop.clear()
+        # Devices connected now are known when start returns
+        self.rescan()
+        self._thread = threading.Thread(target=self._run,
+                                        name="ConCon hotplug")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stop watching and close prefetched devices."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._monitor is not None:
+            self._monitor.close()
+            self._monitor = None
+
+        with self._lock:
+            prefetched = list(self._prefetched.values())
+            self._prefetched.clear()
+        for future in prefetched:
+            self._discard(future)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._monitor is not None:
+                events = self._monitor.receive(self.poll_interval)
+                if not any(self._is_relevant(event) for event in events):
+                    continue
+                if self._stop.wait(self.SETTLE_TIME):
+                    break
+                # Events of the same device came meanwhile
+                self._monitor.receive(0)
+            elif self._stop.wait(self.poll_interval):
+                break
+            self.rescan()
+
+    def _is_relevant(self, event):
+        product = uevent_product(event)
+        if product is None:
+            return False
+        # Product is not known for some remove events
+        return event.get('ACTION') == 'remove' or \
+            self.supported_devices.is_supported(*product)
+
+    def rescan(self):
+        """ Enumerate devices now and notify subscribers about changes."""
+        try:
+            found = dict((self._key(device), device) for device
+                         in self.supported_devices.get_connected_devices(
+                             max_age=0))
+        except Exception as e:
+            logger.error("[rescan] Enumeration failed: %s", e)
+            return
+
+        with self._lock:
+            removed = [device for key, device in self._devices.items()
+                       if key not in found]
+            added = [device for key, device in found.items()
+                     if key not in self._devices]
+            self._devices = found
+            prefetched = [self._prefetched.pop(self._key(device), None)
+                          for device in removed]
+
+        for device, future in zip(removed, prefetched):
+            logger.info("[rescan] Removed %s", device.name)
+            if future is not None:
+                self._discard(future)
+            self._notify('remove', device)
+
+        for device in sorted(added, key=lambda device: device.name):
+            logger.info("[rescan] Added %s", device.name)
+            self._notify('add', device)
+            if self._executor is not None:
+                self._start_prefetch(device)
+
+    def _start_prefetch(self, device):
+        future = self._executor.submit(self._opener, device)
+        with self._lock:
+            self._prefetched[self._key(device)] = future
+
+        def done(future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None:
+                self._notify('ready', device)
+            else:
+                logger.error("[prefetch] %s: %s", device.name, error)
+                self._notify('error', device)
+        future.add_done_callback(done)
+
+    @staticmethod
+    def _discard(future):
+        """ Close prefetched device (when download finishes)."""
+        def close(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            try:
+                future.result().close_device()
+            except Exception as e:
+                logger.warning("[_discard] %s", e)
+
+        if not future.cancel():
+            future.add_done_callback(close)
+
+    def is_ready(self, device):
+        """ True when configuration of device is downloaded."""
+        with self._lock:
+            future = self._prefetched.get(self._key(device))
+        return future is not None and future.done() and \
+            not future.cancelled() and future.exception() is None
+
+    def take_parser(self, device, timeout=None):
+        """ Opened device with downloaded configuration. Prefetched one is
+        returned (waits for download if needed), otherwise device is opened
+        now. Caller is responsible for closing it.
+
+        :param timeout: Maximum time to wait for prefetch [s].
+        :return: :class:`~concon.bridge_config_parser.BridgeConfigParser`
+        """
+        with self._lock:
+            future = self._prefetched.pop(self._key(device), None)
+        if future is None:
+            return self._opener(device)
+        return future.result(timeout)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.provision
+    :synopsis: End-of-line provisioning of many devices.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Golden configuration file is pushed to every device by worker process, so
+long USB transfers of one device do not block the others (GIL) and crash
+of one worker does not stop the run. Every device goes through::
+
+     connect -> diff (read file) -> write changes -> verify (read back)
+
+and result is reported as one JSON serializable dictionary:
+
+.. code-block:: python
+
+     for result in provision(devices, 'golden.cfg', timeout=700):
+         print(json.dumps(result))
+
+     {"index": 0, "name": "Amp", "uid": 259, "serial": [12],
+      "ok": true, "changed": 3, "errors": [],
+      "timings": {"connect": 0.52, "diff": 0.01, "write": 0.08,
+                  "verify": 0.49, "total": 1.1}}
+
+Results are yielded in order of completion. Device whose worker process
+crashes is tried once more in isolated process, so it can not take other
+devices down with it.
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from .bridge_config_parser import BridgeConfigParser
+from .structs import DataTypes
+from .transport import monotonic
+from .usb_driver import UsbDevice
+from .utils import ConConError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+""" Number of devices provisioned at the same time."""
+
+PHASES = ('connect', 'diff', 'write', 'verify')
+
+
+class ProvisionError(ConConError):
+    """ Device does not hold provisioned configuration."""
+
+
+def device_spec(index, device):
+    """ Picklable description of found device (for worker process).
+    Unique ID given by USB driver is the same in every process.
+    """
+    return {'index': index, 'name': str(device.name), 'vid': device.vid,
+            'pid': device.pid, 'uid': device.uid}
+
+
+def open_usb_parser(spec, timeout):
+    """ Open device by its unique ID (default opener)."""
+    return BridgeConfigParser.from_usb_device(UsbDevice(
+        spec['name'], spec['vid'], spec['pid'], spec['uid']), timeout)
+
+
+def _can_read_back(setting):
+    """ True when value written to device can be read back and compared."""
+    if setting.in_type == DataTypes.GROUP:
+        return True
+    return (DataTypes.VOID not in (setting.in_type, setting.out_type) and
+            setting.in_type == setting.out_type and
+            setting.in_min == setting.out_min and
+            setting.in_max == setting.out_max)
+
+
+def _same_value(setting, expected, actual):
+    if setting.in_type == DataTypes.FLOAT:
+        tolerance = 10 ** -setting.FLOAT_PRECISION
+        return abs(expected - actual) <= tolerance * max(1.0, abs(expected))
+    return expected == actual
+
+
+def verify_settings(parser, expected):
+    """ Compare settings of (reloaded) parser with expected values.
+
+    :param expected: List of (DID, setting) written to device.
+    :return: List of error messages
+    """
+    errors = []
+    for did, written in expected:
+        if not _can_read_back(written):
+            continue
+        actual = parser.find_setting(did, written.name)
+        if actual is None:
+            errors.append("DID {0} <{1}>: setting disappeared".format(
+                did, written.name))
+        elif not _same_value(written, written.out_value, actual.out_value):
+            errors.append("DID {0} <{1}>: expected {2}, read {3}".format(
+                did, written.name, written.out_value, actual.out_value))
+    return errors
+
+
+def provision_device(spec, file_name, timeout, verify=True, opener=None):
+    """ Run provisioning cycle on one device (in worker process).
+
+    Errors are reported in the result, function does not raise.
+
+    :param spec: Device description (see :func:`device_spec`).
+    :param opener: Optional picklable callable(spec, timeout) returning
+                   :class:`~concon.bridge_config_parser.BridgeConfigParser`.
+    :return: Result dictionary
+    """
+    opener = opener or open_usb_parser
+    result = {'index': spec['index'], 'name': spec['name'],
+              'uid': spec['uid'], 'serial': [], 'ok': False, 'changed': 0,
+              'errors': [], 'timings': {}}
+    timings = result['timings']
+    start = monotonic()
+    phase = PHASES[0]
+    parser = None
+
+    def finish_phase(next_phase):
+        timings[phase] = round(monotonic() - phase_start, 4)
+        return next_phase, monotonic()
+
+    phase_start = start
+    try:
+        parser = opener(spec, timeout)
+        result['serial'] = [metadata.serial
+                            for metadata in parser.device_metadata]
+        phase, phase_start = finish_phase('diff')
+
+        parser.read_setting_from_file(file_name, ignore_errors=False,
+                                      try_fix_errors=False)
+        changed = parser.changed_settings()
+        result['changed'] = len(changed)
+        phase, phase_start = finish_phase('write')
+
+        if changed:
+            parser.write_setting_to_device()
+        phase, phase_start = finish_phase('verify')
+
+        if verify and changed:
+            parser.reload_settings()
+            errors = verify_settings(parser, changed)
+            if errors:
+                raise ProvisionError("Verification failed: " +
+                                     "; ".join(errors))
+        phase, phase_start = finish_phase(None)
+        result['ok'] = True
+    except Exception as e:
+        logger.error("[provision_device] %s (%s): %s", spec['name'], phase,
+                     e)
+        result['errors'].append("{0}: {1}".format(phase, str(e).strip()))
+    finally:
+        if parser is not None:
+            try:
+                parser.close_device()
+            except Exception as e:
+                result['errors'].append("close: {0}".format(e))
+                result['ok'] = False
+        timings['total'] = round(monotonic() - start, 4)
+    return result
+
+
+def _crashed(spec, error):
+    return {'index': spec['index'], 'name': spec['name'],
+            'uid': spec['uid'], 'serial': [], 'ok': False, 'changed': 0,
+            'errors': ["worker: {0}".format(error or "process crashed")],
+            'timings': {}}
+
+
+def provision(devices, file_name, timeout, max_workers=DEFAULT_MAX_WORKERS,
+              verify=True, opener=None):
+    """ Provision all devices with configuration file.
+
+    :param devices: Found devices (``name``, ``vid``, ``pid``, ``uid``).
+    :param opener: See :func:`provision_device`.
+    :return: Iterator of result dictionaries (in order of completion)
+    """
+    specs = [device_spec(index, device)
+             for index, device in enumerate(devices)]
+    if not specs:
+        return
+
+    # When worker process dies, all pending devices of the pool fail.
+    # Those are tried again, each in its own process.
+    retry = []
+    with ProcessPoolExecutor(min(max_workers, len(specs))) as executor:
+        futures = dict((executor.submit(provision_device, spec, file_name,
+                                        timeout, verify, opener), spec)
+                       for spec in specs)
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                retry.append(futures[future])
+
+    for spec in sorted(retry, key=lambda spec: spec['index']):
+        logger.warning("[provision] Retrying %s in isolated process",
+                       spec['name'])
+        with ProcessPoolExecutor(1) as executor:
+            future = executor.submit(provision_device, spec, file_name,
+                                     timeout, verify, opener)
+            try:
+                yield future.result()
+            except BrokenProcessPool as e:
+                yield _crashed(spec, e)
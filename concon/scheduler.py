@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.scheduler
+    :synopsis: Priority scheduling of requests sharing one device.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Only one request can be on the way to the device at a time (or one window
+with protocol v2). :class:`RequestScheduler` decides which waiting request
+goes next: interactive requests first, then normal, then bulk. Bulk
+operations (downloading all settings, writing configuration file) take the
+device for one setting at a time, so interactive request waits for at most
+one transaction.
+
+.. code-block:: python
+
+     bridge = Bridge(vid, pid, timeout)
+
+     # Status poller thread
+     with bridge.scheduler.priority(RequestScheduler.INTERACTIVE):
+         value = bridge.get_setting_from_device(0, STATUS_CMD_ID)
+
+     # Meanwhile other thread
+     with bridge.scheduler.priority(RequestScheduler.BULK):
+         parser.write_setting_to_device()
+
+     print(bridge.scheduler.metrics())
+
+Bulk requests which wait longer than :attr:`RequestScheduler.aging` are
+served as interactive ones (in order of arrival), so they can not starve.
+"""
+
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from .transport import monotonic
+
+
+class LatencyStats(object):
+    """ Wait and service times of one priority class."""
+
+    SAMPLES = 1000
+    """ Number of recent samples used for percentiles."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_service = 0.0
+        self._waits = deque(maxlen=self.SAMPLES)
+
+    def record(self, wait, service):
+        self.count += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_service += service
+        self._waits.append(wait)
+
+    def percentile(self, percent):
+        """ Wait time percentile of recent requests [s]."""
+        if not self._waits:
+            return 0.0
+        waits = sorted(self._waits)
+        return waits[min(len(waits) - 1, int(len(waits) * percent / 100.0))]
+
+    def as_dict(self):
+        count = self.count or 1
+        return {'count': self.count,
+                'mean_wait': self.total_wait / count,
+                'p99_wait': self.percentile(99),
+                'max_wait': self.max_wait,
+                'mean_service': self.total_service / count}
+
+
+class RequestScheduler(object):
+    """ Fair priority lock for device transactions.
+
+    Lock is reentrant for the owning thread (request can be composed from
+    more transactions). Waiters of the same priority are served in FIFO
+    order.
+    """
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
+    PRIORITY_NAMES = ('interactive', 'normal', 'bulk')
+
+    DEFAULT_AGING = 1.0
+    """ Waiting time after which request is served as interactive [s]."""
+
+    def __init__(self, aging=DEFAULT_AGING):
+        self.aging = aging
+        self._cond = threading.Condition(threading.Lock())
+        self._owner = None
+        self._depth = 0
+        # Waiting tickets ([enqueue time]) of every priority
+        self._queues = [deque() for _ in self.PRIORITY_NAMES]
+        self._local = threading.local()
+        self._stats = [LatencyStats() for _ in self.PRIORITY_NAMES]
+        # Priority and acquire time of current owner
+        self._held = None
+
+    @contextmanager
+    def priority(self, priority):
+        """ Requests of this thread use given priority inside context."""
+        previous = self.current_priority
+        self._local.priority = priority
+        try:
+            yield self
+        finally:
+            self._local.priority = previous
+
+    @property
+    def current_priority(self):
+        """ Priority of requests sent by calling thread."""
+        return getattr(self._local, 'priority', self.NORMAL)
+
+    @contextmanager
+    def slot(self, priority=None):
+        """ Hold the device for one transaction."""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _next_ticket(self, now):
+        """ Ticket which should be served now."""
+        # Starving tickets of lower priority compete with interactive ones,
+        # the oldest goes first
+        candidates = [queue[0] for queue in self._queues[1:]
+                      if queue and now - queue[0][0] > self.aging]
+        if self._queues[0]:
+            candidates.append(self._queues[0][0])
+        if candidates:
+            return min(candidates, key=lambda ticket: ticket[0])
+        for queue in self._queues[1:]:
+            if queue:
+                return queue[0]
+        return None
+
+    def acquire(self, priority=None):
+        if priority is None:
+            priority = self.current_priority
+        me = threading.current_thread()
+
+        with self._cond:
+            if self._owner is me:
+                self._depth += 1
+                return
+
+            start = monotonic()
+            ticket = [start]
+            queue = self._queues[priority]
+            queue.append(ticket)
+            while True:
+                if self._owner is None and \
+                        self._next_ticket(monotonic()) is ticket:
+                    break
+                # Timeout -> aging is evaluated even without notification
+                self._cond.wait(self.aging)
+
+            queue.remove(ticket)
+            self._owner = me
+            self._depth = 1
+            now = monotonic()
+            self._held = (priority, now - start, now)
+
+    def release(self):
+        with self._cond:
+            if self._owner is not threading.current_thread():
+                raise RuntimeError("Scheduler slot released by thread "
+                                   "which does not own it")
+            self._depth -= 1
+            if self._depth:
+                return
+
+            priority, wait, acquired = self._held
+            self._stats[priority].record(wait, monotonic() - acquired)
+            self._owner = None
+            self._held = None
+            self._cond.notify_all()
+
+    def waiting(self, priority=None):
+        """ Number of waiting requests (of given priority)."""
+        with self._cond:
+            if priority is None:
+                return sum(len(queue) for queue in self._queues)
+            return len(self._queues[priority])
+
+    def metrics(self):
+        """ Latency metrics of every priority class (times in seconds)."""
+        with self._cond:
+            return dict((name, stats.as_dict()) for name, stats
+                        in zip(self.PRIORITY_NAMES, self._stats))
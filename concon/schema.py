@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.schema
+    :synopsis: Access to single settings by name without full download.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Uniprot addresses settings by Device ID and CMD ID, users by name. When
+only few settings are needed, names are resolved by :class:`SettingResolver`
+instead of downloading whole configuration:
+
+.. code-block:: python
+
+     bridge = Bridge(vid, pid, timeout, download_settings=False)
+     resolver = SettingResolver(bridge, SchemaCache())
+     cmd_id, setting = resolver.resolve(0, "gain")
+     bridge.set_setting_to_device(0, cmd_id, parse_value(setting, "7"))
+
+Names of all settings of one device (schema) are stored in
+:class:`SchemaCache`, so next time the setting is requested directly. Schema
+is identified by VID, PID and metadata of device (descriptor, number of
+settings), so new firmware gets new schema.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from .HW_bridge_uniprot import DataTypes
+from .utils import ConConError
+
+logger = logging.getLogger(__name__)
+
+
+class SettingNotFound(ConConError):
+    pass
+
+
+class SettingValueError(ConConError):
+    pass
+
+
+def default_cache_dir():
+    """ Per user cache directory of concon schemas."""
+    base = os.environ.get('XDG_CACHE_HOME') or \
+        os.environ.get('LOCALAPPDATA') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'concon', 'schema')
+
+
+def schema_key(bridge, did):
+    """ Identifier of settings layout of given device."""
+    metadata = bridge.device_metadata[did]
+    text = u"{0:04x}:{1:04x}:{2}:{3}:{4}".format(
+        bridge.vid, bridge.pid, did, metadata.descriptor, metadata.max_cmd_id)
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+    return "{0:04x}_{1:04x}_{2}".format(bridge.vid, bridge.pid, digest)
+
+
+class SchemaCache(object):
+    """ Names of settings (name: CMD ID) stored as JSON files."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_cache_dir()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def load(self, key):
+        """ :return: Dictionary name: CMD ID or None when not cached."""
+        try:
+            with open(self._path(key)) as f:
+                return dict((name, int(cmd_id)) for name, cmd_id
+                            in json.load(f)['names'].items())
+        except (IOError, OSError, ValueError, KeyError, TypeError,
+                AttributeError):
+            return None
+
+    def store(self, key, names):
+        """ Store schema. Failure is only logged (cache is optional)."""
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # Concurrent readers never see half written file
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory,
+                                            suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'names': names}, f, indent=1, sort_keys=True)
+            path = self._path(key)
+            if not hasattr(os, 'replace') and os.path.exists(path):
+                os.remove(path)
+            getattr(os, 'replace', os.rename)(tmp_name, path)
+        except (IOError, OSError) as e:
+            logger.warning("[store] Schema not cached: %s", e)
+
+    def invalidate(self, key):
+        try:
+            os.remove(self._path(key))
+        except (IOError, OSError):
+            pass
+
+
+def parse_setting_path(path):
+    """ Split "DID:name" (Device ID 0 when omitted) to (DID, name).
+
+    :raises: ``ValueError`` for invalid Device ID
+    """
+    did, sep, name = path.partition(':')
+    if not sep:
+        return 0, path
+    try:
+        return int(did), name
+    except ValueError:
+        raise ValueError('Expected "DID:name", got "{0}"'.format(path))
+
+
+class SettingResolver(object):
+    """ Find settings of device by name."""
+
+    def __init__(self, bridge, cache=None):
+        """
+        :param bridge: :class:`~concon.HW_bridge_uniprot.Bridge` (settings
+                       do not need to be downloaded).
+        :param cache: Optional :class:`SchemaCache`.
+        """
+        self.bridge = bridge
+        self.cache = cache
+
+    def resolve(self, did, name):
+        """ Get actual setting with given name (or CMD ID). Setting is kept
+        by bridge, so following write needs no extra request.
+
+        :return: (CMD ID, :class:`~concon.structs.SettingStruct`)
+        :raises: :class:`SettingNotFound`
+        """
+        cmd_id, setting = self._resolve(did, name)
+        self.bridge.update_setting(did, cmd_id, setting)
+        return cmd_id, setting
+
+    def _resolve(self, did, name):
+        if did < 0 or did > self.bridge.get_max_device_id():
+            raise SettingNotFound("Invalid Device ID {0}. Maximum Device ID "
+                                  "is {1}".format(
+                                      did, self.bridge.get_max_device_id()))
+        max_cmd_id = self.bridge.device_metadata[did].max_cmd_id
+
+        # Setting given directly by CMD ID
+        if name.isdigit():
+            cmd_id = int(name)
+            if cmd_id > max_cmd_id:
+                raise SettingNotFound("Invalid CMD ID {0}. Maximum CMD ID of "
+                                      "device {1} is {2}".format(
+                                          cmd_id, did, max_cmd_id))
+            return cmd_id, self.bridge.get_setting_from_device(did, cmd_id)
+
+        key = None
+        if self.cache is not None:
+            key = schema_key(self.bridge, did)
+            names = self.cache.load(key)
+            if names is not None and name in names and \
+                    names[name] <= max_cmd_id:
+                cmd_id = names[name]
+                setting = self.bridge.get_setting_from_device(did, cmd_id)
+                if setting.name == name:
+                    return cmd_id, setting
+                logger.info("[resolve] Cached schema %s is outdated", key)
+                self.cache.invalidate(key)
+
+        # Ask device setting by setting. Without cache stop at the first
+        # match, otherwise whole schema is collected for next time
+        names = {}
+        found = None
+        for cmd_id in range(max_cmd_id + 1):
+            setting = self.bridge.get_setting_from_device(did, cmd_id)
+            names.setdefault(setting.name, cmd_id)
+            if found is None and setting.name == name:
+                found = (cmd_id, setting)
+                if key is None:
+                    break
+
+        if key is not None:
+            self.cache.store(key, names)
+        if found is None:
+            raise SettingNotFound("Setting <{0}> not found at device {1} "
+                                  "({2})".format(
+                                      name, did,
+                                      self.bridge.device_metadata[did]
+                                      .descriptor))
+        return found
+
+
+def parse_value(setting, text):
+    """ Convert user value to the value of setting input type.
+
+    :param setting: :class:`~concon.structs.SettingStruct`
+    :param text: Value as string (CMD ID of selected item for groups)
+    :raises: :class:`SettingValueError`
+    """
+    if setting.in_type == DataTypes.VOID:
+        # Function is called, value is not used
+        return 0
+
+    if setting.in_type == DataTypes.CHAR:
+        if len(text) != 1:
+            raise SettingValueError("Setting <{0}> expects one character, "
+                                    "got <{1}>".format(setting.name, text))
+        return text
+
+    try:
+        if setting.in_type == DataTypes.FLOAT:
+            value = float(text)
+        else:
+            # Leading zeros are decimal ("08"), base only by prefix ("0x10")
+            prefix = text.strip().lstrip('+-')[:2].lower()
+            value = int(text, 0 if prefix in ('0x', '0o', '0b') else 10)
+    except ValueError:
+        raise SettingValueError("Incorrect value <{0}> of setting <{1}>. "
+                                "Expected type: {2}".format(
+                                    text, setting.name,
+                                    DataTypes.data_type_to_str(
+                                        setting.in_type)))
+
+    # Range of group is range of CMD IDs of its items
+    if not setting.in_min <= value <= setting.in_max:
+        raise SettingValueError("Value {0} of setting <{1}> is out of range "
+                                "<{2} : {3}>".format(value, setting.name,
+                                                     setting.in_min,
+                                                     setting.in_max))
+    return value
+
+
+def format_value(setting, precision=3):
+    """ Actual value of setting as string (floats rounded as in
+    configuration file).
+    """
+    if setting.out_type == DataTypes.FLOAT:
+        return format(round(setting.out_value, precision))
+    return str(setting.out_value)
+
+
+def write_setting(bridge, did, cmd_id, setting, value):
+    """ Write value and read setting back.
+
+    :param setting: Setting (as resolved) at CMD ID.
+    :param value: Value returned by :func:`parse_value`. Item of group is
+                  selected by its CMD ID.
+    :return: (result code as text, actual setting)
+    """
+    if setting.in_type == DataTypes.GROUP:
+        result = bridge.set_setting_to_device(did, value)
+        return result, bridge.get_setting_from_device(did, cmd_id)
+    result = bridge.set_setting_to_device(did, cmd_id, value)
+    return result, bridge.get_setting(did, cmd_id)
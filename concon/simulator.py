@@ -0,0 +1,638 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.simulator
+    :synopsis: In-process simulator of the Uniprot device firmware.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Device side of Uniprot framing (protocol v1 and v2). Simulator is
+a :class:`~concon.transport.Transport`, so it can be used instead of real
+device. Received payloads are passed to handler and its return value is
+sent back as response.
+
+.. code-block:: python
+
+     # Device which sends every payload back
+     device = UniprotSimulator(handler=lambda payload: payload)
+     uniprot = Uniprot(0, 0, transport=device, protocol_version=2)
+
+:class:`BridgeFirmware` implements requests of
+:class:`~concon.HW_bridge_uniprot.Bridge`. Devices and their settings are
+described by YAML or JSON model (see ``config/simulator_model.yml``):
+
+.. code-block:: python
+
+     device = UniprotSimulator.from_model("model.yml", report_latency=0.001)
+     bridge = Bridge(0, 0, 700, transport=device)
+
+Simulator can be also served over byte stream (see
+:class:`SimulatorStreamServer`), for example over pseudo-terminal created by
+``socat -d -d pty,raw,echo=0 pty,raw,echo=0``::
+
+    $ python -m concon.simulator /dev/pts/3 --model model.yml
+    # and connect SerialTransport("/dev/pts/4")
+
+"""
+
+import json
+import os
+import select
+import struct
+import threading
+import time
+from collections import deque, OrderedDict
+
+import yaml
+
+from .crc16_xmodem import crc_xmodem_update
+from .transport import Transport, monotonic
+from .uniprot import Uniprot
+from .HW_bridge_uniprot import Bridge, DataTypes, ResCodes
+
+
+def _crc16(data):
+    crc16 = 0
+    for i_byte in data:
+        crc16 = crc_xmodem_update(crc16, i_byte)
+    return crc16
+
+
+class UniprotSimulator(Transport):
+    """ Simulated Uniprot device."""
+
+    name = 'simulator'
+
+    REPORT_SIZE = Uniprot.UNI_REPORT_SIZE
+
+    CAPABILITIES = frozenset([Transport.CAP_SIMULATED,
+                              Transport.CAP_DEADLINE])
+
+    def __init__(self, handler=None, max_version=Uniprot.UNI_PROTOCOL_V2,
+                 max_window=Uniprot.UNI_MAX_WINDOW, features=0,
+                 report_latency=0.0, processing_delay=0.0):
+        """
+        :param handler: Callable which gets received payload (list) and
+                        returns response payload. Echo by default.
+        :param max_version: Highest supported protocol version. Simulator
+                            with version 1 ignores negotiation (as old
+                            firmware).
+        :param max_window: Maximum number of requests device can buffer.
+        :param features: Supported optional features (bit mask).
+        :param report_latency: Time needed for transfer of one report in any
+                               direction [s] (USB HID polling interval).
+        :param processing_delay: Time between received request and ready
+                                 response [s].
+        """
+        Transport.__init__(self)
+        self.handler = handler or (lambda payload: list(payload))
+        self.max_version = max_version
+        self.max_window = max_window
+        self.supported_features = features
+        self.report_latency = report_latency
+        self.processing_delay = processing_delay
+        self._open = False
+
+        # Statistics (number of reports)
+        self.rx_reports = 0
+        self.tx_reports = 0
+        # Number of acknowledged responses (protocol v1)
+        self.acknowledged = 0
+
+        self._reset_state()
+
+    @classmethod
+    def from_model(cls, model, **kwargs):
+        """ Simulator of HW bridge described by model.
+
+        :param model: Path to YAML/JSON model file or already loaded model
+                      (dictionary).
+        :param kwargs: Passed to :class:`UniprotSimulator`.
+        """
+        if isinstance(model, dict):
+            firmware = BridgeFirmware(model)
+        else:
+            firmware = BridgeFirmware.from_file(model)
+        return cls(handler=firmware, **kwargs)
+
+    def _reset_state(self):
+        self.version = Uniprot.UNI_PROTOCOL_V1
+        self.window = 1
+        self.features = 0
+
+        # (ready time, report) waiting for host
+        self._tx_queue = deque()
+        # Time when device finishes processing of last request
+        self._busy_until = 0.0
+
+        # Incoming frame (when received in more reports)
+        self._rx_frame = []
+        self._rx_frame_length = 0
+
+        # Protocol v1: last response (waiting for ACK)
+        self._last_response = None
+        # Protocol v2: responses waiting for ACK indexed by sequence number
+        self._responses = OrderedDict()
+
+    # ------------------------------------------------------------------------
+    # Transport interface
+    @property
+    def is_open(self):
+        return self._open
+
+    def open(self):
+        self._reset_state()
+        self._open = True
+
+    def close(self):
+        self._open = False
+
+    def write_report(self, report):
+        """ Report from host to device."""
+        if self.report_latency:
+            time.sleep(self.report_latency)
+        self.rx_reports += 1
+        self._receive_report(list(report))
+
+    def next_response_time(self):
+        """ Time when next report for host is ready (None when nothing is
+        queued).
+        """
+        if not self._tx_queue:
+            return None
+        return self._tx_queue[0][0]
+
+    def read_report(self, deadline=None):
+        """ Report from device to host.
+
+        When nothing is queued, None is returned immediately (there is no
+        reason to wait - simulator knows that nothing will come). Response
+        which is still being processed is waited for until deadline.
+        """
+        if self.report_latency:
+            time.sleep(self.report_latency)
+        if not self._tx_queue:
+            return None
+
+        ready = self._tx_queue[0][0]
+        if ready:
+            now = monotonic()
+            if ready > now:
+                if (deadline is not None) and (deadline < ready):
+                    time.sleep(max(0.0, deadline - now))
+                    return None
+                time.sleep(ready - now)
+
+        self.tx_reports += 1
+        return self._tx_queue.popleft()[1]
+
+    # ------------------------------------------------------------------------
+    def _queue_reports(self, reports):
+        """ Put reports to the output queue (can be overridden to simulate
+        communication problems).
+        """
+        ready = self._busy_until
+        self._tx_queue.extend([(ready, report) for report in reports])
+
+    def _split_to_reports(self, frame):
+        frame = frame + [0x00] * (-len(frame) % self.REPORT_SIZE)
+        return [frame[i:i + self.REPORT_SIZE]
+                for i in range(0, len(frame), self.REPORT_SIZE)]
+
+    def _send_command(self, command_char, seq=None):
+        if seq is None:
+            frame = [command_char]
+        else:
+            frame = [command_char, seq]
+        crc16 = _crc16(frame)
+        frame += [(crc16 >> 8) & 0xFF, crc16 & 0xFF]
+        self._queue_reports(self._split_to_reports(frame))
+
+    def _build_response(self, payload, seq=None):
+        num_of_bytes = len(payload)
+        frame = [Uniprot.UNI_CHAR_HEADER]
+        if seq is not None:
+            frame.append(seq)
+        frame += [(num_of_bytes >> 8) & 0xFF, num_of_bytes & 0xFF,
+                  Uniprot.UNI_CHAR_DATA]
+        frame += list(payload)
+        frame.append(Uniprot.UNI_CHAR_TAIL)
+        crc16 = _crc16(frame)
+        frame += [(crc16 >> 8) & 0xFF, crc16 & 0xFF]
+        return self._split_to_reports(frame)
+
+    def _process_payload(self, payload):
+        if self.processing_delay:
+            self._busy_until = (max(self._busy_until, monotonic()) +
+                                self.processing_delay)
+        response = self.handler(payload)
+        return [] if response is None else list(response)
+
+    # ------------------------------------------------------------------------
+    def _receive_report(self, report):
+        # Continuation of frame
+        if self._rx_frame:
+            self._rx_frame.extend(report)
+            if len(self._rx_frame) >= self._rx_frame_length:
+                frame = self._rx_frame[:self._rx_frame_length]
+                self._rx_frame = []
+                self._process_frame(frame)
+            return
+
+        char = report[0]
+
+        if char == Uniprot.UNI_CHAR_HEADER:
+            self._receive_header(report)
+        elif (char == Uniprot.UNI_CHAR_HEADER_ACK and
+              self.features & Uniprot.UNI_FEATURE_PIGGYBACK_ACK and
+              self.version < Uniprot.UNI_PROTOCOL_V2):
+            self._receive_header(report)
+        elif char == Uniprot.UNI_CHAR_VERSION:
+            self._receive_version(report)
+        elif char == Uniprot.UNI_CHAR_RESET:
+            self._reset_state()
+        elif char in (Uniprot.UNI_CHAR_ACK, Uniprot.UNI_CHAR_NACK):
+            self._receive_command(report)
+        # Anything else is ignored (dummy data)
+
+    def _receive_header(self, report):
+        v2 = self.version >= Uniprot.UNI_PROTOCOL_V2
+        header_length = 5 if v2 else 4
+
+        if report[header_length - 1] != Uniprot.UNI_CHAR_DATA:
+            if v2:
+                self._send_command(Uniprot.UNI_CHAR_NACK, report[1])
+            else:
+                self._send_command(Uniprot.UNI_CHAR_NACK)
+            return
+
+        # Number of data bytes is just before "D" character
+        num_of_bytes = (report[header_length - 3] << 8) + \
+            report[header_length - 2]
+        self._rx_frame_length = header_length + num_of_bytes + 3
+        self._rx_frame = list(report)
+
+        if len(self._rx_frame) >= self._rx_frame_length:
+            frame = self._rx_frame[:self._rx_frame_length]
+            self._rx_frame = []
+            self._process_frame(frame)
+
+    def _process_frame(self, frame):
+        valid = ((_crc16(frame) == 0) and
+                 (frame[-3] == Uniprot.UNI_CHAR_TAIL))
+
+        if self.version < Uniprot.UNI_PROTOCOL_V2:
+            if not valid:
+                self._send_command(Uniprot.UNI_CHAR_NACK)
+                return
+            if (frame[0] == Uniprot.UNI_CHAR_HEADER_ACK and
+                    self._last_response is not None):
+                # Previous response acknowledged by this request
+                self._last_response = None
+                self.acknowledged += 1
+            self._send_command(Uniprot.UNI_CHAR_ACK)
+            self._last_response = self._build_response(
+                self._process_payload(frame[4:-3]))
+            self._queue_reports(self._last_response)
+            return
+
+        seq = frame[1]
+        if not valid:
+            self._send_command(Uniprot.UNI_CHAR_NACK, seq)
+            return
+
+        if seq in self._responses:
+            # Request sent again (response was lost) -> do not process it
+            # again, just send stored response
+            self._send_command(Uniprot.UNI_CHAR_ACK, seq)
+            self._queue_reports(self._responses[seq])
+            return
+
+        if len(self._responses) >= self.window:
+            self._send_command(Uniprot.UNI_CHAR_BUFFER_OVERFLOW, seq)
+            return
+
+        self._send_command(Uniprot.UNI_CHAR_ACK, seq)
+        response = self._build_response(
+            self._process_payload(frame[5:-3]), seq)
+        self._responses[seq] = response
+        self._queue_reports(response)
+
+    def _receive_command(self, report):
+        char = report[0]
+
+        if self.version < Uniprot.UNI_PROTOCOL_V2:
+            if _crc16(report[:3]) != 0:
+                return
+            if char == Uniprot.UNI_CHAR_ACK:
+                if self._last_response is not None:
+                    self.acknowledged += 1
+                self._last_response = None
+            elif self._last_response is not None:
+                # NACK -> send response again
+                self._queue_reports(self._last_response)
+            return
+
+        if _crc16(report[:4]) != 0:
+            return
+        seq = report[1]
+        if char == Uniprot.UNI_CHAR_ACK:
+            self._responses.pop(seq, None)
+        elif seq in self._responses:
+            self._queue_reports(self._responses[seq])
+
+    def _receive_version(self, report):
+        if self.max_version < Uniprot.UNI_PROTOCOL_V2:
+            # Old firmware does not know this command
+            return
+
+        if _crc16(report[:6]) != 0:
+            return
+
+        self.version = min(report[1], self.max_version)
+        self.window = max(1, min(report[2], self.max_window))
+        self.features = report[3] & self.supported_features
+        self._responses.clear()
+        self._last_response = None
+
+        frame = [Uniprot.UNI_CHAR_VERSION, self.version, self.window,
+                 self.features]
+        crc16 = _crc16(frame)
+        frame += [(crc16 >> 8) & 0xFF, crc16 & 0xFF]
+        self._queue_reports(self._split_to_reports(frame))
+
+
+class BridgeFirmware(object):
+    """ Request handler of HW bridge firmware.
+
+    Model structure (values are human readable, they are encoded to
+    the wire format according to data type)::
+
+        devices:
+          - descriptor: "Amplifier"
+            serial: 1
+            settings:
+              - name: gain
+                descriptor: "{S} Gain; step: 1"
+                in_type: uint8      # DataTypes name (case insensitive)
+                in_min: 0
+                in_max: 100
+                out_type: uint8     # Optional - same as input by default
+                out_min: 0
+                out_max: 100
+                value: 42
+    """
+
+    def __init__(self, model):
+        """
+        :param model: Dictionary with device model (see class description).
+        """
+        self.devices = []
+        for device in model['devices']:
+            settings = [self._load_setting(setting)
+                        for setting in device.get('settings', [])]
+            self.devices.append({
+                'descriptor': device.get('descriptor', ""),
+                'serial': device.get('serial', 0),
+                'settings': settings})
+
+        # Statistics
+        self.requests = 0
+
+    @classmethod
+    def from_file(cls, model_file):
+        """ Load model from YAML (or JSON when file ends with .json)."""
+        with open(model_file) as f:
+            if model_file.lower().endswith('.json'):
+                model = json.load(f)
+            else:
+                model = yaml.safe_load(f)
+        return cls(model)
+
+    @staticmethod
+    def _data_type(name):
+        if isinstance(name, int):
+            return name
+        try:
+            return getattr(DataTypes, name.upper())
+        except AttributeError:
+            raise ValueError("Unknown data type '{0}'".format(name))
+
+    @classmethod
+    def _load_setting(cls, setting):
+        in_type = cls._data_type(setting.get('in_type', 'void'))
+        out_type = cls._data_type(setting.get('out_type', in_type))
+        in_min = setting.get('in_min', 0)
+        in_max = setting.get('in_max', 0)
+
+        loaded = {
+            'name': setting['name'],
+            'descriptor': setting.get('descriptor', ""),
+            'in_type': in_type,
+            'in_min': in_min,
+            'in_max': in_max,
+            'out_type': out_type,
+            'out_min': setting.get('out_min', in_min),
+            'out_max': setting.get('out_max', in_max),
+        }
+        # Value is stored encoded (as on device)
+        loaded['value'] = cls.encode(setting.get('value', 0), out_type)
+        return loaded
+
+    @staticmethod
+    def encode(value, data_type):
+        """ Convert value to 32 bit unsigned number (wire format)."""
+        if data_type == DataTypes.VOID:
+            return 0
+        if data_type == DataTypes.CHAR:
+            value = ord(value[0]) if isinstance(value, str) else value
+        elif data_type == DataTypes.FLOAT:
+            return struct.unpack('I', struct.pack('f', value))[0]
+        return int(value) & 0xFFFFFFFF
+
+    @staticmethod
+    def decode(number, data_type):
+        """ Convert 32 bit number received from host to value."""
+        if data_type == DataTypes.FLOAT:
+            return struct.unpack('f', struct.pack('I', number))[0]
+        bits = {DataTypes.INT8: 8, DataTypes.INT16: 16, DataTypes.INT32: 32,
+                DataTypes.INT: 32}.get(data_type)
+        if bits is not None:
+            number &= (1 << bits) - 1
+            if number & (1 << (bits - 1)):
+                number -= 1 << bits
+        return number
+
+    @staticmethod
+    def _uint32(number):
+        return [(number >> 24) & 0xFF, (number >> 16) & 0xFF,
+                (number >> 8) & 0xFF, number & 0xFF]
+
+    @staticmethod
+    def _string(text):
+        return [ord(c) for c in text] + [0x00]
+
+    def __call__(self, payload):
+        self.requests += 1
+        device_id = payload[0]
+        request = payload[1]
+
+        if request == Bridge.STATE_REQUEST_GET_NUM_OF_DEV:
+            return [0x00, ResCodes.SUCCESS, len(self.devices) - 1]
+
+        if device_id >= len(self.devices):
+            return [device_id, ResCodes.INCORRECT_DEVICE_ID]
+        device = self.devices[device_id]
+
+        if request == Bridge.STATE_REQUEST_GET_METADATA:
+            max_cmd_id = len(device['settings']) - 1
+            return ([device_id, ResCodes.SUCCESS,
+                     (max_cmd_id >> 8) & 0xFF, max_cmd_id & 0xFF,
+                     device['serial'] & 0xFF] +
+                    self._string(device['descriptor']))
+
+        if request not in (Bridge.STATE_REQUEST_GET_SETTING,
+                           Bridge.STATE_REQUEST_SET_SETTING):
+            return [device_id, ResCodes.FAIL]
+
+        cmd_id = (payload[2] << 8) + payload[3]
+        if cmd_id >= len(device['settings']):
+            return [device_id, ResCodes.INCORRECT_CMD_ID, payload[2],
+                    payload[3]]
+        setting = device['settings'][cmd_id]
+
+        if request == Bridge.STATE_REQUEST_GET_SETTING:
+            return ([device_id, ResCodes.SUCCESS, payload[2], payload[3],
+                     setting['in_type']] +
+                    self._uint32(self.encode(setting['in_min'],
+                                             setting['in_type'])) +
+                    self._uint32(self.encode(setting['in_max'],
+                                             setting['in_type'])) +
+                    [setting['out_type']] +
+                    self._uint32(self.encode(setting['out_min'],
+                                             setting['out_type'])) +
+                    self._uint32(self.encode(setting['out_max'],
+                                             setting['out_type'])) +
+                    self._uint32(setting['value']) +
+                    self._string(setting['name']) +
+                    self._string(setting['descriptor']))
+
+        # Set setting
+        number = ((payload[4] << 24) + (payload[5] << 16) +
+                  (payload[6] << 8) + payload[7])
+        in_type = setting['in_type']
+        if in_type == DataTypes.VOID:
+            # Group item -> select it in its group (value is CMD ID of item)
+            for group in device['settings']:
+                if ((group['in_type'] == DataTypes.GROUP) and
+                        (group['in_min'] <= cmd_id <= group['in_max'])):
+                    group['value'] = cmd_id
+            return [device_id, ResCodes.SUCCESS]
+
+        if in_type not in (DataTypes.GROUP, DataTypes.CHAR):
+            value = self.decode(number, in_type)
+            if not (setting['in_min'] <= value <= setting['in_max']):
+                return [device_id, ResCodes.INCORRECT_PARAMETER]
+        setting['value'] = number
+        return [device_id, ResCodes.SUCCESS]
+
+
+class SimulatorStreamServer(object):
+    """ Serve simulator over byte stream (file descriptor) from background
+    thread. Reports are sent unchanged (8 Bytes each).
+    """
+
+    POLL_INTERVAL = 0.05
+    """ How often is checked if server should stop [s]."""
+
+    def __init__(self, simulator, fd, read_chunk=4096):
+        """
+        :param simulator: :class:`UniprotSimulator` instance.
+        :param fd: Opened file descriptor (pty, pipe, socket, ...).
+        """
+        self.simulator = simulator
+        self.fd = fd
+        self.read_chunk = read_chunk
+        self._buffer = bytearray()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self.simulator.open()
+        self._running = True
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        name="Simulator stream server")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def serve_forever(self):
+        if not self.simulator.is_open:
+            self.simulator.open()
+        self._running = True
+        size = self.simulator.report_size
+
+        while self._running:
+            # Delayed responses are sent even when host does not write
+            timeout = self.POLL_INTERVAL
+            ready = self.simulator.next_response_time()
+            if ready is not None:
+                timeout = max(0.0, min(timeout, ready - monotonic()))
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(self.fd, self.read_chunk)
+                except OSError:
+                    # Other side closed
+                    break
+                if not data:
+                    break
+                self._buffer.extend(data)
+
+                while len(self._buffer) >= size:
+                    self.simulator.write_report(list(self._buffer[:size]))
+                    del self._buffer[:size]
+
+            response = bytearray()
+            while True:
+                report = self.simulator.read_report(monotonic())
+                if report is None:
+                    break
+                response.extend(report)
+            if response:
+                os.write(self.fd, bytes(response))
+
+
+def main():
+    import argparse
+    import tty
+
+    parser = argparse.ArgumentParser(
+        description="Serve simulated HW bridge over serial port or pty.")
+    parser.add_argument('port', help="Device path (one end of pty pair)")
+    parser.add_argument('--model', default=os.path.join(
+        os.path.dirname(__file__), 'config', 'simulator_model.yml'),
+        help="YAML/JSON device model")
+    parser.add_argument('--processing-delay', type=float, default=0.0,
+                        help="Firmware processing time [s]")
+    args = parser.parse_args()
+
+    fd = os.open(args.port, os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd)
+    server = SimulatorStreamServer(
+        UniprotSimulator.from_model(args.model,
+                                    processing_delay=args.processing_delay),
+        fd)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(fd)
+
+
+if __name__ == '__main__':
+    main()
@@ -58,11 +58,23 @@ class SettingStructChangeParam(SettingStruct):
         self.changed = False
         # In some cases is useful when CMD_ID is also stored in memory
         self.CMD_ID = -1
+        # Cached result of descriptor processing
+        self._descriptor_comment = None
 
     def __str__(self):
         return super(SettingStructChangeParam, self).__str__() + \
                " Changed: {0}\n CMD ID: {1}\n".format(self.changed, self.CMD_ID)
 
+    @property
+    def descriptor_comment(self):
+        """ Descriptor converted to the config file comment (processed only
+        once).
+        """
+        if self._descriptor_comment is None:
+            self._descriptor_comment = process_descriptor_for_configfile(
+                self.descriptor)
+        return self._descriptor_comment
+
     def export_to_config(self, config, did):
 
         # Create section
@@ -71,9 +83,7 @@ class SettingStructChangeParam(SettingStruct):
 
         # If there is some descriptor -> add it!
         if self.descriptor != "":
-            comment = process_descriptor_for_configfile(
-                self.descriptor)
-            config.add_comment(section, comment)
+            config.add_comment(section, self.descriptor_comment)
 
         # Test for input and output type is void
         if ((self.in_type == self.out_type) and
@@ -113,46 +123,48 @@ class SettingStructChangeParam(SettingStruct):
             # If equal - just add comment with data type, min, max and
             # actual value
 
-            # Test if data type is float. Then round it
+            in_min, in_max, out_value = self.in_min, self.in_max, \
+                self.out_value
+            # Test if data type is float. Then round it (only for file,
+            # structure can be exported again)
             if self.in_type == DataTypes.FLOAT:
-                self.in_min = format(round(self.in_min, self.FLOAT_PRECISION))
-                self.in_max = format(round(self.in_max, self.FLOAT_PRECISION))
-                self.out_value = \
-                    format(round(self.out_value, self.FLOAT_PRECISION))
+                in_min = format(round(in_min, self.FLOAT_PRECISION))
+                in_max = format(round(in_max, self.FLOAT_PRECISION))
+                out_value = format(round(out_value, self.FLOAT_PRECISION))
 
             comment = "TYPE: {0} < {1} : {2} > | current value: {3}".format(
                 DataTypes.data_type_to_str(self.in_type),
-                self.in_min,
-                self.in_max,
-                self.out_value)
+                in_min,
+                in_max,
+                out_value)
 
             config.add_comment(section, comment)
 
-            config.set(section, "value", str(self.out_value))
+            config.set(section, "value", str(out_value))
 
         # Else just write in and out type, out value
         else:
-            # Test if data type is float. Then round it
+            in_min, in_max = self.in_min, self.in_max
+            out_min, out_max, out_value = self.out_min, self.out_max, \
+                self.out_value
+            # Test if data type is float. Then round it (only for file)
             if self.in_type == DataTypes.FLOAT:
-                self.in_min = format(round(self.in_min, self.FLOAT_PRECISION))
-                self.in_max = format(round(self.in_max, self.FLOAT_PRECISION))
-                self.out_min = format(
-                    round(self.out_min, self.FLOAT_PRECISION))
-                self.out_max = format(round(self.out_max,
-                                            self.FLOAT_PRECISION))
-                self.out_value = format(round(self.out_value,
-                                              self.FLOAT_PRECISION))
+                in_min = format(round(in_min, self.FLOAT_PRECISION))
+                in_max = format(round(in_max, self.FLOAT_PRECISION))
+                out_min = format(round(out_min, self.FLOAT_PRECISION))
+                out_max = format(round(out_max, self.FLOAT_PRECISION))
+                out_value = format(round(out_value, self.FLOAT_PRECISION))
 
             comment = "IN TYPE: {0} < {1} : {2} >".format(
                 DataTypes.data_type_to_str(self.in_type),
-                self.in_min,
-                self.in_max)
+                in_min,
+                in_max)
             config.add_comment(section, comment)
             comment = "OUT TYPE: {0} < {1} : {2} > | out value: {3}".format(
                 DataTypes.data_type_to_str(self.out_type),
-                self.out_min,
-                self.out_max,
-                self.out_value)
+                out_min,
+                out_max,
+                out_value)
             config.add_comment(section, comment)
 
             config.set(section, "in_value", "not changed")
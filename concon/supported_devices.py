@@ -8,17 +8,33 @@
 
 """
 
+import threading
+
+from .transport import monotonic
 from .usb_driver import UsbDriver
 
 
 class SupportedDevices(list):
     """ Manage supported devices (VIDs, PIDs).
+
+    Connected devices are enumerated in one pass over the USB bus and the
+    result is cached for :attr:`cache_ttl` seconds, so listing, ping and
+    lookup by name do not enumerate the bus again. Call :meth:`invalidate`
+    when a device is connected or disconnected.
     """
 
-    def __init__(self, supported_vids=[], ignored_pids=[]):
+    CACHE_TTL = 2.0
+    """ Default lifetime of enumeration result [s]."""
+
+    def __init__(self, supported_vids=[], ignored_pids=[],
+                 cache_ttl=CACHE_TTL):
         list.__init__(self)
         self.vid_list = supported_vids
         self.pid_ignore_list = ignored_pids
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._cache = None
+        self._cache_time = None
 
     # @classmethod
     # def load_from_config(self, config_file):
@@ -29,18 +45,50 @@ class SupportedDevices(list):
     #         self.vid_list = config['devices']['supported_vids']
     #         self.pid_ignore_list = config['devices']['ignored_pids']
 
-    def get_connected_devices(self):
-        """ Enlist all connected supported devices."""
-        all_devices = []
-        if self.vid_list:
-            for vid in self.vid_list:
-                all_devices += UsbDriver.usb_list_devices(vid)
-
-        if self.pid_ignore_list:
-            return [device for device in all_devices
-                    if not (device.product_id in self.pid_ignore_list)]
-        else:
-            return all_devices
+    def _matcher(self):
+        """ Callable(vid, pid) selecting supported devices."""
+        vids = frozenset(self.vid_list or ())
+        ignored_pids = frozenset(self.pid_ignore_list or ())
+        return lambda vid, pid: vid in vids and pid not in ignored_pids
+
+    def is_supported(self, vid, pid):
+        """ Test if device with given VID/PID is supported."""
+        return self._matcher()(vid, pid)
+
+    def invalidate(self):
+        """ Forget cached enumeration (next call enumerates USB again)."""
+        with self._lock:
+            self._cache = None
+            self._cache_time = None
+
+    def get_connected_devices(self, max_age=None):
+        """ Enlist all connected supported devices.
+
+        :param max_age: Maximum age of cached result [s]. :attr:`cache_ttl`
+                        by default, 0 always enumerates USB.
+        :return: List of :class:`~concon.usb_driver.UsbDevice`
+        """
+        if max_age is None:
+            max_age = self.cache_ttl
+
+        with self._lock:
+            now = monotonic()
+            if self._cache is None or now - self._cache_time > max_age:
+                if self.vid_list:
+                    self._cache = UsbDriver.usb_list_devices(
+                        match=self._matcher())
+                else:
+                    self._cache = []
+                self._cache_time = now
+            return list(self._cache)
+
+    def is_connected(self, device):
+        """ Test if device (found before) is still connected. Cached
+        enumeration is used, so USB is not accessed for every device.
+        """
+        return any(found.uid == device.uid and found.vid == device.vid and
+                   found.pid == device.pid
+                   for found in self.get_connected_devices())
 
 # Example of using this library
 
@@ -0,0 +1,13 @@
+"""
+Transports carry Uniprot reports between host and device. USB HID is the
+default one, others can be registered (see :mod:`concon.transport.registry`).
+"""
+
+from .base import (Transport, TransportException, TransportDeviceNotFound,
+                   monotonic)
+from .registry import (register_transport, available_transports,
+                       get_transport_class, create_transport)
+
+__all__ = ['Transport', 'TransportException', 'TransportDeviceNotFound',
+           'monotonic', 'register_transport', 'available_transports',
+           'get_transport_class', 'create_transport']
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.transport.base
+    :synopsis: Interface between Uniprot and the physical link.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Uniprot works with fixed size reports only. Anything which can write and read
+such reports (USB HID, serial line, simulator, ...) can be used as transport.
+
+"""
+
+import time
+
+from ..utils import ConConError
+
+# Clock used for read deadlines (time.monotonic is not available in Python 2)
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class TransportException(ConConError):
+    pass
+
+
+class TransportDeviceNotFound(TransportException):
+    pass
+
+
+class Transport(object):
+    """ Base class for all transports.
+
+    Subclass must implement :meth:`open`, :meth:`close`,
+    :meth:`write_report` and :meth:`read_report`.
+    """
+
+    name = None
+    """ Name under which is transport registered."""
+
+    REPORT_SIZE = 8
+    """ Size of one report [Bytes]."""
+
+    CAP_HARDWARE = 'hardware'
+    """ Transport talks to real device."""
+
+    CAP_SIMULATED = 'simulated'
+    """ Device is simulated (no hardware needed)."""
+
+    CAP_DEADLINE = 'deadline'
+    """ :meth:`read_report` respects given deadline."""
+
+    CAPABILITIES = frozenset()
+
+    def __init__(self, timeout=None):
+        """
+        :param timeout: Default timeout for :meth:`read_report` [ms].
+        """
+        self.timeout = timeout
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def report_size(self):
+        return self.REPORT_SIZE
+
+    @property
+    def capabilities(self):
+        """ Set of ``CAP_*`` values."""
+        return self.CAPABILITIES
+
+    @property
+    def is_open(self):
+        raise NotImplementedError()
+
+    def open(self):
+        """ Open link to the device.
+
+        :raises TransportDeviceNotFound: When device is not available.
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """ Close link to the device."""
+        raise NotImplementedError()
+
+    def write_report(self, report):
+        """ Send one report.
+
+        :param report: List of :attr:`report_size` integers (0-255).
+        """
+        raise NotImplementedError()
+
+    def read_report(self, deadline=None):
+        """ Receive one report.
+
+        :param deadline: Absolute time (:func:`monotonic`) when waiting is
+                         over. Default timeout is used when not given.
+        :return: Report (list of integers) or None when nothing came in time.
+        """
+        raise NotImplementedError()
+
+    def deadline(self, timeout=None):
+        """ Convert timeout [ms] (default timeout by default) to deadline."""
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is None:
+            return None
+        return monotonic() + timeout * 0.001
+
+    @staticmethod
+    def remaining_ms(deadline):
+        """ Time left to deadline [ms] (never negative)."""
+        return max(0, int((deadline - monotonic()) * 1000))
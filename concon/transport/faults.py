@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.transport.faults
+    :synopsis: Inject communication errors into any transport.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Used to exercise (and measure) recovery paths of Uniprot and Bridge. Faults
+are random, but reproducible when seed is given.
+
+.. code-block:: python
+
+     transport = FaultInjectionTransport(UniprotSimulator.from_model(model),
+                                         drop=0.01, corrupt=0.01, seed=1)
+     bridge = Bridge(0, 0, 700, transport=transport)
+     print(transport.injected)
+
+"""
+
+import random
+import time
+
+from .base import Transport
+from ..crc16_xmodem import crc_xmodem_update
+from ..uniprot import Uniprot
+
+
+class FaultInjectionTransport(Transport):
+    """ Wrap transport and randomly break reports.
+
+    Every rate is probability (0.0 - 1.0) per report.
+    """
+
+    name = 'faults'
+
+    FAULT_DROP = 'drop'
+    FAULT_CORRUPT = 'corrupt'
+    FAULT_DUPLICATE = 'duplicate'
+    FAULT_RESET = 'reset'
+    FAULT_DELAY = 'delay'
+
+    FAULTS = (FAULT_DROP, FAULT_CORRUPT, FAULT_DUPLICATE, FAULT_RESET,
+              FAULT_DELAY)
+
+    def __init__(self, transport, drop=0.0, corrupt=0.0, duplicate=0.0,
+                 reset=0.0, delay=0.0, delay_time=0.01, seed=None):
+        """
+        :param transport: Wrapped (not opened) transport.
+        :param drop: Report is lost (in both directions).
+        :param corrupt: One bit of report is flipped (in both directions).
+        :param duplicate: Report is delivered twice (in both directions).
+        :param reset: Device reports reset instead of response.
+        :param delay: Report is delayed by delay_time [s].
+        :param seed: Seed for random generator (reproducible faults).
+        """
+        Transport.__init__(self, timeout=transport.timeout)
+        self.transport = transport
+        self.rates = {self.FAULT_DROP: drop,
+                      self.FAULT_CORRUPT: corrupt,
+                      self.FAULT_DUPLICATE: duplicate,
+                      self.FAULT_RESET: reset,
+                      self.FAULT_DELAY: delay}
+        self.delay_time = delay_time
+        self._random = random.Random(seed)
+
+        # Report which will be received once again
+        self._duplicate = None
+
+        # Statistics
+        self.injected = dict((fault, 0) for fault in self.FAULTS)
+        self.tx_reports = 0
+        self.rx_reports = 0
+
+    @property
+    def report_size(self):
+        return self.transport.report_size
+
+    @property
+    def capabilities(self):
+        return self.transport.capabilities
+
+    @property
+    def is_open(self):
+        return self.transport.is_open
+
+    def open(self):
+        self._duplicate = None
+        self.transport.open()
+
+    def close(self):
+        self.transport.close()
+
+    def _hit(self, fault):
+        rate = self.rates[fault]
+        if rate and (self._random.random() < rate):
+            self.injected[fault] += 1
+            return True
+        return False
+
+    def _corrupt(self, report):
+        report = list(report)
+        index = self._random.randrange(len(report))
+        report[index] ^= 1 << self._random.randrange(8)
+        return report
+
+    def _reset_report(self):
+        report = [0x00] * self.report_size
+        report[0] = Uniprot.UNI_CHAR_RESET
+        crc16 = crc_xmodem_update(0, report[0])
+        report[1] = (crc16 >> 8) & 0xFF
+        report[2] = crc16 & 0xFF
+        return report
+
+    def write_report(self, report):
+        self.tx_reports += 1
+        if self._hit(self.FAULT_DELAY):
+            time.sleep(self.delay_time)
+        if self._hit(self.FAULT_DROP):
+            return
+        if self._hit(self.FAULT_CORRUPT):
+            report = self._corrupt(report)
+        self.transport.write_report(report)
+        if self._hit(self.FAULT_DUPLICATE):
+            self.transport.write_report(report)
+
+    def read_report(self, deadline=None):
+        self.rx_reports += 1
+        if self._duplicate is not None:
+            report, self._duplicate = self._duplicate, None
+            return report
+
+        if self._hit(self.FAULT_DELAY):
+            time.sleep(self.delay_time)
+
+        report = self.transport.read_report(deadline)
+        if report is None:
+            return None
+
+        if self._hit(self.FAULT_RESET):
+            return self._reset_report()
+        if self._hit(self.FAULT_DROP):
+            return None
+        if self._hit(self.FAULT_CORRUPT):
+            report = self._corrupt(report)
+        if self._hit(self.FAULT_DUPLICATE):
+            self._duplicate = report
+        return report
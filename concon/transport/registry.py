@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.transport.registry
+    :synopsis: Look up transports by name.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Built-in transports are always available. Other packages can add their own
+transport through ``concon.transports`` entry point group:
+
+.. code-block:: python
+
+     setup(
+         ...
+         entry_points={
+             'concon.transports': [
+                 'my_link = my_package.transport:MyLinkTransport'
+             ]
+         })
+
+"""
+
+import importlib
+import logging
+
+from .base import TransportException
+
+logger = logging.getLogger('Transport registry')
+
+ENTRY_POINT_GROUP = 'concon.transports'
+
+# Imported only when used (some of them need optional libraries)
+_BUILTIN_TRANSPORTS = {
+    'usb': 'concon.transport.usb:UsbTransport',
+    'simulator': 'concon.simulator:UniprotSimulator',
+    'recording': 'concon.transport.replay:RecordingTransport',
+    'replay': 'concon.transport.replay:ReplayTransport',
+    'faults': 'concon.transport.faults:FaultInjectionTransport',
+    'serial': 'concon.transport.stream:SerialTransport',
+}
+
+# name -> class or "module:class" string
+_transports = dict(_BUILTIN_TRANSPORTS)
+_entry_points_loaded = False
+
+
+def _iter_entry_points():
+    """ (name, loader) for every transport entry point."""
+    try:
+        from importlib import metadata
+    except ImportError:
+        metadata = None
+
+    if metadata is not None:
+        try:
+            entry_points = metadata.entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python < 3.10
+            entry_points = metadata.entry_points().get(ENTRY_POINT_GROUP, [])
+        return [(ep.name, ep.load) for ep in entry_points]
+
+    try:
+        import pkg_resources
+    except ImportError:
+        return []
+    return [(ep.name, ep.load)
+            for ep in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP)]
+
+
+def _load_entry_points():
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+
+    for name, loader in _iter_entry_points():
+        if name in _transports:
+            # Explicitly registered (or built-in) transport has priority
+            continue
+        _transports[name] = loader
+
+
+def register_transport(name, transport_class):
+    """ Register transport class (or "module:class" string) under name."""
+    _transports[name] = transport_class
+
+
+def available_transports():
+    """ Sorted names of all known transports."""
+    _load_entry_points()
+    return sorted(_transports)
+
+
+def get_transport_class(name):
+    """ Return transport class registered under given name.
+
+    :raises TransportException: When transport is unknown or can not be
+                                imported.
+    """
+    if name not in _transports:
+        _load_entry_points()
+    try:
+        transport_class = _transports[name]
+    except KeyError:
+        raise TransportException(
+            "Unknown transport '{0}'. Available: {1}".format(
+                name, ", ".join(available_transports())))
+
+    if isinstance(transport_class, type):
+        return transport_class
+
+    try:
+        if callable(transport_class):
+            # Entry point loader
+            loaded = transport_class()
+        else:
+            module_name, class_name = transport_class.split(':')
+            loaded = getattr(importlib.import_module(module_name), class_name)
+    except (ImportError, AttributeError) as e:
+        logger.error("[get_transport_class] %s: %s", name, e)
+        raise TransportException(
+            "Transport '{0}' can not be loaded: {1}".format(name, e))
+
+    _transports[name] = loaded
+    return loaded
+
+
+def create_transport(name, *args, **kwargs):
+    """ Create instance of transport registered under given name."""
+    return get_transport_class(name)(*args, **kwargs)
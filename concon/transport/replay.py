@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.transport.replay
+    :synopsis: Record traffic of real session and replay it later.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+:class:`RecordingTransport` wraps any transport and writes every report into
+a binary trace file. :class:`ReplayTransport` serves such trace back to
+Uniprot, so problem seen on customer's device can be reproduced (and
+profiled) without the device.
+
+.. code-block:: python
+
+     # Customer's side
+     transport = RecordingTransport(UsbTransport(vid, pid), "session.cct")
+     bridge = Bridge(vid, pid, timeout, transport=transport)
+
+     # Developer's side (as fast as possible, or with original timing)
+     bridge = Bridge(vid, pid, timeout,
+                     transport=ReplayTransport("session.cct"))
+
+Trace file format (little endian)::
+
+    header: "CCTR", version (1B), report size (1B), reserved (2B)
+    record: timestamp [s] (double), direction (1B), flags (1B),
+            report (report size Bytes)
+
+All records have the same size, so trace can be memory-mapped and accessed
+by index.
+"""
+
+import mmap
+import struct
+import time
+
+from .base import Transport, TransportException, monotonic
+
+
+class TraceFormatError(TransportException):
+    pass
+
+
+class ReplayDiverged(TransportException):
+    """ Host did something else than what was recorded."""
+    pass
+
+
+MAGIC = b'CCTR'
+VERSION = 1
+
+DIR_TX = 0
+""" Report from host to device."""
+DIR_RX = 1
+""" Report from device to host."""
+DIR_OPEN = 2
+""" Transport was (re)opened (report is empty)."""
+
+FLAG_TIMEOUT = 0x01
+""" Nothing came from device in time (RX only)."""
+
+_HEADER = struct.Struct('<4sBBH')
+_RECORD_HEAD = struct.Struct('<dBB')
+
+
+class TraceWriter(object):
+    """ Append records to the trace file."""
+
+    def __init__(self, filename, report_size=Transport.REPORT_SIZE):
+        self.report_size = report_size
+        self._record = struct.Struct('<dBB{0}s'.format(report_size))
+        self._file = open(filename, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, report_size, 0))
+        self._start = monotonic()
+        self.count = 0
+
+    def write(self, direction, report=None):
+        flags = 0
+        if report is None:
+            data = b''
+            if direction == DIR_RX:
+                flags = FLAG_TIMEOUT
+        else:
+            data = bytes(bytearray(report))
+        # Struct pads data by zeros
+        self._file.write(self._record.pack(monotonic() - self._start,
+                                           direction, flags, data))
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class TraceReader(object):
+    """ Memory-mapped trace file. Records are decoded only when accessed.
+
+    Every record is (timestamp, direction, report), report is None when
+    device did not answer in time.
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise TraceFormatError("Empty trace file: " + filename)
+
+        if len(self._map) < _HEADER.size:
+            raise TraceFormatError("Invalid trace file: " + filename)
+        magic, version, report_size, _ = _HEADER.unpack_from(self._map, 0)
+        if (magic != MAGIC) or (version != VERSION):
+            raise TraceFormatError(
+                "Unsupported trace file format: " + filename)
+
+        self.report_size = report_size
+        self._record_size = _RECORD_HEAD.size + report_size
+        # Incomplete record (interrupted recording) is ignored
+        self._count = (len(self._map) - _HEADER.size) // self._record_size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        offset = _HEADER.size + index * self._record_size
+        timestamp, direction, flags = _RECORD_HEAD.unpack_from(self._map,
+                                                               offset)
+        if flags & FLAG_TIMEOUT:
+            report = None
+        else:
+            start = offset + _RECORD_HEAD.size
+            report = list(bytearray(self._map[start:start +
+                                              self.report_size]))
+        return timestamp, direction, report
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self):
+        self._map.close()
+
+
+class RecordingTransport(Transport):
+    """ Pass everything to wrapped transport and record it."""
+
+    name = 'recording'
+
+    def __init__(self, transport, filename):
+        """
+        :param transport: Wrapped (not opened) transport.
+        :param filename: Output trace file (overwritten).
+        """
+        Transport.__init__(self, timeout=transport.timeout)
+        self.transport = transport
+        self.filename = filename
+        self._writer = None
+
+    @property
+    def report_size(self):
+        return self.transport.report_size
+
+    @property
+    def capabilities(self):
+        return self.transport.capabilities
+
+    @property
+    def is_open(self):
+        return self.transport.is_open
+
+    def open(self):
+        if self._writer is None:
+            self._writer = TraceWriter(self.filename, self.report_size)
+        self.transport.open()
+        self._writer.write(DIR_OPEN)
+
+    def close(self):
+        try:
+            self.transport.close()
+        finally:
+            if self._writer is not None:
+                # File stays open - transport can be opened again (reset)
+                self._writer.flush()
+
+    def finish(self):
+        """ Close trace file (no more recording)."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def write_report(self, report):
+        self._writer.write(DIR_TX, report)
+        self.transport.write_report(report)
+
+    def read_report(self, deadline=None):
+        report = self.transport.read_report(deadline)
+        self._writer.write(DIR_RX, report)
+        return report
+
+
+class ReplayTransport(Transport):
+    """ Serve recorded responses back to the host."""
+
+    name = 'replay'
+
+    CAPABILITIES = frozenset([Transport.CAP_SIMULATED])
+
+    def __init__(self, filename, timing=False, speed=1.0, strict=True):
+        """
+        :param filename: Trace recorded by :class:`RecordingTransport`.
+        :param timing: Keep original timing (sleep between reports).
+        :param speed: Timing multiplier (2.0 -> twice as fast as original).
+        :param strict: Raise :class:`ReplayDiverged` when host sends
+                       different report than recorded one.
+        """
+        Transport.__init__(self)
+        self.filename = filename
+        self.timing = timing
+        self.speed = speed
+        self.strict = strict
+        self._trace = TraceReader(filename)
+        self._index = 0
+        self._open = False
+        # Trace time -> local time offset (set by first record)
+        self._time_offset = None
+
+    @property
+    def report_size(self):
+        return self._trace.report_size
+
+    @property
+    def is_open(self):
+        return self._open
+
+    @property
+    def position(self):
+        """ Index of next record."""
+        return self._index
+
+    @property
+    def finished(self):
+        return self._index >= len(self._trace)
+
+    def open(self):
+        if (not self.finished and
+                self._trace[self._index][1] == DIR_OPEN):
+            self._next(DIR_OPEN)
+        self._open = True
+
+    def close(self):
+        self._open = False
+
+    def _wait(self, timestamp):
+        timestamp = timestamp / self.speed
+        now = monotonic()
+        if self._time_offset is None:
+            self._time_offset = now - timestamp
+            return
+        delay = timestamp + self._time_offset - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def _next(self, direction):
+        if self.finished:
+            raise ReplayDiverged("End of trace reached (record {0})".format(
+                self._index))
+        timestamp, rec_direction, report = self._trace[self._index]
+        if rec_direction != direction:
+            raise ReplayDiverged(
+                "Record {0}: expected direction {1}, host did {2}".format(
+                    self._index, rec_direction, direction))
+        if self.timing:
+            self._wait(timestamp)
+        self._index += 1
+        return report
+
+    def write_report(self, report):
+        recorded = self._next(DIR_TX)
+        if self.strict and (recorded != list(report)):
+            raise ReplayDiverged(
+                "Record {0}: host sent {1}, recorded {2}".format(
+                    self._index - 1, list(report), recorded))
+
+    def read_report(self, deadline=None):
+        return self._next(DIR_RX)
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.transport.stream
+    :synopsis: Uniprot reports over byte stream (UART, pseudo-terminal).
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Reports are sent over the stream unchanged (8 Bytes each). Stream has no
+report boundaries, so received bytes are read in large chunks and split to
+reports by :class:`ReportFramer`. When bytes are lost or garbage is received,
+framer drops bytes until it finds valid start of frame (``H...D`` header or
+status command with correct CRC). Header valid for both protocol versions is
+accepted only when the whole frame has correct CRC.
+
+.. code-block:: python
+
+     transport = SerialTransport("/dev/ttyUSB0", baudrate=921600)
+     bridge = Bridge(0, 0, 700, transport=transport)
+
+`pyserial <https://pypi.org/project/pyserial/>`_ is used when installed.
+Without it, only POSIX devices (including pseudo-terminals created by
+``socat -d -d pty,raw,echo=0 pty,raw,echo=0``) are supported.
+"""
+
+import errno
+import os
+import select
+
+from .base import Transport, TransportException, TransportDeviceNotFound, \
+    monotonic
+from ..crc16_xmodem import crc_xmodem_update
+from ..usb_driver import UsbDriver
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+try:
+    import termios
+    import tty
+except ImportError:
+    termios = None
+
+
+def _crc16(data):
+    crc16 = 0
+    for i_byte in data:
+        crc16 = crc_xmodem_update(crc16, i_byte)
+    return crc16
+
+
+class ReportFramer(object):
+    """ Split received byte stream into reports."""
+
+    CHAR_HEADER = ord('H')
+    CHAR_DATA = ord('D')
+    CHAR_VERSION = ord('V')
+    STATUS_CHARS = (ord('A'), ord('N'), ord('R'), ord('O'))
+
+    def __init__(self, report_size=Transport.REPORT_SIZE):
+        self.report_size = report_size
+        self._buffer = bytearray()
+        # Number of reports which belong to already accepted header
+        self._continuation = 0
+
+        # Statistics
+        self.dropped_bytes = 0
+
+    def __len__(self):
+        """ Number of buffered bytes."""
+        return len(self._buffer)
+
+    def feed(self, data):
+        self._buffer.extend(data)
+
+    def reset(self):
+        self._buffer = bytearray()
+        self._continuation = 0
+
+    def _frame_lengths(self, report):
+        """ Possible lengths of frame starting by this report (empty when
+        report is not valid start of frame).
+        """
+        char = report[0]
+        if char == self.CHAR_HEADER:
+            lengths = []
+            if report[3] == self.CHAR_DATA:
+                # Protocol v1: H, LEN_H, LEN_L, D
+                lengths.append(4 + (report[1] << 8) + report[2] + 3)
+            if report[4] == self.CHAR_DATA:
+                # Protocol v2: H, SEQ, LEN_H, LEN_L, D
+                lengths.append(5 + (report[2] << 8) + report[3] + 3)
+            return lengths
+        elif char in self.STATUS_CHARS:
+            # Protocol v1 (3 Bytes) or v2 (4 Bytes - with sequence number)
+            return [3 if _crc16(report[:3]) == 0 else 4]
+        elif char == self.CHAR_VERSION:
+            return [6]
+        return []
+
+    def _is_valid_frame(self, length):
+        """ Check tail and CRC of frame (whole frame must be buffered)."""
+        if length > 6 and self._buffer[length - 3] != ord('T'):
+            return False
+        return _crc16(self._buffer[:length]) == 0
+
+    def _choose_frame_length(self, report):
+        """ Length of frame starting by this report. 0 when report is not
+        valid start of frame, None when more bytes are needed to decide.
+        """
+        lengths = self._frame_lengths(report)
+        if len(lengths) == 1:
+            length = lengths[0]
+            # When whole frame is in this report, CRC is checked too
+            if length <= self.report_size and \
+                    not self._is_valid_frame(length):
+                return 0
+            return length
+
+        # Header is valid for both protocol versions (e.g. v2 frame with
+        # LEN_L equal to 'D'). Only whole frame with correct CRC decides.
+        waiting = False
+        for length in lengths:
+            if length > len(self._buffer):
+                waiting = True
+            elif self._is_valid_frame(length):
+                return length
+        return None if waiting else 0
+
+    def next_report(self):
+        """ Return next complete report or None."""
+        size = self.report_size
+        while len(self._buffer) >= size:
+            report = list(self._buffer[:size])
+
+            if self._continuation:
+                self._continuation -= 1
+            else:
+                frame_length = self._choose_frame_length(report)
+                if frame_length is None:
+                    return None
+                if not frame_length:
+                    # Out of sync -> try next byte
+                    del self._buffer[0]
+                    self.dropped_bytes += 1
+                    continue
+                self._continuation = (frame_length - 1) // size
+
+            del self._buffer[:size]
+            return report
+        return None
+
+
+class StreamTransport(Transport):
+    """ Base for byte stream transports. Subclass implements
+    :meth:`_read_bytes` and :meth:`_write_bytes`.
+    """
+
+    DEFAULT_READ_CHUNK = 4096
+
+    def __init__(self, timeout=UsbDriver.USB_TIMEOUT_MS,
+                 read_chunk=DEFAULT_READ_CHUNK):
+        """
+        :param timeout: Default read timeout [ms].
+        :param read_chunk: Maximum number of bytes read at once.
+        """
+        Transport.__init__(self, timeout=timeout)
+        self.read_chunk = read_chunk
+        self.framer = ReportFramer(self.REPORT_SIZE)
+
+    def _read_bytes(self, max_bytes, timeout):
+        """ Read up to max_bytes. Wait at most timeout [s] for first byte.
+        Return empty bytes on time out.
+        """
+        raise NotImplementedError()
+
+    def _write_bytes(self, data):
+        raise NotImplementedError()
+
+    def write_report(self, report):
+        self._write_bytes(bytes(bytearray(report)))
+
+    def read_report(self, deadline=None):
+        if deadline is None:
+            deadline = self.deadline()
+
+        while True:
+            report = self.framer.next_report()
+            if report is not None:
+                return report
+
+            timeout = 0.0
+            if deadline is not None:
+                timeout = max(0.0, deadline - monotonic())
+            data = self._read_bytes(self.read_chunk, timeout)
+            if data:
+                self.framer.feed(data)
+            elif (deadline is None) or (monotonic() >= deadline):
+                return None
+
+
+class SerialTransport(StreamTransport):
+    """ Serial line (or pseudo-terminal) transport."""
+
+    name = 'serial'
+
+    CAPABILITIES = frozenset([Transport.CAP_HARDWARE, Transport.CAP_DEADLINE])
+
+    DEFAULT_BAUDRATE = 115200
+
+    def __init__(self, port, baudrate=DEFAULT_BAUDRATE,
+                 timeout=UsbDriver.USB_TIMEOUT_MS,
+                 read_chunk=StreamTransport.DEFAULT_READ_CHUNK):
+        """
+        :param port: Device path (/dev/ttyUSB0, /dev/pts/3, COM3, ...).
+        :param baudrate: Line speed [Bd]. Ignored by pseudo-terminals.
+        """
+        StreamTransport.__init__(self, timeout=timeout, read_chunk=read_chunk)
+        self.port = port
+        self.baudrate = baudrate
+        self._serial = None
+        self._fd = None
+
+    def __str__(self):
+        return "Serial {0} ({1} Bd)".format(self.port, self.baudrate)
+
+    @property
+    def is_open(self):
+        return (self._serial is not None) or (self._fd is not None)
+
+    def open(self):
+        self.framer.reset()
+
+        if serial is not None:
+            try:
+                self._serial = serial.Serial(self.port, self.baudrate,
+                                             timeout=0)
+            except serial.SerialException as e:
+                raise TransportDeviceNotFound(str(e))
+            return
+
+        if termios is None:
+            raise TransportException(
+                "Serial transport needs pyserial on this platform")
+        try:
+            fd = os.open(self.port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        except OSError as e:
+            raise TransportDeviceNotFound(str(e))
+
+        try:
+            tty.setraw(fd)
+            attributes = termios.tcgetattr(fd)
+            speed = getattr(termios, 'B{0}'.format(self.baudrate), None)
+            if speed is not None:
+                attributes[4] = attributes[5] = speed
+            termios.tcsetattr(fd, termios.TCSANOW, attributes)
+        except termios.error:
+            # Not a terminal (pipe, socket) -> use it as it is
+            pass
+        self._fd = fd
+
+    def close(self):
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _check_open(self):
+        if not self.is_open:
+            raise TransportException("Serial port is not opened")
+
+    def _write_bytes(self, data):
+        self._check_open()
+        if self._serial is not None:
+            self._serial.write(data)
+            return
+
+        while data:
+            try:
+                written = os.write(self._fd, data)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    # Output buffer full -> wait
+                    select.select([], [self._fd], [])
+                    continue
+                raise TransportDeviceNotFound(str(e))
+            data = data[written:]
+
+    def _read_bytes(self, max_bytes, timeout):
+        self._check_open()
+        if self._serial is not None:
+            self._serial.timeout = timeout
+            data = self._serial.read(1)
+            if data and self._serial.in_waiting:
+                data += self._serial.read(min(max_bytes - 1,
+                                              self._serial.in_waiting))
+            return data
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return b''
+        try:
+            return os.read(self._fd, max_bytes)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return b''
+            raise TransportDeviceNotFound(str(e))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.transport.usb
+    :synopsis: USB HID transport (pyusb on Linux, pywinusb on Windows).
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+"""
+
+from .base import Transport, TransportException, TransportDeviceNotFound
+from ..usb_driver import UsbDriver, UsbDevice
+
+
+class UsbTransport(Transport):
+    """ Transport over USB HID device with given VID/PID."""
+
+    name = 'usb'
+
+    CAPABILITIES = frozenset([Transport.CAP_HARDWARE, Transport.CAP_DEADLINE])
+
+    # Returned by USB driver when time out occurs
+    _TIMEOUT_PATTERN = [0xFF0] * Transport.REPORT_SIZE
+
+    def __init__(self, vid, pid, timeout=UsbDriver.USB_TIMEOUT_MS, uid=None,
+                 name='NA'):
+        Transport.__init__(self, timeout=timeout)
+        self.vid = vid
+        self.pid = pid
+        self.device = UsbDevice(name, vid, pid, uid, timeout=timeout)
+
+    def __str__(self):
+        return "USB {0:04X}:{1:04X}".format(self.vid, self.pid)
+
+    @property
+    def is_open(self):
+        return self.device.usb_device is not None
+
+    def open(self):
+        res = self.device.open(timeout=self.timeout)
+
+        if res == 404:
+            self.device.usb_device = None
+            raise TransportDeviceNotFound(" Device not found!\n")
+
+        if res == -1:
+            self.device.usb_device = None
+            raise TransportException(" RX buffer has invalid size!\n")
+
+    def close(self):
+        if not self.is_open:
+            return
+        status = self.device.close()
+        if status != 0:
+            raise TransportDeviceNotFound(" Device not found!\n")
+
+    def write_report(self, report):
+        # Time out is reported by driver and solved by Uniprot (no response)
+        self.device.tx_data(report)
+
+    def read_report(self, deadline=None):
+        if deadline is None:
+            report = self.device.rx_data()
+        else:
+            # Driver needs at least 1 ms
+            report = self.device.rx_data(
+                timeout=max(1, self.remaining_ms(deadline)))
+
+        if report == self._TIMEOUT_PATTERN:
+            return None
+        return report
@@ -8,8 +8,12 @@
 """
 
 import logging.config
+import threading
+from contextlib import contextmanager
 from .crc16_xmodem import *
-from .usb_driver import UsbDriver, UsbDevice
+from .usb_driver import UsbDriver
+from .transport import TransportException, TransportDeviceNotFound, monotonic
+from .transport.usb import UsbTransport
 
 logger = logging.getLogger('Uniprot <---> USB')
 
@@ -63,6 +67,28 @@ class UniStatus(object):
         self.uni_sr_flag_tx_done = False
 
 
+class UniTransaction(object):
+    """ State of one request (packet configuration, status flags and
+    received data). Every thread has its own transaction, so threads
+    sharing one device do not overwrite configuration of each other.
+    """
+
+    def __init__(self, i_tx_num_of_data_bytes=None,
+                 i_rx_max_num_of_data_bytes=None):
+        self.packet_config = UniPacketConfig()
+        self.status = UniStatus()
+        self.i_buffer_rx = None
+
+        if i_tx_num_of_data_bytes is not None:
+            self.packet_config.i_tx_num_of_data_bytes = i_tx_num_of_data_bytes
+            self.packet_config.i_tx_config_done = True
+            self.status.uni_sr_flag_tx_done = True
+        if i_rx_max_num_of_data_bytes is not None:
+            self.packet_config.i_rx_max_num_of_data_bytes = \
+                i_rx_max_num_of_data_bytes
+            self.packet_config.i_rx_config_done = True
+
+
 class Uniprot(object):
 
     UNI_MAX_NACK_RETRY_COUNT = 10
@@ -103,57 +129,340 @@ class Uniprot(object):
 
     UNI_CHAR_BUFFER_OVERFLOW = ord('O')
 
-    def __init__(self, vid, pid, timeout=UsbDriver.USB_TIMEOUT_MS):
-        """Connect to the target device if possible"""
+    UNI_CHAR_VERSION = ord('V')
+
+    UNI_CHAR_HEADER_ACK = ord('K')
+    """ Header of request frame which also acknowledges previous response
+    (see :attr:`UNI_FEATURE_PIGGYBACK_ACK`).
+    """
+
+    UNI_PROTOCOL_V1 = 1
+    """ Original stop-and-wait protocol."""
+
+    UNI_PROTOCOL_V2 = 2
+    """ Frames are tagged by sequence number and more requests can be
+    outstanding at once (see :meth:`usb_transfer_window`).
+    """
+
+    UNI_DEFAULT_WINDOW = 4
+    """ Default number of outstanding requests (protocol v2)."""
+
+    UNI_MAX_WINDOW = 64
+
+    UNI_REPORT_SIZE = 8
+
+    UNI_FEATURE_PIGGYBACK_ACK = 0x01
+    """ Protocol v1 only. ACK of received response is not sent as separate
+    command, but next request frame starts with :attr:`UNI_CHAR_HEADER_ACK`
+    instead of :attr:`UNI_CHAR_HEADER`. When there is no next request,
+    explicit ACK is sent after :attr:`UNI_ACK_IDLE_TIMEOUT_S`.
+    """
+
+    UNI_ACK_IDLE_TIMEOUT_S = 0.05
+    """ How long can be ACK delayed (piggybacked ACK mode)."""
+
+    # Kinds of frames returned by _v2_rx_frame()
+    _V2_TIMEOUT = 0
+    _V2_STATUS = 1
+    _V2_DATA = 2
+    _V2_CORRUPTED = 3
+    _V2_RESET = 4
+
+    def __init__(self, vid, pid, timeout=UsbDriver.USB_TIMEOUT_MS,
+                 trace=None, protocol_version=UNI_PROTOCOL_V1,
+                 window=UNI_DEFAULT_WINDOW, transport=None, features=0,
+                 ack_idle_timeout=UNI_ACK_IDLE_TIMEOUT_S):
+        """Connect to the target device if possible
+
+        :param trace: Optional :class:`~concon.wire_trace.WireTrace`. When
+                      given, every raw report is recorded into it.
+        :param protocol_version: Highest protocol version which will be
+                                 negotiated with device. When device does not
+                                 support it, protocol v1 is used.
+        :param window: Maximum number of outstanding requests (protocol v2).
+        :param transport: :class:`~concon.transport.Transport` instance
+                          (not opened yet). USB device with given VID/PID
+                          is used by default.
+        :param features: Optional features (``UNI_FEATURE_*`` bit mask)
+                         which will be negotiated with device.
+        :param ack_idle_timeout: Maximum delay of piggybacked ACK [s].
+        """
         self._usb_vid = vid
         self._usb_pid = pid
         self._timeout = timeout
-        self._device = UsbDevice('NA', vid, pid, None)
-        res = self._device.open(timeout=timeout)
+        self._trace = trace
+        if transport is None:
+            transport = UsbTransport(vid, pid, timeout=timeout)
+        self._transport = transport
+        self._open_transport()
+
+        # Current transaction (UniTransaction) of every thread
+        self._local = threading.local()
+
+        self._requested_version = protocol_version
+        self._requested_window = window
+        self._requested_features = features
+        self._protocol_version = self.UNI_PROTOCOL_V1
+        self._window = 1
+        self._features = 0
+        self._v2_seq = 0
+
+        # Held during whole transaction, so frames of more threads (or ACK
+        # sent by idle timer) are never mixed.
+        self._lock = threading.RLock()
+        self._ack_idle_timeout = ack_idle_timeout
+        self._ack_pending = False
+        self._ack_timer = None
+
+        if (protocol_version >= self.UNI_PROTOCOL_V2) or features:
+            self.negotiate(protocol_version, window, features)
+
+    @property
+    def transport(self):
+        return self._transport
+
+    @property
+    def lock(self):
+        """ Reentrant lock held during every transaction. Hold it when
+        request is composed from more calls (:meth:`usb_tx_data`,
+        :meth:`usb_rx_data`) and device is shared by more threads.
+        """
+        return self._lock
+
+    @property
+    def _transaction(self):
+        """ Transaction of calling thread."""
+        transaction = getattr(self._local, 'transaction', None)
+        if transaction is None:
+            transaction = self._local.transaction = UniTransaction()
+        return transaction
+
+    @contextmanager
+    def transaction(self, i_tx_num_of_data_bytes,
+                    i_rx_max_num_of_data_bytes):
+        """ Device is reserved for calling thread and packets are
+        configured only for this request.
+
+        .. code-block:: python
+
+             with uniprot.transaction(len(request), 256):
+                 uniprot.usb_tx_data(request)
+                 response = uniprot.usb_rx_data()
+        """
+        with self._lock:
+            previous = getattr(self._local, 'transaction', None)
+            self._local.transaction = UniTransaction(
+                i_tx_num_of_data_bytes, i_rx_max_num_of_data_bytes)
+            try:
+                yield self._local.transaction
+            finally:
+                self._local.transaction = previous
 
-        if res == 404:
-            raise UniprotExceptionDeviceNotFound(" Device not found!\n")
+    def transfer(self, i_tx_data, i_rx_max_num_of_data_bytes):
+        """ Send request and receive response as one atomic operation
+        (protocol v1).
 
-        if res == -1:
-            raise UniprotException(" RX buffer has invalid size!\n")
+        :return: Received data
+        """
+        with self.transaction(len(i_tx_data), i_rx_max_num_of_data_bytes):
+            self._usb_tx_data(i_tx_data)
+            return self._usb_rx_data()
+
+    @property
+    def protocol_version(self):
+        """ Protocol version negotiated with device."""
+        return self._protocol_version
+
+    @property
+    def window(self):
+        """ Maximum number of outstanding requests (1 for protocol v1)."""
+        return self._window
+
+    @property
+    def features(self):
+        """ Optional features negotiated with device (bit mask)."""
+        return self._features
+
+    @property
+    def piggyback_ack(self):
+        """ True if ACK is folded into the next request frame."""
+        return bool((self._features & self.UNI_FEATURE_PIGGYBACK_ACK) and
+                    (self._protocol_version == self.UNI_PROTOCOL_V1))
+
+    def negotiate(self, version=UNI_PROTOCOL_V2, window=UNI_DEFAULT_WINDOW,
+                  features=0):
+        """ Ask device to switch to newer protocol version.
+
+        Device answers with version, window and features which are not
+        higher than requested. Device which does not know this command (old
+        firmware) does not answer with version frame, so protocol v1 without
+        any optional feature is kept.
+
+        Version frame: V, VERSION, WINDOW, FEATURES, CRC_H, CRC_L
+
+        :return: Negotiated protocol version.
+        """
+        window = max(1, min(window, self.UNI_MAX_WINDOW))
+
+        # Device forgets unacknowledged response anyway
+        self._cancel_pending_ack()
+
+        i_buffer_tx = [0x00] * self.UNI_REPORT_SIZE
+        i_buffer_tx[0] = self.UNI_CHAR_VERSION
+        i_buffer_tx[1] = version & 0xFF
+        i_buffer_tx[2] = window
+        i_buffer_tx[3] = features & 0xFF
+        crc16 = 0
+        for i in range(4):
+            crc16 = crc_xmodem_update(crc16, i_buffer_tx[i])
+        i_buffer_tx[4] = (crc16 >> 8) & 0xFF
+        i_buffer_tx[5] = crc16 & 0xFF
 
-        self._packet_config = UniPacketConfig()
-        self._status = UniStatus()
-        self._i_buffer_rx = None
+        self._tx_report(i_buffer_tx)
+        i_buffer_rx = self._rx_report()
+
+        crc16 = 0
+        for i in range(6):
+            crc16 = crc_xmodem_update(crc16, i_buffer_rx[i])
+
+        if ((i_buffer_rx[0] == self.UNI_CHAR_VERSION) and (crc16 == 0) and
+                (self.UNI_PROTOCOL_V1 <= i_buffer_rx[1] <= version) and
+                (1 <= i_buffer_rx[2] <= window)):
+            self._protocol_version = i_buffer_rx[1]
+            if self._protocol_version >= self.UNI_PROTOCOL_V2:
+                self._window = i_buffer_rx[2]
+            else:
+                self._window = 1
+            self._features = i_buffer_rx[3] & features
+        else:
+            if i_buffer_rx[0] <= 0xFF:
+                # Device answered something else -> throw rest of answer
+                self.usb_clear_rx_buffer(1)
+            self._protocol_version = self.UNI_PROTOCOL_V1
+            self._window = 1
+            self._features = 0
+
+        logger.info("[Uniprot_negotiate] Protocol version: %s, window: %s,"
+                    " features: 0x%02X", self._protocol_version, self._window,
+                    self._features)
+        return self._protocol_version
+
+    def _renegotiate(self):
+        """ Device starts with protocol v1 after reset -> negotiate again."""
+        self._protocol_version = self.UNI_PROTOCOL_V1
+        self._window = 1
+        self._features = 0
+        if (self._requested_version >= self.UNI_PROTOCOL_V2) or \
+                self._requested_features:
+            self.negotiate(self._requested_version, self._requested_window,
+                           self._requested_features)
+
+    def _defer_ack(self):
+        """ Remember that last response was not acknowledged yet. ACK is
+        sent with next request or by idle timer.
+        """
+        # Only one idle timer runs
+        self._cancel_pending_ack()
+        self._ack_pending = True
+        self._ack_timer = threading.Timer(self._ack_idle_timeout,
+                                          self._on_ack_idle)
+        self._ack_timer.daemon = True
+        self._ack_timer.start()
+
+    def _take_pending_ack(self):
+        """ Return True if next request should acknowledge last response.
+        """
+        pending = self._ack_pending
+        self._cancel_pending_ack()
+        return pending
+
+    def _cancel_pending_ack(self):
+        self._ack_pending = False
+        if self._ack_timer is not None:
+            self._ack_timer.cancel()
+            self._ack_timer = None
+
+    def _on_ack_idle(self):
+        try:
+            self.flush_ack()
+        except Exception as e:
+            logger.error("[Uniprot_ack_idle] Can not send ACK: %s", e)
+
+    def flush_ack(self):
+        """ Send delayed ACK (piggybacked ACK mode) immediately."""
+        with self._lock:
+            if self._take_pending_ack():
+                self.usb_tx_command(self.UNI_CHAR_ACK)
 
     def close(self):
         """Disconnect from the target device if possible."""
+        try:
+            self.flush_ack()
+        except Exception:
+            # Device is probably gone already
+            self._cancel_pending_ack()
 
-        status = self._device.close()
+        try:
+            self._transport.close()
+        except TransportException as e:
+            raise UniprotExceptionDeviceNotFound(str(e))
 
-        if status != 0:
-            raise UniprotExceptionDeviceNotFound(" Device not found!\n")
+    def _open_transport(self):
+        try:
+            self._transport.open()
+        except TransportDeviceNotFound as e:
+            raise UniprotExceptionDeviceNotFound(str(e))
+        except TransportException as e:
+            raise UniprotException(str(e))
+
+    def _tx_report(self, i_buffer_tx):
+        """ Send one raw report to the device (trace it if enabled)."""
+        if self._trace is not None:
+            self._trace.record(self._trace.DIR_TX, i_buffer_tx)
+        self._transport.write_report(i_buffer_tx)
+
+    def _rx_report(self):
+        """ Receive one raw report from the device (trace it if enabled).
+
+        When nothing came in time, time out pattern (values > 255) is
+        returned.
+        """
+        i_buffer_rx = self._transport.read_report(
+            monotonic() + self._timeout * 0.001)
+        if i_buffer_rx is None:
+            i_buffer_rx = [0xFF0] * self._transport.report_size
+        if self._trace is not None:
+            self._trace.record(self._trace.DIR_RX, i_buffer_rx)
+        return i_buffer_rx
 
     def config_tx_packet(self, i_tx_num_of_data_bytes):
         """ Configure TX packet - define data frame size.
 
         :param i_tx_num_of_data_bytes: Number of data Bytes
         """
+        transaction = self._transaction
+        packet_config = transaction.packet_config
 
-        self._packet_config.i_tx_num_of_data_bytes = i_tx_num_of_data_bytes
+        packet_config.i_tx_num_of_data_bytes = i_tx_num_of_data_bytes
 
-        self._packet_config.i_tx_config_done = True
+        packet_config.i_tx_config_done = True
 
         # Test if there is any problem with TX device
-        if not self._status.uni_sr_error_flag_general_tx:
+        if not transaction.status.uni_sr_error_flag_general_tx:
             # If there is not any problem -> set TX_done flag
-            self._status.uni_sr_flag_tx_done = True
+            transaction.status.uni_sr_flag_tx_done = True
 
     def config_rx_packet(self, i_rx_max_num_of_data_bytes):
         """ Configure RX packet - define data frame size.
 
         :param i_rx_max_num_of_data_bytes:
         """
+        packet_config = self._transaction.packet_config
 
-        self._packet_config.i_rx_max_num_of_data_bytes = \
+        packet_config.i_rx_max_num_of_data_bytes = \
             i_rx_max_num_of_data_bytes
 
-        self._packet_config.i_rx_config_done = True
+        packet_config.i_rx_config_done = True
 
     @classmethod
     def process_rx_status_data(cls, buffer_rx):
@@ -173,8 +482,8 @@ class Uniprot(object):
         crc16 = crc_xmodem_update(crc16, buffer_rx[0])
         crc16 = crc_xmodem_update(crc16, buffer_rx[1])
         crc16 = crc_xmodem_update(crc16, buffer_rx[2])
-        logger.debug(
-            "[Uni_process_rx_status_data] CRC result: " + str(crc16) + "\n\n")
+        logger.debug("[Uni_process_rx_status_data] CRC result: %s\n\n",
+                     crc16)
 
         if crc16 != 0:
             return cls.UNI_RES_CODE_CRC_ERROR
@@ -238,20 +547,24 @@ class Uniprot(object):
             self.usb_clear_rx_buffer(3)
 
         # Buffer is ready, send data
-        self._device.tx_data(i_buffer_tx)
+        self._tx_report(i_buffer_tx)
 
-    def usb_try_tx_data(self, i_tx_data):
+    def usb_try_tx_data(self, i_tx_data, ack_previous=False):
         """ Try send data and return command code (ACK, NACK and so on).
 
         :param i_tx_data:  Data (array) witch will be send.
+        :param ack_previous: Acknowledge previous response by this frame
+                             (piggybacked ACK mode).
         :return: Status code.
         """
+        transaction = self._transaction
+        packet_config = transaction.packet_config
 
         # Temporary buffer for TX data (8 Bytes)
         i_buffer_tx = [0x00] * 8
 
         # Temporary buffer for RX data (8 Bytes)
-        self._i_buffer_rx = [0x00] * 8
+        transaction.i_buffer_rx = [0x00] * 8
 
         # CRC variable
         i_crc16 = 0
@@ -261,21 +574,24 @@ class Uniprot(object):
 
         # Load header to TX buffer
         # Header character
-        i_buffer_tx[0] = self.UNI_CHAR_HEADER
+        if ack_previous:
+            i_buffer_tx[0] = self.UNI_CHAR_HEADER_ACK
+        else:
+            i_buffer_tx[0] = self.UNI_CHAR_HEADER
         i_crc16 = crc_xmodem_update(i_crc16, i_buffer_tx[0])
         # Number of data Bytes - H
-        i_buffer_tx[1] = ((self._packet_config.i_tx_num_of_data_bytes >> 8)
+        i_buffer_tx[1] = ((packet_config.i_tx_num_of_data_bytes >> 8)
                           & 0xFF)
         i_crc16 = crc_xmodem_update(i_crc16, i_buffer_tx[1])
         # Number of data Bytes - L
-        i_buffer_tx[2] = self._packet_config.i_tx_num_of_data_bytes & 0xFF
+        i_buffer_tx[2] = packet_config.i_tx_num_of_data_bytes & 0xFF
         i_crc16 = crc_xmodem_update(i_crc16, i_buffer_tx[2])
         # Data character
         i_buffer_tx[3] = self.UNI_CHAR_DATA
         i_crc16 = crc_xmodem_update(i_crc16, i_buffer_tx[3])
 
         # Now calculate remaining data Bytes + Tail + CRC16
-        i_tx_remain_data_bytes = self._packet_config.i_tx_num_of_data_bytes + 3
+        i_tx_remain_data_bytes = packet_config.i_tx_num_of_data_bytes + 3
         # There is +3 because in real we must send tail plus CRC -> 3 Bytes
 
         i_buffer_tx_index = 4
@@ -327,21 +643,21 @@ class Uniprot(object):
 
             if i_tx_remain_data_bytes <= 0:
                 # Send last bytes
-                self._device.tx_data(i_buffer_tx)
+                self._tx_report(i_buffer_tx)
                 # Get command
-                self._i_buffer_rx = self._device.rx_data()
-                logger.debug("[Uniprot_USB_try_tx_data] Response received:\n" +
-                             str(self._i_buffer_rx) + "\n")
+                transaction.i_buffer_rx = self._rx_report()
+                logger.debug("[Uniprot_USB_try_tx_data] Response received:"
+                             "\n%s\n", transaction.i_buffer_rx)
 
-                status = self.process_rx_status_data(self._i_buffer_rx)
+                status = self.process_rx_status_data(transaction.i_buffer_rx)
 
-                logger.debug("[Uniprot_USB_try_tx_data] Response status: " +
-                             str(status) + "\n")
+                logger.debug("[Uniprot_USB_try_tx_data] Response status: %s\n",
+                             status)
                 # Return command status (ACK, NACK and so on)
                 return status
             else:
                 # Else just send another packet
-                self._device.tx_data(i_buffer_tx)
+                self._tx_report(i_buffer_tx)
 
             # Anyway - clear some variables
             i_buffer_tx_index = 0
@@ -356,8 +672,12 @@ class Uniprot(object):
         :param i_tx_data:  Data to be send.
         :return:
         """
+        with self._lock:
+            return self._usb_tx_data(i_tx_data)
+
+    def _usb_tx_data(self, i_tx_data):
         try:
-            status = self.usb_try_tx_data(i_tx_data)
+            status = self.usb_try_tx_data(i_tx_data, self._take_pending_ack())
         except:
             message = "[Try TX data] Device not found!\n"
             logger.error("[Uniprot_USB_tx_data]" + message)
@@ -382,9 +702,8 @@ class Uniprot(object):
                     "[Try TX cmd] Device not found! (loop)\n")
 
             logger.warn("[Uniprot_USB_tx_data]"
-                        " NACK or CRC error. TX data again... (" +
-                        str(self.UNI_MAX_NACK_RETRY_COUNT - i_nack_cnt) +
-                        ").")
+                        " NACK or CRC error. TX data again... (%s).",
+                        self.UNI_MAX_NACK_RETRY_COUNT - i_nack_cnt)
 
             try:
                 status = self.usb_try_tx_data(i_tx_data)
@@ -434,7 +753,7 @@ class Uniprot(object):
 
             # Try initialize device again
             try:
-                self._device.open(timeout=self._timeout)
+                self._open_transport()
             except UniprotExceptionDeviceNotFound as e:
                 # If reinitialization failed
                 # EXCEPTION
@@ -443,6 +762,7 @@ class Uniprot(object):
                 raise UniprotExceptionDeviceNotFound(message)
 
             # Else reinitialization OK
+            self._renegotiate()
 
             # Anyway this is not a standard behaviour - higher layer should
             # send all data again
@@ -462,6 +782,8 @@ class Uniprot(object):
 
         :return:
         """
+        transaction = self._transaction
+        packet_config = transaction.packet_config
 
         # Temporary buffer for TX data (8 Bytes)
         # i_buffer_tx = [0x00] * 8
@@ -482,10 +804,10 @@ class Uniprot(object):
 
         # RX first frame
         logger.debug("[Uniprot_USB_try_rx_data] Before USB driver RX")
-        i_buffer_rx_8 = self._device.rx_data()
+        i_buffer_rx_8 = self._rx_report()
 
-        logger.debug("[Uniprot_USB_try_rx_data] RAW uniprot data (begin):\n" +
-                     str(i_buffer_rx_8) + "\n\n\n")
+        logger.debug("[Uniprot_USB_try_rx_data] RAW uniprot data (begin):\n"
+                     "%s\n\n\n", i_buffer_rx_8)
 
         # Try to find header
         if ((i_buffer_rx_8[0] == self.UNI_CHAR_HEADER) and
@@ -493,19 +815,19 @@ class Uniprot(object):
 
             # If header is found save information about number of bytes
             #  (MSB first)
-            self._packet_config.i_rx_num_of_data_bytes = \
+            packet_config.i_rx_num_of_data_bytes = \
                 (i_buffer_rx_8[1] << 8) + (i_buffer_rx_8[2])
             # Create RX buffer
             # RX buffer for data
-            self._i_buffer_rx = ([0x00] *
-                                 self._packet_config.i_rx_num_of_data_bytes)
+            transaction.i_buffer_rx = ([0x00] *
+                                       packet_config.i_rx_num_of_data_bytes)
 
             # Test if received number of bytes is higher
             # than user defined maximum.
             # If yes, from PC side it is not a problem (there is enough memory),
             # however program should return at least some kind of warning
-            if self._packet_config.i_rx_num_of_data_bytes > \
-                    self._packet_config.i_rx_max_num_of_data_bytes:
+            if packet_config.i_rx_num_of_data_bytes > \
+                    packet_config.i_rx_max_num_of_data_bytes:
                 i_warning = 1
 
             # Calculate CRC
@@ -516,13 +838,13 @@ class Uniprot(object):
         else:
             # If correct header is not found, return NACK
             logger.debug("[Uniprot_USB_try_rx_data]"
-                         " Header not found. NACK\n"
-                         + str(self._i_buffer_rx))
+                         " Header not found. NACK\n%s",
+                         transaction.i_buffer_rx)
 
             return self.UNI_RES_CODE_NACK
 
         # Calculate number of Bytes (include tail and CRC16 -> 3B -> +3)
-        i_rx_remain_data_bytes = self._packet_config.i_rx_num_of_data_bytes + 3
+        i_rx_remain_data_bytes = packet_config.i_rx_num_of_data_bytes + 3
 
         # Now save payload (data). RX all remaining bytes
         while i_rx_remain_data_bytes >= 1:
@@ -531,7 +853,7 @@ class Uniprot(object):
             while (i_buffer_rx_8_index < 8) and (i_rx_remain_data_bytes >= 1):
                 # If there are data
                 if i_rx_remain_data_bytes >= 4:
-                    self._i_buffer_rx[i_buffer_rx_index] = \
+                    transaction.i_buffer_rx[i_buffer_rx_index] = \
                         i_buffer_rx_8[i_buffer_rx_8_index]
                     # Do CRC calculation
                     crc16 = crc_xmodem_update(
@@ -570,7 +892,7 @@ class Uniprot(object):
             if i_rx_remain_data_bytes >= 1:
                 # If there are still any data to receive -> get them!
                 logger.debug("[Uniprot_USB_try_rx_data] Before USB RX\n")
-                i_buffer_rx_8 = self._device.rx_data()
+                i_buffer_rx_8 = self._rx_report()
 
                 # Check data if are correct (not higher than 255 -> timeout)
                 if i_buffer_rx_8[0] > 255:
@@ -583,11 +905,16 @@ class Uniprot(object):
                     return self.UNI_RES_CODE_NACK
 
                 logger.debug("[Uniprot_USB_try_rx_data] RAW uniprot data"
-                             ":\n" + str(i_buffer_rx_8) + "\n")
+                             ":\n%s\n", i_buffer_rx_8)
 
             # Reset i_buffer_rx_8_index
             i_buffer_rx_8_index = 0
 
+        # CRC over whole frame (including CRC itself) must be zero
+        if crc16 != 0:
+            logger.debug("[Uniprot_USB_try_rx_data] CRC error. NACK\n")
+            return self.UNI_RES_CODE_NACK
+
         if i_warning == 0:
             # If all right -> return ACK -> higher layer should send ACK command
             return self.UNI_RES_CODE_ACK
@@ -601,7 +928,11 @@ class Uniprot(object):
 
         :return:  Received data as Byte stream.
         """
+        with self._lock:
+            return self._usb_rx_data()
 
+    def _usb_rx_data(self):
+        transaction = self._transaction
         try:
             status = self.usb_try_rx_data()
         except:
@@ -609,8 +940,8 @@ class Uniprot(object):
                                                  " Device not found!\n")
 
         logger.debug("[Uniprot_USB_rx_data]"
-                     "Uniprot RX status (1): " + status + "\n RX Data:\n" +
-                     str(self._i_buffer_rx) + "\n")
+                     "Uniprot RX status (1): %s\n RX Data:\n%s\n",
+                     status, transaction.i_buffer_rx)
 
         # Reset counter
         i_nack_cnt = 0
@@ -621,7 +952,7 @@ class Uniprot(object):
             # While is not ACK -> something is wrong -> try to do something!
 
             logger.warn("[Uniprot_USB_rx_data] Uniprot RX status (while): "
-                        + status + " NACK counter: " + str(i_nack_cnt) + "\n")
+                        "%s NACK counter: %s\n", status, i_nack_cnt)
 
             # Test for NACK -> if NACK send all data again
             if status == self.UNI_RES_CODE_NACK:
@@ -660,7 +991,7 @@ class Uniprot(object):
                     pass
                 # Try initialize device again
                 try:
-                    self._device.open(timeout=self._timeout)
+                    self._open_transport()
                 except UniprotExceptionDeviceNotFound as e:
                     # If reinitialization failed
                     # EXCEPTION
@@ -668,6 +999,7 @@ class Uniprot(object):
                         "[Re-init (loop)]" + str(e))
 
                 # Else reinitialization OK -> raise exception
+                self._renegotiate()
                 raise UniprotExceptionResetSuccess("Restart occurred! (loop)\n")
 
         # Print at least warning if needed
@@ -677,13 +1009,18 @@ class Uniprot(object):
                 " was higher than defined maximum. However buffer overflow"
                 " is not come.")
         # When ACK - previous while never run -> send ACK and return data
+        if self.piggyback_ack:
+            # ACK will be part of next request (or sent when link is idle)
+            self._defer_ack()
+            return transaction.i_buffer_rx
+
         try:
             self.usb_tx_command(self.UNI_CHAR_ACK)
         except:
             raise UniprotExceptionDeviceNotFound(
                 "[TX command] Device not found!\n")
 
-        return self._i_buffer_rx
+        return transaction.i_buffer_rx
 
     def usb_clear_rx_buffer(self, num_of_empty_buffers=2):
         """ Clear USB RX buffer.
@@ -695,12 +1032,241 @@ class Uniprot(object):
         i_throw_cnt = 0
         while True:
             # Get data
-            i_rx_tmp = self._device.rx_data()
-            logger.debug("[Uniprot_USB_clear_rx_buffer] Throw data:"
-                         + str(i_rx_tmp) + "\n\n")
+            i_rx_tmp = self._rx_report()
+            logger.debug("[Uniprot_USB_clear_rx_buffer] Throw data:%s\n\n",
+                         i_rx_tmp)
             # Check if in buffer are dummy data (usually >255)
             if i_pattern_tmp == i_rx_tmp:
                 i_throw_cnt = i_throw_cnt + 1
                 # If > limit -> break
                 if i_throw_cnt >= num_of_empty_buffers:
                     break
+
+    def _next_seq(self):
+        seq = self._v2_seq
+        self._v2_seq = (seq + 1) & 0xFF
+        return seq
+
+    def _v2_tx_frame(self, seq, i_tx_data):
+        """ Send data frame (protocol v2).
+
+        Frame: H, SEQ, LEN_H, LEN_L, D, data..., T, CRC_H, CRC_L
+        """
+        num_of_bytes = len(i_tx_data)
+        frame = [self.UNI_CHAR_HEADER, seq,
+                 (num_of_bytes >> 8) & 0xFF, num_of_bytes & 0xFF,
+                 self.UNI_CHAR_DATA]
+        frame.extend(i_tx_data)
+        frame.append(self.UNI_CHAR_TAIL)
+
+        crc16 = 0
+        for i_byte in frame:
+            crc16 = crc_xmodem_update(crc16, i_byte)
+        frame.append((crc16 >> 8) & 0xFF)
+        frame.append(crc16 & 0xFF)
+
+        # Fill last report by dummy data
+        frame.extend([0xFF] * (-len(frame) % self.UNI_REPORT_SIZE))
+
+        for i in range(0, len(frame), self.UNI_REPORT_SIZE):
+            self._tx_report(frame[i:i + self.UNI_REPORT_SIZE])
+
+    def _v2_tx_command(self, command_char, seq):
+        """ Send command for given sequence number (protocol v2).
+
+        Frame: COMMAND, SEQ, CRC_H, CRC_L
+        """
+        i_buffer_tx = [0x00] * self.UNI_REPORT_SIZE
+        i_buffer_tx[0] = command_char
+        i_buffer_tx[1] = seq
+        crc16 = crc_xmodem_update(0, command_char)
+        crc16 = crc_xmodem_update(crc16, seq)
+        i_buffer_tx[2] = (crc16 >> 8) & 0xFF
+        i_buffer_tx[3] = crc16 & 0xFF
+        self._tx_report(i_buffer_tx)
+
+    def _v2_rx_frame(self):
+        """ Receive one frame (protocol v2).
+
+        :return: Tuple (kind, character, sequence number, data). Sequence
+                 number is None when it can not be trusted.
+        """
+        report = self._rx_report()
+
+        if report[0] > 0xFF:
+            return self._V2_TIMEOUT, None, None, None
+
+        char = report[0]
+
+        if char in (self.UNI_CHAR_ACK, self.UNI_CHAR_NACK,
+                    self.UNI_CHAR_BUFFER_OVERFLOW):
+            crc16 = 0
+            for i in range(4):
+                crc16 = crc_xmodem_update(crc16, report[i])
+            if crc16 != 0:
+                return self._V2_CORRUPTED, char, None, None
+            return self._V2_STATUS, char, report[1], None
+
+        if char == self.UNI_CHAR_RESET:
+            return self._V2_RESET, char, None, None
+
+        if (char != self.UNI_CHAR_HEADER) or \
+                (report[4] != self.UNI_CHAR_DATA):
+            logger.debug("[Uniprot_v2_rx_frame] Unexpected data: %s", report)
+            return self._V2_CORRUPTED, None, None, None
+
+        seq = report[1]
+        num_of_bytes = (report[2] << 8) + report[3]
+        # Header (5B) + data + tail + CRC (3B)
+        frame_length = num_of_bytes + 8
+
+        frame = list(report)
+        while len(frame) < frame_length:
+            report = self._rx_report()
+            if report[0] > 0xFF:
+                # Time out inside frame
+                return self._V2_CORRUPTED, char, seq, None
+            frame.extend(report)
+
+        crc16 = 0
+        for i in range(frame_length):
+            crc16 = crc_xmodem_update(crc16, frame[i])
+
+        if (crc16 != 0) or (frame[frame_length - 3] != self.UNI_CHAR_TAIL):
+            return self._V2_CORRUPTED, char, seq, None
+
+        return self._V2_DATA, char, seq, frame[5:5 + num_of_bytes]
+
+    def usb_transfer_window(self, tx_payloads):
+        """ Send requests and receive their responses.
+
+        With protocol v2 up to :attr:`window` requests are outstanding at
+        once. Only requests (or responses) which were lost or corrupted are
+        transmitted again. With protocol v1 requests are processed one by
+        one (TX and RX packets must be configured before).
+
+        Hold :attr:`lock` until generator is exhausted when device is shared
+        by more threads.
+
+        :param tx_payloads: List of data (arrays) to send.
+        :return: Generator of received data, in the same order as requests.
+        """
+        if self._protocol_version < self.UNI_PROTOCOL_V2:
+            for i_tx_data in tx_payloads:
+                self.config_tx_packet(len(i_tx_data))
+                self.usb_tx_data(i_tx_data)
+                yield self.usb_rx_data()
+            return
+
+        payloads = list(tx_payloads)
+        num_of_requests = len(payloads)
+
+        # Received data indexed by request index
+        responses = {}
+        # Request index by sequence number (not answered requests only)
+        outstanding = {}
+        # Sequence numbers of requests which were accepted by device
+        accepted = set()
+        # Retry count by request index
+        retries = [0] * num_of_requests
+
+        i_next_to_send = 0
+        i_next_to_return = 0
+
+        while i_next_to_return < num_of_requests:
+            # Fill window
+            while (i_next_to_send < num_of_requests) and \
+                    (len(outstanding) < self._window):
+                seq = self._next_seq()
+                outstanding[seq] = i_next_to_send
+                self._v2_tx_frame(seq, payloads[i_next_to_send])
+                i_next_to_send += 1
+
+            # Return all responses which are already in order
+            while i_next_to_return in responses:
+                i_rx_data = responses.pop(i_next_to_return)
+                i_next_to_return += 1
+                yield i_rx_data
+
+            if i_next_to_return >= num_of_requests:
+                break
+
+            if not outstanding:
+                # Window was refilled by previous loop
+                continue
+
+            kind, char, seq, i_rx_data = self._v2_rx_frame()
+
+            if kind == self._V2_DATA:
+                if seq in outstanding:
+                    responses[outstanding.pop(seq)] = i_rx_data
+                    accepted.discard(seq)
+                # Confirm even duplicates, so device can free its buffer
+                self._v2_tx_command(self.UNI_CHAR_ACK, seq)
+
+            elif kind == self._V2_STATUS:
+                if seq not in outstanding:
+                    # Status for already answered request
+                    continue
+
+                if char == self.UNI_CHAR_ACK:
+                    accepted.add(seq)
+
+                elif char == self.UNI_CHAR_NACK:
+                    index = outstanding[seq]
+                    self._v2_retry(retries, index)
+                    logger.warn("[Uniprot_USB_transfer_window] NACK for"
+                                " sequence %s. TX data again... (%s)",
+                                seq, retries[index])
+                    self._v2_tx_frame(seq, payloads[index])
+
+                else:
+                    message = " Device RX buffer overflow (sequence {0})." \
+                              " Window is probably too big.\n".format(seq)
+                    logger.critical("[Uniprot_USB_transfer_window]" + message)
+                    raise UniprotExceptionRxBufferOverflow(message)
+
+            elif kind == self._V2_CORRUPTED:
+                if (seq is not None) and (seq in outstanding):
+                    index = outstanding[seq]
+                    self._v2_retry(retries, index)
+                    logger.warn("[Uniprot_USB_transfer_window] Corrupted"
+                                " response for sequence %s (%s)",
+                                seq, retries[index])
+                    # Ask device for response again
+                    self._v2_tx_command(self.UNI_CHAR_NACK, seq)
+
+            elif kind == self._V2_TIMEOUT:
+                # Something was lost. Send again requests which were not
+                # accepted and ask for responses which did not come
+                for seq in sorted(outstanding,
+                                  key=lambda x: outstanding[x]):
+                    index = outstanding[seq]
+                    self._v2_retry(retries, index)
+                    logger.warn("[Uniprot_USB_transfer_window] Time out for"
+                                " sequence %s (%s)", seq, retries[index])
+                    if seq in accepted:
+                        self._v2_tx_command(self.UNI_CHAR_NACK, seq)
+                    else:
+                        self._v2_tx_frame(seq, payloads[index])
+
+            else:
+                # Reset from device
+                try:
+                    self.close()
+                except (UniprotException, TransportException):
+                    # Just dummy operation - not fail
+                    pass
+                self._open_transport()
+                self._renegotiate()
+
+                message = " Restart occurred!\n"
+                logger.warn("[Uniprot_USB_transfer_window]" + message)
+                raise UniprotExceptionResetSuccess(message)
+
+    def _v2_retry(self, retries, index):
+        retries[index] += 1
+        if retries[index] > self.UNI_MAX_NACK_RETRY_COUNT:
+            logger.error("[Uniprot_USB_transfer_window]"
+                         " Retry count reach limit!\n")
+            raise UniprotExceptionNackFail(" NACK retry count reach limit!\n")
@@ -18,11 +18,15 @@ class UsbDevice:
     controls on Linux or Windows systems.
     """
 
-    def __init__(self, name, vid, pid, uid, timeout=UsbDriver.USB_TIMEOUT_MS):
+    def __init__(self, name, vid, pid, uid, bus=None, port_path=(),
+                 timeout=UsbDriver.USB_TIMEOUT_MS):
         self.name = name
         self.vid = vid
         self.pid = pid
         self.uid = uid
+        # USB topology (bus is None when not known)
+        self.bus = bus
+        self.port_path = tuple(port_path)
         self._driver = UsbDriver(timeout=timeout)
         self.usb_device = None
 
@@ -30,6 +34,11 @@ class UsbDevice:
         return " Device name: {0}\n VID: {1}\n PID: {2}, UID: {3}\n-------\n" \
                "".format(self.name, hex(self.vid), hex(self.pid), hex(self.uid))
 
+    @property
+    def hub(self):
+        """ Bus and port path of the hub device is connected to."""
+        return (self.bus,) + self.port_path[:-1]
+
     def _check_device_open(self):
         if self.usb_device is None:
             raise UsbDriverException("Device not opened.")
@@ -42,7 +51,8 @@ class UsbDevice:
     def open(self, timeout=UsbDriver.USB_TIMEOUT_MS):
         """ Open USB device. Should be called first"""
         self._driver = UsbDriver(timeout=timeout)
-        self.usb_device = self._driver.usb_open_device(self.vid, self.pid)
+        self.usb_device = self._driver.usb_open_device(self.vid, self.pid,
+                                                       self.uid)
         return self.usb_device
 
     def close(self):
@@ -61,9 +71,11 @@ class UsbDevice:
         self._check_device_open()
         return self._driver.usb_tx_data(self.usb_device, data_8bit)
 
-    def rx_data(self):
+    def rx_data(self, timeout=None):
         """ Receive data from USB interface (8x8bits)
+
+        :param timeout: (Optional) Time out for this read [ms].
         """
         self._check_device_open()
-        return self._driver.usb_rx_data(self.usb_device)
+        return self._driver.usb_rx_data(self.usb_device, timeout)
 
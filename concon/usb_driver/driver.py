@@ -8,7 +8,6 @@
 
 """
 import os
-import yaml
 from ..utils import ConConError
 
 if os.name == "posix":
@@ -43,6 +42,7 @@ class UsbDriver:
 
     @classmethod
     def get_config_from_file(cls, config_file):
+        import yaml
         with file(config_file) as cf:
             config = yaml.load(cf)
             return config['usb']
@@ -61,7 +61,7 @@ class UsbDriver:
         return usb_lib_ping_device(vid, pid)
 
     @classmethod
-    def usb_open_device(cls, vid, pid):
+    def usb_open_device(cls, vid, pid, uid=None):
         """
         Open USB device. Should be called as first
 
@@ -69,8 +69,11 @@ class UsbDriver:
         :type vid: 16 bit number
         :param pid: ProductID
         :type pid: 16 bit number
+        :param uid: (Optional) Unique ID of device (see usb_list_devices).
+                    Needed when more devices with the same VID/PID are
+                    connected.
         """
-        return usb_lib_open_device(vid, pid)
+        return usb_lib_open_device(vid, pid, uid)
 
 
     @classmethod
@@ -92,26 +95,31 @@ class UsbDriver:
         """
         return usb_lib_tx_data(device, data_8bit, self._timeout)
 
-    def usb_rx_data(self, device):
+    def usb_rx_data(self, device, timeout=None):
         """
         Receive data from USB interface (8x8bits)
 
         :param device: Device description, witch programmer get when use
                         function usb_open_device
+        :param timeout: (Optional) Time out for this read [ms]. Configured
+                        time out is used by default.
         """
-
-        return usb_lib_rx_data(device, self._timeout)
+        if timeout is None:
+            timeout = self._timeout
+        return usb_lib_rx_data(device, timeout)
 
     @classmethod
-    def usb_list_devices(cls, vid=None):
+    def usb_list_devices(cls, vid=None, match=None):
         from .device import UsbDevice
         """
         List all connected devices, optionally filter only devices
         with given Vendor ID.
         
         :param vid:    (Optional) Vendor ID.
+        :param match:  (Optional) Callable(vid, pid) selecting devices.
         
         :return: List of connected devices (DeviceStructs).
         """
-        return [UsbDevice(*dev) for dev in usb_list_connected_devices(vid)]
+        return [UsbDevice(*dev)
+                for dev in usb_list_connected_devices(vid, match)]
 
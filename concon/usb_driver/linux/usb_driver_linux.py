@@ -34,6 +34,20 @@ class HidDeviceStruct(object):
                     self.ep_out.bEndpointAddress)
 
 
+def _device_uid(device):
+    """ Unique ID of connected device (bus and address)."""
+    return device.bus * 0xff + device.address
+
+
+def _port_path(device):
+    """ Hub port numbers from root hub to device."""
+    try:
+        return tuple(device.port_numbers or ())
+    except (AttributeError, NotImplementedError):
+        # Old pyusb or backend
+        return ()
+
+
 def usb_lib_ping_device(vid, pid):
     """
     Just test if selected device is connected
@@ -50,7 +64,7 @@ def usb_lib_ping_device(vid, pid):
         return 1  # Device found
 
 
-def usb_lib_open_device(vid, pid):
+def usb_lib_open_device(vid, pid, uid=None):
     """
     Open USB device. Should be called as first
 
@@ -58,6 +72,8 @@ def usb_lib_open_device(vid, pid):
     :type vid: 16 bit number
     :param pid: ProductID
     :type pid: 16 bit number
+    :param uid: (Optional) Unique ID from usb_list_connected_devices. First
+                device with given VID/PID is opened by default.
     """
 
     # Flags which indicate if IN/OUT EP was found
@@ -67,7 +83,11 @@ def usb_lib_open_device(vid, pid):
     dev_hid = HidDeviceStruct()
 
     # Test if device exist
-    dev = usb.core.find(idVendor=vid, idProduct=pid)
+    if uid is None:
+        dev = usb.core.find(idVendor=vid, idProduct=pid)
+    else:
+        dev = usb.core.find(idVendor=vid, idProduct=pid,
+                            custom_match=lambda d: _device_uid(d) == uid)
     if dev is None:
         return 404  # Device not found
     else:
@@ -197,25 +217,32 @@ def usb_lib_rx_data(device, timeout):
     return ret_data
 
 
-def usb_list_connected_devices(vid=None):
+def usb_list_connected_devices(vid=None, match=None):
     """
     List all connected devices, optionally filter only devices with given
     Vendor ID.
 
     :param vid:     (Optional) Vendor ID.
+    :param match:   (Optional) Callable(vid, pid) selecting devices. It is
+                    evaluated before any string descriptor is read.
 
-    :return: List of (name, vid, pid, uid) tuples.
+    :return: List of (name, vid, pid, uid, bus, port path) tuples. Port path
+             is tuple of hub port numbers (empty when unknown).
     """
     kwargs = {'find_all': True, 'idVendor': vid, } if vid else \
         {'find_all': True, }
+    if match is not None:
+        kwargs['custom_match'] = \
+            lambda device: match(device.idVendor, device.idProduct)
     devices = []
 
     # Following may fail if user does not have sufficient rights
     try:
         for device in usb.core.find(**kwargs):
             name = device.product or device.address
-            uid = device.bus * 0xff + device.address
-            devices.append((name, device.idVendor, device.idProduct, uid))
+            uid = _device_uid(device)
+            devices.append((name, device.idVendor, device.idProduct, uid,
+                            device.bus, _port_path(device)))
     except ValueError as e:
         msg = "{}\n\n"\
               "It looks like you can not access USB devices."\
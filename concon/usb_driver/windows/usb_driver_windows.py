@@ -16,6 +16,9 @@
 # Queue - FIFO/LIFO memory for multi-thread applications
 import Queue
 
+# Stable checksum of device path (unique ID)
+import zlib
+
 # Use pyWinUSB library for python and use shortcut "hid"
 import pywinusb.hid as hid
 
@@ -36,6 +39,17 @@ def in_sample_handler(data):
     rx_buff.put(data, 1)
 
 
+def _device_uid(device):
+    """ Unique ID of connected device. Checksum of device path is the same
+    in every process (unlike hash of string, which is randomized per
+    process), so worker processes open the same device.
+    """
+    path = device.device_path
+    if not isinstance(path, bytes):
+        path = path.encode('utf-8')
+    return zlib.crc32(path) & 0xffffffff
+
+
 def usb_lib_ping_device(VID, PID):
     """
     Just test if selected device is connected
@@ -57,7 +71,7 @@ def usb_lib_ping_device(VID, PID):
         return 404
 
 
-def usb_lib_open_device(vid, pid):
+def usb_lib_open_device(vid, pid, uid=None):
     """
     Open USB device. Should be called as first
 
@@ -65,13 +79,19 @@ def usb_lib_open_device(vid, pid):
     :type vid: 16 bit number
     :param pid: ProductID
     :type pid: 16 bit number
+    :param uid: (Optional) Unique ID from usb_list_connected_devices. First
+                device with given VID/PID is opened by default.
     """
     global rx_buff
 
     # Try open device
     try:
-        device = hid.HidDeviceFilter(vendor_id=vid,
-                                     product_id=pid).get_devices()[0]
+        devices = hid.HidDeviceFilter(vendor_id=vid,
+                                      product_id=pid).get_devices()
+        if uid is not None:
+            devices = [dev for dev in devices
+                       if _device_uid(dev) == uid]
+        device = devices[0]
         device.open()
 
         # set custom raw data handler if device is opened
@@ -149,20 +169,26 @@ def usb_lib_rx_data(device, timeout):
     return data[1:]
 
 
-def usb_list_connected_devices(vid=None):
+def usb_list_connected_devices(vid=None, match=None):
     """
     List all connected devices, optionally filter
     only devices with given Vendor ID.
 
     :param vid:    (Optional) Vendor ID.
+    :param match:  (Optional) Callable(vid, pid) selecting devices.
 
-    :return: List of (name, vid, pid, uid) tuples.
+    :return: List of (name, vid, pid, uid, bus, port path) tuples. Topology
+             is not known (bus is None).
     """
 
     kwargs = {'vendor_id': vid, } if vid else {}
     devices = []
     for device in hid.HidDeviceFilter(**kwargs).get_devices():
+        if match is not None and \
+                not match(device.vendor_id, device.product_id):
+            continue
         devices.append((device.product_name, device.vendor_id,
-                        device.product_id, hash(device.device_path)))
+                        device.product_id, _device_uid(device),
+                        None, ()))
 
     return devices
@@ -9,3 +9,17 @@
 class ConConError(Exception):
     pass
 
+
+def resource_filename(name):
+    """ Path of file distributed with concon package.
+
+    :param name: Path relative to package (e.g. ``config/config.yml``).
+    """
+    try:
+        from importlib.resources import files
+    except ImportError:
+        # Python < 3.9 (pkg_resources is slow to import)
+        import pkg_resources
+        return pkg_resources.resource_filename('concon', name)
+    # Package is not zipped (zip_safe=False)
+    return str(files('concon').joinpath(name))
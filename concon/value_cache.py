@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.value_cache
+    :synopsis: Read-through cache of setting values with time to live.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Every :meth:`~concon.HW_bridge_uniprot.Bridge.get_setting_from_device` is a
+round trip to the device. :class:`ValueCache` is used instead of bridge and
+asks the device only when cached value is older than its time to live.
+
+Settings with VOID input and non-VOID output are outputs of the device
+(measured values), they change without writes and expire soon. Other
+settings (configuration) change only when written, so they are kept longer.
+Time to live of particular settings can be given too:
+
+.. code-block:: python
+
+     cache = ValueCache(bridge, output_ttl=0.2, config_ttl=30.0,
+                        ttl={(0, TEMPERATURE_CMD_ID): 1.0})
+     temperature = cache.get_value(0, TEMPERATURE_CMD_ID)
+     cache.set_setting_to_device(0, GAIN_CMD_ID, 10)  # Entry updated
+     print(cache.stats())
+
+Cache has interface of bridge needed by
+:class:`~concon.write_behind.WriteBehindQueue`, so background writes update
+it as well.
+"""
+
+import threading
+
+from .HW_bridge_uniprot import DataTypes
+from .transport import monotonic
+
+
+def is_output(setting):
+    """ True for read only output (VOID input, non-VOID output)."""
+    return setting.in_type == DataTypes.VOID and \
+        setting.out_type != DataTypes.VOID
+
+
+class ValueCache(object):
+    """ Settings read from device through the cache."""
+
+    OUTPUT_TTL = 0.5
+    """ Default time to live of device outputs [s]."""
+
+    CONFIG_TTL = 60.0
+    """ Default time to live of configuration values [s]."""
+
+    def __init__(self, bridge, output_ttl=OUTPUT_TTL, config_ttl=CONFIG_TTL,
+                 ttl=None, clock=monotonic):
+        """
+        :param bridge: :class:`~concon.HW_bridge_uniprot.Bridge`
+        :param output_ttl: Time to live of device outputs [s]. None -> never
+                           expire, 0 -> not cached.
+        :param config_ttl: Time to live of other settings [s].
+        :param ttl: Optional dictionary (DID, CMD ID): time to live [s] of
+                    particular settings.
+        :param clock: Time source (for tests).
+        """
+        self.bridge = bridge
+        self.output_ttl = output_ttl
+        self.config_ttl = config_ttl
+        self.ttl = dict(ttl or {})
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        # (DID, CMD ID): (setting, time of reading, time to live)
+        self._entries = {}
+        # (DID, CMD ID): counter of writes and invalidations, value read
+        # while it changed is not stored
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def ttl_of(self, did, cmd_id, setting):
+        """ Time to live of setting [s] (None -> never expires)."""
+        if (did, cmd_id) in self.ttl:
+            return self.ttl[(did, cmd_id)]
+        return self.output_ttl if is_output(setting) else self.config_ttl
+
+    def _bump(self, key):
+        """ Mark value as changed (lock must be held)."""
+        self._generations[key] = self._generations.get(key, 0) + 1
+
+    def _store(self, did, cmd_id, setting, generation=None):
+        """ Store setting.
+
+        :param generation: Generation of setting before it was read from
+                           device. Setting is dropped when it changed
+                           meanwhile. None -> setting was written, so it
+                           replaces values being read now.
+        """
+        key = (did, cmd_id)
+        ttl = self.ttl_of(did, cmd_id, setting)
+        with self._lock:
+            if generation is None:
+                self._bump(key)
+            elif self._generations.get(key, 0) != generation:
+                return
+            if ttl is not None and ttl <= 0:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = (setting, self._clock(), ttl)
+
+    def get_setting_from_device(self, did, cmd_id, max_age=None):
+        """ Setting from cache, or from device when not cached or expired.
+
+        :param max_age: Ask device when cached value is older [s] (0 ->
+                        always ask device).
+        :return: :class:`~concon.structs.SettingStruct`
+        """
+        key = (did, cmd_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                setting, stored, ttl = entry
+                age = self._clock() - stored
+                if (ttl is None or age < ttl) and \
+                        (max_age is None or age < max_age):
+                    self.hits += 1
+                    return setting
+            self.misses += 1
+            generation = self._generations.setdefault(key, 0)
+
+        setting = self.bridge.get_setting_from_device(did, cmd_id)
+        self._store(did, cmd_id, setting, generation)
+        return setting
+
+    def get_value(self, did, cmd_id, max_age=None):
+        """ Actual value of setting (see :meth:`get_setting_from_device`).
+        """
+        return self.get_setting_from_device(did, cmd_id, max_age).out_value
+
+    def set_setting_to_device(self, did, cmd_id, value=0):
+        """ Write setting and update cache with value read back.
+
+        Function calls (VOID input) invalidate outputs of the same device,
+        item of group invalidates its group.
+
+        :return: Result code as text
+        """
+        with self._lock:
+            # Values being read now may be older than the write
+            self._bump((did, cmd_id))
+        try:
+            code = self.bridge.set_setting_to_device(did, cmd_id, value)
+        except Exception:
+            # Value on device is not known
+            self.invalidate(did, cmd_id)
+            raise
+
+        # Bridge reads setting back after write
+        setting = self.bridge.get_setting(did, cmd_id)
+        if setting.in_type == DataTypes.VOID:
+            self._invalidate_affected(did, cmd_id)
+        self._store(did, cmd_id, setting)
+        return code
+
+    def _invalidate_affected(self, did, cmd_id):
+        with self._lock:
+            for key in list(self._generations):
+                if key[0] != did:
+                    continue
+                entry = self._entries.get(key)
+                if entry is None:
+                    # Type of setting being read now is not known
+                    self._bump(key)
+                    continue
+                setting = entry[0]
+                if is_output(setting) or (
+                        setting.in_type == DataTypes.GROUP and
+                        setting.in_min <= cmd_id <= setting.in_max):
+                    del self._entries[key]
+                    self._bump(key)
+                    self.invalidations += 1
+
+    def invalidate(self, did=None, cmd_id=None):
+        """ Drop cached values: one setting, all settings of device (only
+        DID given) or everything.
+        """
+        with self._lock:
+            keys = [key for key in self._generations
+                    if (did is None or key[0] == did) and
+                    (cmd_id is None or key[1] == cmd_id)]
+            for key in keys:
+                self._bump(key)
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def stats(self):
+        """ Hit/miss counters as dictionary."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_ratio': float(self.hits) / requests if requests
+                    else 0.0,
+                    'invalidations': self.invalidations,
+                    'entries': len(self._entries)}
+
+    @property
+    def scheduler(self):
+        return self.bridge.scheduler
+
+    @property
+    def device_metadata(self):
+        return self.bridge.device_metadata
+
+    def get_max_device_id(self):
+        return self.bridge.get_max_device_id()
+
+    def close(self):
+        self.invalidate()
+        self.bridge.close()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.wire_trace
+    :synopsis: In-memory ring buffer for raw Uniprot traffic.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Every report sent to or received from the device is stored as
+(timestamp, direction, raw report) into preallocated ring buffer. Nothing is
+formatted until :meth:`WireTrace.dump` is called, so tracing can stay enabled
+even in production sessions.
+
+.. code-block:: python
+
+     trace = WireTrace()
+     bridge = Bridge(vid, pid, timeout, trace=trace)
+     ...
+     # Usually when something goes wrong
+     trace.dump("Trace.txt")
+
+"""
+
+import time
+
+
+class WireTrace(object):
+    """ Fixed size ring buffer of raw reports."""
+
+    DIR_TX = 'TX'
+    DIR_RX = 'RX'
+
+    DEFAULT_SIZE = 4096
+    """ Number of reports kept in memory. Older records are overwritten."""
+
+    def __init__(self, size=DEFAULT_SIZE):
+        if size < 1:
+            raise ValueError("Trace buffer size must be at least 1")
+
+        self._size = size
+        # Preallocated slots -> record() only rewrites references
+        self._timestamps = [0.0] * size
+        self._directions = [None] * size
+        self._reports = [None] * size
+        self._index = 0
+        self._total = 0
+
+    def __len__(self):
+        return min(self._total, self._size)
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def dropped(self):
+        """ Number of records which were overwritten by newer ones."""
+        return max(0, self._total - self._size)
+
+    def record(self, direction, report):
+        """ Store one report. Must be as cheap as possible (hot path).
+
+        :param direction: :attr:`DIR_TX` or :attr:`DIR_RX`
+        :param report: Raw report (list of integers). Copy is stored, because
+                       caller can reuse the buffer.
+        """
+        i = self._index
+        self._timestamps[i] = time.time()
+        self._directions[i] = direction
+        self._reports[i] = tuple(report)
+
+        i += 1
+        if i == self._size:
+            i = 0
+        self._index = i
+        self._total += 1
+
+    def clear(self):
+        """ Forget all records (buffers stay allocated)."""
+        for i in range(self._size):
+            self._directions[i] = None
+            self._reports[i] = None
+        self._index = 0
+        self._total = 0
+
+    def records(self):
+        """ Recorded (timestamp, direction, report) tuples, oldest first."""
+        if self._total < self._size:
+            indexes = range(self._total)
+        else:
+            indexes = list(range(self._index, self._size)) + \
+                      list(range(0, self._index))
+
+        return [(self._timestamps[i], self._directions[i], self._reports[i])
+                for i in indexes]
+
+    @staticmethod
+    def format_record(timestamp, direction, report):
+        """ Convert one record to human readable line.
+
+        Values higher than 255 are time-out markers from USB driver.
+        """
+        return "{0:.6f} {1} {2}".format(
+            timestamp, direction,
+            " ".join(["{0:02X}".format(b) if b <= 0xFF else "--"
+                      for b in report]))
+
+    def dump(self, filename):
+        """ Write all records into the text file.
+
+        :param filename: Path to the output file.
+        :return: Number of written records.
+        """
+        records = self.records()
+        with open(filename, 'w') as f:
+            f.write("# Uniprot wire trace: {0} records, {1} dropped\n".format(
+                len(records), self.dropped))
+            for record in records:
+                f.write(self.format_record(*record) + "\n")
+
+        return len(records)
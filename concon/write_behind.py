@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: concon.write_behind
+    :synopsis: Coalescing background writes of rapidly changing settings.
+.. moduleauthor:: Martin Stejskal <mstejskal@alps.cz>
+
+Interactive tools (sliders) change one setting many times per second, but
+every write is a round trip to the device. :class:`WriteBehindQueue` keeps
+only the latest value of every setting and writes it from background thread
+as fast as the device accepts it. Values which were replaced meanwhile are
+never sent.
+
+.. code-block:: python
+
+     writer = WriteBehindQueue(bridge)
+
+     # GUI thread, returns immediately
+     writer.set(0, GAIN_CMD_ID, slider.value)
+
+     # Value must be in the device now
+     writer.flush()
+     writer.close()  # Raises WriteBehindError when a value was not written
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+from .scheduler import RequestScheduler
+from .transport import monotonic
+from .utils import ConConError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindError(ConConError):
+    """ Some of background writes failed.
+
+    :ivar failures: List of (DID, CMD ID, value, exception)
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+        ConConError.__init__(self, "{0} write(s) failed: {1}".format(
+            len(failures), "; ".join(
+                "{0}:{1} = {2!r}: {3}".format(*failure)
+                for failure in failures)))
+
+
+class WriteBehindQueue(object):
+    """ Latest pending value per (DID, CMD ID) written in background."""
+
+    def __init__(self, bridge, priority=RequestScheduler.INTERACTIVE,
+                 on_written=None):
+        """
+        :param bridge: :class:`~concon.HW_bridge_uniprot.Bridge`
+        :param priority: Scheduler priority of background writes.
+        :param on_written: Optional callback(DID, CMD ID, value, result code)
+                           called from background thread after every write.
+        """
+        self.bridge = bridge
+        self.priority = priority
+        self.on_written = on_written
+
+        self._cond = threading.Condition()
+        # (DID, CMD ID): value, in order of first change
+        self._pending = OrderedDict()
+        # Setting being written now
+        self._writing = None
+        self._failures = []
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.coalesced = 0
+
+        self._thread = threading.Thread(target=self._run,
+                                        name="ConCon write-behind")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        try:
+            self.close(flush=False)
+        except WriteBehindError as e:
+            # Do not hide original exception
+            logger.error("[__exit__] %s", e)
+
+    def set(self, did, cmd_id, value=0):
+        """ Schedule write of setting. Returns immediately, older pending
+        value of the same setting is dropped.
+        """
+        key = (did, cmd_id)
+        with self._cond:
+            if self._closed:
+                raise WriteBehindError([(did, cmd_id, value,
+                                         "Queue is closed")])
+            self.submitted += 1
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = value
+            self._cond.notify_all()
+
+    def pending(self):
+        """ Values not written yet as dictionary (DID, CMD ID): value."""
+        with self._cond:
+            return dict(self._pending)
+
+    def flush(self, timeout=None):
+        """ Wait until all values given so far are written.
+
+        :param timeout: Maximum waiting time [s] (None -> no limit).
+        :return: False on time out
+        :raises: :class:`WriteBehindError` when some write failed since the
+                 last flush.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        with self._cond:
+            while self._pending or self._writing is not None:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        return False
+                self._cond.wait(remaining)
+            failures, self._failures = self._failures, []
+        if failures:
+            raise WriteBehindError(failures)
+        return True
+
+    def close(self, flush=True, timeout=None):
+        """ Stop background thread.
+
+        :param flush: Write pending values first, otherwise they are
+                      dropped.
+        :param timeout: Maximum time of flush [s], values not written by
+                        then are dropped.
+        :raises: :class:`WriteBehindError` listing failed writes and
+                 dropped values.
+        """
+        dropped = []
+        try:
+            if flush:
+                self.flush(timeout)
+        finally:
+            with self._cond:
+                self._closed = True
+                dropped = [(did, cmd_id, value, "Dropped")
+                           for (did, cmd_id), value in self._pending.items()]
+                self._pending.clear()
+                self._cond.notify_all()
+            self._thread.join()
+        with self._cond:
+            failures, self._failures = self._failures, []
+        if failures or dropped:
+            raise WriteBehindError(failures + dropped)
+
+    def stats(self):
+        with self._cond:
+            return {'submitted': self.submitted,
+                    'written': self.written,
+                    'coalesced': self.coalesced,
+                    'pending': len(self._pending)}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key, value = self._pending.popitem(last=False)
+                self._writing = key
+
+            did, cmd_id = key
+            try:
+                with self.bridge.scheduler.priority(self.priority):
+                    code = self.bridge.set_setting_to_device(did, cmd_id,
+                                                             value)
+            except Exception as e:
+                logger.error("[_run] Write %d:%d = %r failed: %s", did,
+                             cmd_id, value, e)
+                with self._cond:
+                    self._failures.append((did, cmd_id, value, e))
+            else:
+                with self._cond:
+                    self.written += 1
+                if self.on_written is not None:
+                    try:
+                        self.on_written(did, cmd_id, value, code)
+                    except Exception:
+                        logger.exception("[_run] on_written failed")
+            finally:
+                with self._cond:
+                    self._writing = None
+                    self._cond.notify_all()
@@ -22,6 +22,11 @@ if os.name == "nt":
 else:
     requirements.append('pyusb==1.0.0')
 
+extras_requirements = {
+    # Uniprot over UART (POSIX ports work without it)
+    'serial': ['pyserial>=3.0'],
+}
+
 setup_requirements = [
     # TODO(JNev): put setup requirements (distutils extensions, etc.) here
 ]
@@ -42,11 +47,20 @@ setup(
     entry_points={
         'console_scripts': [
             'concon=concon.cli:main'
+        ],
+        'concon.transports': [
+            'usb = concon.transport.usb:UsbTransport',
+            'simulator = concon.simulator:UniprotSimulator',
+            'recording = concon.transport.replay:RecordingTransport',
+            'replay = concon.transport.replay:ReplayTransport',
+            'faults = concon.transport.faults:FaultInjectionTransport',
+            'serial = concon.transport.stream:SerialTransport'
         ]
     },
     include_package_data=True,
     package_data={'concon': ['config/*.*']},
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="MIT license",
     zip_safe=False,
     keywords='concon',
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+"""Device models of simulated HW bridge shared by tests."""
+
+import os
+
+import concon
+
+MODEL_FILE = os.path.join(os.path.dirname(concon.__file__), 'config',
+                          'simulator_model.yml')
+""" Example model distributed with concon (group, integers, float)."""
+
+GAIN_MODEL = {'devices': [{'descriptor': "Dev", 'settings': [
+    {'name': "gain", 'in_type': 'uint8', 'in_max': 100, 'value': 42}]}]}
+""" Device with one setting."""
+
+GAIN_CUTOFF_MODEL = {'devices': [{'descriptor': "Dev", 'settings': [
+    {'name': "gain", 'in_type': 'uint8', 'in_max': 100, 'value': 42},
+    {'name': "cutoff", 'in_type': 'float', 'in_min': 0.0,
+     'in_max': 10000.0, 'value': 1000.0}]}]}
+""" Integer and float setting."""
+
+OUTPUT_MODEL = {'devices': [{'descriptor': "Amp", 'settings': [
+    {'name': "gain", 'in_type': 'uint8', 'in_max': 100, 'value': 42},
+    {'name': "temperature", 'in_type': 'void', 'out_type': 'int16',
+     'out_min': -40, 'out_max': 125, 'value': 25},
+    {'name': "calibrate", 'in_type': 'void'}]}]}
+""" Configuration value, read only output and function."""
+
+
+def numbered_model(count, step=1):
+    """ Device with settings "setting 0" ... (value of setting i is
+    i * step).
+    """
+    return {'devices': [{'descriptor': "Dev", 'settings': [
+        {'name': "setting {0}".format(i), 'in_type': 'uint16',
+         'in_max': 1000, 'value': i * step} for i in range(count)]}]}
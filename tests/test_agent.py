@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.agent` module."""
+
+import unittest
+
+from concon.agent import (BridgeAgent, RemoteBridge, CODEC_JSON,
+                          RemoteBridgeError)
+from concon.HW_bridge_uniprot import Bridge, BridgeError
+from concon.simulator import UniprotSimulator
+
+from tests.models import numbered_model
+
+MODEL = numbered_model(10, step=10)
+
+
+class TestAgent(unittest.TestCase):
+    """Remote bridge against agent on loopback."""
+
+    protocol_version = 1
+
+    def setUp(self):
+        self.bridge = Bridge(0, 0, 700,
+                             transport=UniprotSimulator.from_model(MODEL),
+                             protocol_version=self.protocol_version)
+        self.agent = BridgeAgent(self.bridge, ('127.0.0.1', 0))
+        self.agent.start()
+        self.remote = RemoteBridge(self.agent.address, codec=CODEC_JSON)
+
+    def tearDown(self):
+        self.remote.close()
+        self.agent.shutdown()
+        self.bridge.close()
+
+    def test_metadata_and_settings(self):
+        self.assertEqual(self.remote.get_max_device_id(), 0)
+        self.assertEqual(self.remote.device_metadata[0].descriptor, "Dev")
+        self.assertEqual([s.out_value for s in self.remote.all_settings[0]],
+                         [i * 10 for i in range(10)])
+
+    def test_batch_is_one_round_trip(self):
+        results = self.remote.set_settings_to_device(
+            [(0, i, i + 1) for i in range(10)])
+        self.assertEqual(results, ["Success"] * 10)
+        settings = self.remote.get_settings_from_device(
+            [(0, i) for i in range(10)])
+        self.assertEqual([s.out_value for s in settings],
+                         [i + 1 for i in range(10)])
+        self.assertEqual(self.agent.batches, 2)
+        self.assertEqual(self.agent.operations, 20)
+
+    def test_errors(self):
+        with self.assertRaises(BridgeError):
+            self.remote.get_setting_from_device(0, 99)
+
+        results = self.remote.batch().get(0, 1).get(5, 0).info() \
+            .execute(raise_errors=False)
+        self.assertEqual(results[0].out_value, 10)
+        self.assertIsInstance(results[1], BridgeError)
+        self.assertEqual(results[2][0].descriptor, "Dev")
+
+        self.assertEqual(self.remote.call([['reboot']])[0][:2],
+                         [1, 'AgentProtocolError'])
+        with self.assertRaises(RemoteBridgeError):
+            self.remote.batch()._add(['reboot']).execute()
+
+
+class TestAgentWindowed(TestAgent):
+    """Consecutive reads are pipelined with protocol v2."""
+
+    protocol_version = 2
+
+
+if __name__ == '__main__':
+    unittest.main()
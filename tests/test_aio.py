@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.aio` module."""
+
+import asyncio
+import unittest
+
+from concon.aio import AsyncBridge
+from concon.simulator import UniprotSimulator
+
+from tests.models import numbered_model
+
+MODEL = numbered_model(20)
+
+
+class TestAsyncBridge(unittest.TestCase):
+    """AsyncBridge with simulated devices."""
+
+    @staticmethod
+    def _open():
+        return AsyncBridge.open(0, 0, 700,
+                                transport=UniprotSimulator.from_model(MODEL))
+
+    def test_get_set(self):
+        async def run():
+            async with await self._open() as bridge:
+                self.assertEqual(await bridge.set_setting(0, 5, 500),
+                                 "Success")
+                return (await bridge.get_setting(0, 5)).out_value
+
+        self.assertEqual(asyncio.run(run()), 500)
+
+    def test_iteration(self):
+        async def run():
+            async with await self._open() as bridge:
+                return [(cmd_id, setting.out_value) async for
+                        _, cmd_id, setting in bridge.settings(0)]
+
+        self.assertEqual(asyncio.run(run()), [(i, i) for i in range(20)])
+
+    def test_more_devices(self):
+        async def configure(value):
+            async with await self._open() as bridge:
+                await bridge.set_setting(0, 1, value)
+                return (await bridge.get_setting(0, 1)).out_value
+
+        async def run():
+            return await asyncio.gather(*[configure(i) for i in range(8)])
+
+        self.assertEqual(asyncio.run(run()), list(range(8)))
+
+
+if __name__ == '__main__':
+    unittest.main()
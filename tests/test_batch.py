@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.batch` module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from concon.batch import BatchRunner, BatchError, load_script, parse_script
+from concon.HW_bridge_uniprot import Bridge
+from concon.simulator import UniprotSimulator
+
+from tests.models import MODEL_FILE
+
+SCRIPT = """
+operations:
+    - set: "0:gain"
+      value: 7
+    - call: "0:{mode}Low power"
+    - wait: 0.01
+    - get: "0:mode"
+    - assert: "0:gain"
+      min: 5
+      max: 10
+    - assert: "0:offset"
+      min: 0
+    - get: "0:cutoff"
+"""
+
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.bridge = Bridge(0, 0, 700,
+                             transport=UniprotSimulator.from_model(MODEL_FILE),
+                             download_settings=False)
+        self.runner = BatchRunner(self.bridge)
+
+    def tearDown(self):
+        self.bridge.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def load(self, text):
+        file_name = os.path.join(self.tmp_dir, 'script.yml')
+        with open(file_name, 'w') as f:
+            f.write(text)
+        return load_script(file_name)
+
+    def test_run(self):
+        operations, stop_on_error = self.load(SCRIPT)
+        self.assertTrue(stop_on_error)
+        results = list(self.runner.run(operations, stop_on_error=False))
+
+        self.assertEqual([r['op'] for r in results],
+                         ['set', 'call', 'wait', 'get', 'assert', 'assert',
+                          'get'])
+        self.assertEqual(results[0]['value'], 7)
+        self.assertEqual(results[0]['code'], "Success")
+        self.assertEqual(results[3]['value'], 2)
+        self.assertTrue(results[4]['ok'])
+        self.assertFalse(results[5]['ok'])
+        self.assertIn("-20", results[5]['error'])
+        self.assertTrue(results[6]['ok'])
+        self.assertGreaterEqual(results[2]['elapsed'], 0.01)
+
+    def test_stop_on_error(self):
+        operations, _ = parse_script([{'assert': '0:offset', 'min': 0},
+                                      {'set': '0:gain', 'value': 8}])
+        results = list(self.runner.run(operations))
+        self.assertEqual([r['ok'] for r in results], [False, False])
+        self.assertEqual(results[1]['error'], "Skipped")
+        self.assertEqual(self.bridge.get_setting_from_device(0, 3).out_value,
+                         42)
+
+    def test_invalid_script(self):
+        with self.assertRaises(BatchError):
+            parse_script([{'get': 5}])
+        with self.assertRaises(BatchError):
+            parse_script([{'set': '0:gain'}])
+        with self.assertRaises(BatchError):
+            parse_script({'operations': [{'read': '0:gain'}]})
+        with self.assertRaises(BatchError):
+            parse_script([{'assert': '0:gain', 'min': 'a'}])
+
+        # Nothing is changed when any operation is invalid
+        operations, _ = parse_script([{'set': '0:gain', 'value': 8},
+                                      {'call': '0:gain'}])
+        with self.assertRaises(BatchError):
+            list(self.runner.run(operations))
+
+        # Output of function can not be compared
+        operations, _ = parse_script([{'set': '0:gain', 'value': 8},
+                                      {'assert': '0:{mode}Normal',
+                                       'min': 1}])
+        with self.assertRaises(BatchError):
+            list(self.runner.run(operations))
+        self.assertEqual(self.bridge.get_setting_from_device(0, 3).out_value,
+                         42)
+
+
+if __name__ == '__main__':
+    unittest.main()
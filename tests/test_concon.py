@@ -3,12 +3,24 @@
 
 """Tests for `concon` package."""
 
-
+import copy
+import os
+import shutil
+import tempfile
 import unittest
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 from click.testing import CliRunner
 
 from concon import cli
+from concon.simulator import UniprotSimulator
+from concon.usb_driver import UsbDevice
+
+from tests.models import GAIN_MODEL
 
 
 class TestConcon(unittest.TestCase):
@@ -32,3 +44,56 @@ class TestConcon(unittest.TestCase):
         help_result = runner.invoke(cli.main, ['--help'])
         assert help_result.exit_code == 0
         assert '--help  Show this message and exit.' in help_result.output
+
+
+class TestIdenticalDevices(unittest.TestCase):
+    """Two simulated devices with the same VID/PID."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.devices = [UsbDevice("Amp #{0:02}".format(i), 0x16d0, 0x0001,
+                                  0x100 + i) for i in range(2)]
+        self.simulators = {}
+        for i, device in enumerate(self.devices):
+            model = copy.deepcopy(GAIN_MODEL)
+            model['devices'][0]['settings'][0]['value'] = 10 + i
+            self.simulators[device.uid] = UniprotSimulator.from_model(model)
+
+        def usb_transport(vid, pid, timeout=None, uid=None, name=None):
+            return self.simulators[uid]
+
+        for target, kwargs in (
+                ('concon.bridge_config_parser.UsbTransport',
+                 {'side_effect': usb_transport}),
+                ('concon.cli.get_found_devices',
+                 {'return_value': self.devices})):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def invoke(self, *args):
+        socket_path = os.path.join(self.tmp_dir, 'concon.sock')
+        result = CliRunner().invoke(
+            cli.main, ['--socket', socket_path, '-d', '1'] + list(args))
+        self.assertEqual(result.exit_code, 0, result.output)
+        return result
+
+    def gain(self, uid):
+        return self.simulators[uid].handler.devices[0]['settings'][0][
+            'value']
+
+    def test_read_write_selected(self):
+        file_name = os.path.join(self.tmp_dir, 'config.cfg')
+        self.invoke('read', file_name)
+        with open(file_name) as f:
+            text = f.read()
+        self.assertIn("value = 11", text)
+
+        with open(file_name, 'w') as f:
+            f.write(text.replace("value = 11", "value = 33"))
+        self.invoke('write', file_name)
+        self.assertEqual(self.gain(0x101), 33)
+        self.assertEqual(self.gain(0x100), 10)
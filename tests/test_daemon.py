@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.daemon` module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from concon.bridge_config_parser import BridgeConfigParser
+from concon.daemon import ConConDaemon, DaemonClient, DaemonError
+from concon.agent import RemoteBridgeError
+from concon.simulator import UniprotSimulator
+
+from tests.models import GAIN_CUTOFF_MODEL as MODEL
+
+
+class Device(object):
+    name = "Simulated device"
+    vid = pid = 0
+
+
+@unittest.skipUnless(hasattr(os, 'getuid'), "Requires Unix sockets")
+class TestDaemon(unittest.TestCase):
+    """Daemon with simulated device."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.opened = 0
+
+        def open_parser(device):
+            self.opened += 1
+            return BridgeConfigParser(
+                0, 0, 700, transport=UniprotSimulator.from_model(MODEL))
+
+        self.path = os.path.join(self.tmp_dir, 'concon.sock')
+        self.daemon = ConConDaemon([Device()], 700, path=self.path,
+                                   parser_factory=open_parser)
+        self.daemon.start()
+        self.client = DaemonClient.connect_if_running(self.path)
+
+    def tearDown(self):
+        self.client.close()
+        self.daemon.shutdown()
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_file(self, file_name):
+        with open(file_name) as f:
+            return f.read()
+
+    def test_read_write(self):
+        self.assertEqual(self.client.list_devices(), ["Simulated device"])
+
+        file_name = os.path.join(self.tmp_dir, 'config.cfg')
+        self.client.read(None, file_name)
+        content = self._read_file(file_name)
+        self.assertIn("value = 42", content)
+
+        with open(file_name, 'w') as f:
+            f.write(content.replace("value = 42", "value = 7"))
+        self.client.write(0, file_name)
+
+        # Second export is served from the same opened device
+        self.client.read(0, file_name)
+        self.assertIn("value = 7", self._read_file(file_name))
+        self.assertIn("value = 1000.0", self._read_file(file_name))
+        self.assertEqual(self.opened, 1)
+
+    def test_invalid_device(self):
+        with self.assertRaises(RemoteBridgeError):
+            self.client.read(3, os.path.join(self.tmp_dir, 'config.cfg'))
+
+    def test_open_by_uid(self):
+        # Units with the same VID/PID are opened by their unique ID
+        units = [Device(), Device()]
+        path = os.path.join(self.tmp_dir, 'rack.sock')
+        daemon = ConConDaemon(units, 700, path=path)
+        try:
+            with mock.patch.object(BridgeConfigParser,
+                                   'from_usb_device') as from_usb_device:
+                daemon._open_parser(units[1])
+            from_usb_device.assert_called_once_with(units[1], 700)
+        finally:
+            daemon.shutdown()
+
+    def test_single_instance(self):
+        with self.assertRaises(DaemonError):
+            ConConDaemon([Device()], 700, path=self.path)
+
+    def test_not_running(self):
+        self.assertIsNone(DaemonClient.connect_if_running(
+            os.path.join(self.tmp_dir, 'missing.sock')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.fleet` module."""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from concon.bridge_config_parser import BridgeConfigParser
+from concon.fleet import (run_on_devices, device_file_name, format_results,
+                          format_bus_stats, BusScheduler)
+from concon.simulator import UniprotSimulator
+from concon.utils import ConConError
+
+from tests.models import GAIN_MODEL as MODEL
+
+
+class Device(object):
+    vid = pid = 0
+
+    def __init__(self, name, uid, bus=None, port_path=()):
+        self.name = name
+        self.uid = uid
+        self.bus = bus
+        self.port_path = port_path
+
+
+class TestRunOnDevices(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.devices = [Device("Amp {0}".format(i), 0x100 + i)
+                        for i in range(4)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read_all(self):
+        progress = []
+
+        def read(device, report):
+            parser = BridgeConfigParser(
+                0, 0, 700, transport=UniprotSimulator.from_model(MODEL))
+            try:
+                file_name = os.path.join(self.tmp_dir,
+                                         device_file_name(device))
+                parser.write_setting_to_cfg_file(file_name)
+                report("written")
+                return file_name
+            finally:
+                parser.close_device()
+
+        results = run_on_devices(
+            self.devices, read, max_workers=2,
+            on_progress=lambda index, device, msg: progress.append(
+                (index, msg)))
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual([result.device for result in results],
+                         self.devices)
+        self.assertEqual(len(set(result.value for result in results)), 4)
+        for result in results:
+            with open(result.value) as f:
+                self.assertIn("gain", f.read())
+        self.assertEqual(sorted(progress),
+                         sorted([(i, msg) for i in range(4)
+                                 for msg in ("written", "done")]))
+
+    def test_partial_failure(self):
+        def work(device, report):
+            if device.uid == 0x102:
+                raise ConConError("Device not found!")
+            return device.uid
+
+        results = run_on_devices(self.devices, work)
+        self.assertEqual([result.ok for result in results],
+                         [True, True, False, True])
+        self.assertEqual(results[0].value, 0x100)
+
+        lines = format_results(results)
+        self.assertTrue(lines[0].startswith("Dev#"))
+        self.assertIn("FAILED", lines[3])
+        self.assertIn("Device not found!", lines[-2])
+        self.assertEqual(lines[-1], "3 of 4 device(s) OK")
+
+    def test_bounded_pool(self):
+        lock = threading.Lock()
+        running = [0, 0]
+        barrier = threading.Event()
+
+        def work(device, report):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            barrier.wait(0.05)
+            with lock:
+                running[0] -= 1
+
+        run_on_devices(self.devices, work, max_workers=2)
+        self.assertEqual(running[1], 2)
+
+    def test_file_name(self):
+        self.assertEqual(device_file_name(Device("DSP / rev 2", 0x1fe)),
+                         "DSP_rev_2-1fe.cfg")
+
+
+class TestBusScheduler(unittest.TestCase):
+
+    def setUp(self):
+        # Bus 1: two hubs with 3 devices each, bus 2: 2 devices
+        self.devices = [Device("Amp", 0x100 + i, bus=1, port_path=(hub, i))
+                        for hub in (1, 2) for i in range(3)]
+        self.devices += [Device("Amp", 0x200 + i, bus=2, port_path=(i,))
+                         for i in range(2)]
+        self.lock = threading.Lock()
+        self.running = []
+        self.peaks = {}
+        # Hubs of bus 1 used whenever two devices of bus 1 are running
+        self.hub_sets = []
+
+    def work(self, device, report):
+        with self.lock:
+            self.running.append(device)
+            for bus in (1, 2):
+                count = sum(1 for d in self.running if d.bus == bus)
+                self.peaks[bus] = max(self.peaks.get(bus, 0), count)
+            hubs = [d.port_path[0] for d in self.running if d.bus == 1]
+            if len(hubs) == 2:
+                self.hub_sets.append(set(hubs))
+        time.sleep(0.02)
+        with self.lock:
+            self.running.remove(device)
+
+    def test_limit_per_bus(self):
+        scheduler = BusScheduler(max_workers=8, per_bus=2)
+        results = scheduler.run(self.devices, self.work)
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(self.peaks, {1: 2, 2: 2})
+        # The first two devices of bus 1 are spread over both hubs
+        self.assertEqual(self.hub_sets[0], set([1, 2]))
+
+        stats = scheduler.stats()
+        self.assertEqual([bus['bus'] for bus in stats], [1, 2])
+        self.assertEqual([bus['devices'] for bus in stats], [6, 2])
+        self.assertEqual(stats[0]['max_concurrent'], 2)
+        self.assertGreater(stats[0]['devices_per_minute'], 0)
+        lines = format_bus_stats(stats)
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith("1 "))
+
+    def test_unknown_bus_not_limited(self):
+        devices = [Device("Amp", i) for i in range(4)]
+        scheduler = BusScheduler(max_workers=4, per_bus=1)
+        results = scheduler.run(devices, lambda device, report: None)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(scheduler.stats()[0]['bus'], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.hotplug` module."""
+
+import threading
+import unittest
+
+from concon.bridge_config_parser import BridgeConfigParser
+from concon.hotplug import DeviceRegistry, parse_uevent, uevent_product
+from concon.simulator import UniprotSimulator
+from concon.usb_driver import UsbDevice
+
+from tests.models import GAIN_MODEL as MODEL
+
+
+class FakeSupportedDevices(object):
+    """ Connected devices are changed by test."""
+
+    def __init__(self):
+        self.connected = []
+
+    def is_supported(self, vid, pid):
+        return True
+
+    def get_connected_devices(self, max_age=None):
+        return list(self.connected)
+
+
+class TestUevent(unittest.TestCase):
+
+    def test_parse(self):
+        event = parse_uevent(
+            b'add@/devices/pci0000:00/usb1/1-2\0ACTION=add\0'
+            b'DEVPATH=/devices/pci0000:00/usb1/1-2\0SUBSYSTEM=usb\0'
+            b'DEVTYPE=usb_device\0PRODUCT=16d0/1/100\0BUSNUM=001\0')
+        self.assertEqual(event['ACTION'], 'add')
+        self.assertEqual(uevent_product(event), (0x16d0, 0x0001))
+
+        event['DEVTYPE'] = 'usb_interface'
+        self.assertIsNone(uevent_product(event))
+
+
+class TestDeviceRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.supported = FakeSupportedDevices()
+        self.events = []
+        self.ready = threading.Event()
+
+        def on_event(event, device):
+            self.events.append((event, device.name))
+            if event == 'ready':
+                self.ready.set()
+
+        def open_parser(device):
+            return BridgeConfigParser(
+                0, 0, 700, transport=UniprotSimulator.from_model(MODEL))
+
+        self.registry = DeviceRegistry(self.supported, 700, prefetch=True,
+                                       opener=open_parser,
+                                       poll_interval=0.01,
+                                       use_uevents=False)
+        self.registry.subscribe(on_event)
+
+    def tearDown(self):
+        self.registry.stop()
+
+    def test_prefetch(self):
+        amp = UsbDevice("Amp", 0x16d0, 0x0001, 1)
+        self.supported.connected.append(amp)
+        self.registry.start()
+        self.assertEqual(self.registry.method, "polling")
+        self.assertEqual(self.registry.devices(), [amp])
+
+        self.assertTrue(self.ready.wait(5))
+        self.assertTrue(self.registry.is_ready(amp))
+        parser = self.registry.take_parser(amp)
+        try:
+            self.assertEqual(parser.find_setting(0, "gain").out_value, 42)
+        finally:
+            parser.close_device()
+        self.assertFalse(self.registry.is_ready(amp))
+
+        self.supported.connected.remove(amp)
+        self.registry.rescan()
+        self.assertEqual(self.registry.devices(), [])
+        self.assertEqual(self.events, [('add', "Amp"), ('ready', "Amp"),
+                                       ('remove', "Amp")])
+
+    def test_hotplug(self):
+        self.registry.start()
+        self.assertEqual(self.registry.devices(), [])
+
+        codec = UsbDevice("Codec", 0x03eb, 0x204f, 2)
+        self.supported.connected.append(codec)
+        self.assertTrue(self.ready.wait(5))
+        self.assertEqual(self.registry.devices(), [codec])
+        self.assertEqual(self.events[0], ('add', "Codec"))
+
+
+if __name__ == '__main__':
+    unittest.main()
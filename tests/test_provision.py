@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.provision` module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from concon.bridge_config_parser import BridgeConfigParser
+from concon.provision import provision, provision_device
+from concon.simulator import UniprotSimulator
+
+from tests.models import GAIN_CUTOFF_MODEL as MODEL
+
+CRASHING_UID = 0x102
+
+
+class Device(object):
+    vid = pid = 0
+
+    def __init__(self, name, uid):
+        self.name = name
+        self.uid = uid
+
+
+def open_simulator(spec, timeout):
+    return BridgeConfigParser(0, 0, timeout,
+                              transport=UniprotSimulator.from_model(MODEL))
+
+
+def open_or_crash(spec, timeout):
+    if spec['uid'] == CRASHING_UID:
+        # Misbehaving driver takes whole process down
+        os._exit(1)
+    return open_simulator(spec, timeout)
+
+
+class TestProvision(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.tmp_dir, 'golden.cfg')
+        parser = open_simulator(None, 700)
+        try:
+            parser.write_setting_to_cfg_file(self.file_name)
+        finally:
+            parser.close_device()
+
+        with open(self.file_name) as f:
+            content = f.read()
+        with open(self.file_name, 'w') as f:
+            f.write(content.replace("value = 42", "value = 7"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_provision_device(self):
+        spec = {'index': 0, 'name': "Amp", 'uid': 0x100}
+        result = provision_device(spec, self.file_name, 700,
+                                  opener=open_simulator)
+        self.assertTrue(result['ok'], result['errors'])
+        self.assertEqual(result['changed'], 1)
+        self.assertEqual(result['uid'], 0x100)
+        self.assertEqual(len(result['serial']), 1)
+        self.assertEqual(sorted(result['timings']),
+                         ['connect', 'diff', 'total', 'verify', 'write'])
+
+    def test_missing_file(self):
+        spec = {'index': 0, 'name': "Amp", 'uid': 0x100}
+        result = provision_device(spec, self.file_name + ".missing", 700,
+                                  opener=open_simulator)
+        self.assertFalse(result['ok'])
+        self.assertTrue(result['errors'][0].startswith("diff:"))
+
+    def test_crashed_worker(self):
+        devices = [Device("Amp {0}".format(i), 0x100 + i) for i in range(4)]
+        results = list(provision(devices, self.file_name, 700,
+                                 max_workers=2, opener=open_or_crash))
+
+        self.assertEqual(sorted(result['index'] for result in results),
+                         [0, 1, 2, 3])
+        for result in results:
+            if result['uid'] == CRASHING_UID:
+                self.assertFalse(result['ok'])
+                self.assertTrue(result['errors'][0].startswith("worker:"))
+            else:
+                self.assertTrue(result['ok'], result['errors'])
+
+
+if __name__ == '__main__':
+    unittest.main()
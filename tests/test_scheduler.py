@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.scheduler` module."""
+
+import threading
+import time
+import unittest
+
+from concon.HW_bridge_uniprot import Bridge
+from concon.scheduler import RequestScheduler
+from concon.simulator import UniprotSimulator
+
+from tests.models import numbered_model
+
+
+class TestRequestScheduler(unittest.TestCase):
+    """Order in which waiting requests get the device."""
+
+    def _start_waiter(self, scheduler, priority, order):
+        def wait():
+            with scheduler.slot(priority):
+                order.append(priority)
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        # Wait until thread is queued
+        while scheduler.waiting(priority) == 0:
+            time.sleep(0.001)
+        return thread
+
+    def _run(self, scheduler, priorities, delay=0.0):
+        order = []
+        scheduler.acquire()
+        threads = []
+        for priority in priorities:
+            threads.append(self._start_waiter(scheduler, priority, order))
+            time.sleep(delay)
+        scheduler.release()
+        for thread in threads:
+            thread.join()
+        return order
+
+    def test_priority_order(self):
+        order = self._run(RequestScheduler(), [RequestScheduler.BULK,
+                                               RequestScheduler.NORMAL,
+                                               RequestScheduler.INTERACTIVE])
+        self.assertEqual(order, [RequestScheduler.INTERACTIVE,
+                                 RequestScheduler.NORMAL,
+                                 RequestScheduler.BULK])
+
+    def test_aging(self):
+        order = self._run(RequestScheduler(aging=0.05),
+                          [RequestScheduler.BULK,
+                           RequestScheduler.INTERACTIVE], delay=0.1)
+        self.assertEqual(order, [RequestScheduler.BULK,
+                                 RequestScheduler.INTERACTIVE])
+
+    def test_aged_after_interactive(self):
+        # Aged request does not overtake older interactive one
+        order = self._run(RequestScheduler(aging=0.05),
+                          [RequestScheduler.INTERACTIVE,
+                           RequestScheduler.BULK], delay=0.1)
+        self.assertEqual(order, [RequestScheduler.INTERACTIVE,
+                                 RequestScheduler.BULK])
+
+    def test_reentrant(self):
+        scheduler = RequestScheduler()
+        with scheduler.slot():
+            with scheduler.slot(RequestScheduler.BULK):
+                pass
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics['normal']['count'], 1)
+        self.assertEqual(metrics['bulk']['count'], 0)
+
+    def test_thread_priority(self):
+        scheduler = RequestScheduler()
+        with scheduler.priority(RequestScheduler.INTERACTIVE):
+            self.assertEqual(scheduler.current_priority,
+                             RequestScheduler.INTERACTIVE)
+        self.assertEqual(scheduler.current_priority, RequestScheduler.NORMAL)
+
+
+class TestBridgeScheduling(unittest.TestCase):
+    """Interactive request during full download of settings."""
+
+    MODEL = numbered_model(100)
+
+    def _check(self, protocol_version):
+        bridge = Bridge(0, 0, 700, protocol_version=protocol_version,
+                        transport=UniprotSimulator.from_model(
+                            self.MODEL, processing_delay=0.002))
+
+        def load_settings():
+            with bridge.scheduler.priority(RequestScheduler.BULK):
+                bridge.load_settings()
+
+        download = threading.Thread(target=load_settings)
+        download.start()
+        time.sleep(0.02)
+
+        with bridge.scheduler.priority(RequestScheduler.INTERACTIVE):
+            value = bridge.get_setting_from_device(0, 99).out_value
+        interactive_done = download.is_alive()
+        download.join()
+        bridge.close()
+
+        self.assertEqual(value, 99)
+        self.assertTrue(interactive_done)
+        metrics = bridge.scheduler.metrics()
+        self.assertGreater(metrics['bulk']['count'], 0)
+        self.assertLess(metrics['interactive']['max_wait'], 0.1)
+
+    def test_v1(self):
+        self._check(1)
+
+    def test_v2(self):
+        self._check(2)
+
+
+if __name__ == '__main__':
+    unittest.main()
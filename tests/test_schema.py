@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.schema` module (settings accessed by name)."""
+
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from concon.HW_bridge_uniprot import Bridge
+from concon.schema import (SettingResolver, SchemaCache, SettingNotFound,
+                           SettingValueError, parse_value, format_value,
+                           schema_key)
+from concon.simulator import UniprotSimulator
+
+from tests.models import MODEL_FILE
+
+
+class TestSettingResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = SchemaCache(self.tmp_dir)
+        self.bridge = Bridge(0, 0, 700,
+                             transport=UniprotSimulator.from_model(MODEL_FILE),
+                             download_settings=False)
+        patcher = mock.patch.object(
+            self.bridge, 'get_setting_from_device',
+            wraps=self.bridge.get_setting_from_device)
+        self.requests = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.bridge.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_metadata_only(self):
+        self.assertEqual(self.bridge.all_settings, [])
+        self.assertEqual(self.requests.call_count, 0)
+
+    def test_without_cache(self):
+        resolver = SettingResolver(self.bridge)
+        cmd_id, setting = resolver.resolve(0, "gain")
+        self.assertEqual((cmd_id, setting.out_value), (3, 42))
+        # Scan stopped at the setting
+        self.assertEqual(self.requests.call_count, 4)
+
+        self.assertEqual(resolver.resolve(0, "4")[1].name, "offset")
+        with self.assertRaises(SettingNotFound):
+            resolver.resolve(0, "volume")
+        with self.assertRaises(SettingNotFound):
+            resolver.resolve(1, "gain")
+
+    def test_cached_schema(self):
+        SettingResolver(self.bridge, self.cache).resolve(0, "gain")
+        self.assertEqual(self.requests.call_count, 6)
+        names = self.cache.load(schema_key(self.bridge, 0))
+        self.assertEqual(names['cutoff'], 5)
+
+        # Next time only requested setting is asked
+        self.requests.reset_mock()
+        cmd_id, setting = SettingResolver(self.bridge, self.cache).resolve(
+            0, "cutoff")
+        self.assertEqual(cmd_id, 5)
+        self.assertEqual(format_value(setting), "1000.0")
+        self.assertEqual(self.requests.call_count, 1)
+
+    def test_outdated_schema(self):
+        key = schema_key(self.bridge, 0)
+        self.cache.store(key, {'gain': 4})
+        cmd_id, _ = SettingResolver(self.bridge, self.cache).resolve(0, "gain")
+        self.assertEqual(cmd_id, 3)
+        self.assertEqual(self.cache.load(key)['gain'], 3)
+
+    def test_set_setting(self):
+        resolver = SettingResolver(self.bridge)
+        cmd_id, setting = resolver.resolve(0, "offset")
+        self.requests.reset_mock()
+        self.assertEqual(self.bridge.set_setting_to_device(
+            0, cmd_id, parse_value(setting, "-100")), "Success")
+        self.assertEqual(self.bridge.get_setting(0, cmd_id).out_value, -100)
+        # Resolved setting is known, only value is read back
+        self.assertEqual(self.requests.call_count, 1)
+
+
+class TestParseValue(unittest.TestCase):
+
+    def setUp(self):
+        bridge = Bridge(0, 0, 700,
+                        transport=UniprotSimulator.from_model(MODEL_FILE))
+        self.settings = dict((s.name, s) for s in bridge.all_settings[0])
+        bridge.close()
+
+    def test_types(self):
+        self.assertEqual(parse_value(self.settings['gain'], "7"), 7)
+        self.assertEqual(parse_value(self.settings['offset'], "-5"), -5)
+        self.assertEqual(parse_value(self.settings['cutoff'], "50.5"), 50.5)
+        self.assertEqual(parse_value(self.settings['mode'], "2"), 2)
+
+    def test_integer_base(self):
+        self.assertEqual(parse_value(self.settings['gain'], "08"), 8)
+        self.assertEqual(parse_value(self.settings['gain'], "010"), 10)
+        self.assertEqual(parse_value(self.settings['offset'], "-010"), -10)
+        self.assertEqual(parse_value(self.settings['gain'], "0x10"), 16)
+        self.assertEqual(parse_value(self.settings['gain'], "0o17"), 15)
+        self.assertEqual(parse_value(self.settings['gain'], "0b101"), 5)
+        self.assertEqual(parse_value(self.settings['offset'], "-0x10"), -16)
+
+    def test_invalid(self):
+        with self.assertRaises(SettingValueError):
+            parse_value(self.settings['gain'], "loud")
+        with self.assertRaises(SettingValueError):
+            parse_value(self.settings['gain'], "101")
+        with self.assertRaises(SettingValueError):
+            parse_value(self.settings['mode'], "3")
+
+
+if __name__ == '__main__':
+    unittest.main()
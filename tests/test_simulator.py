@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.simulator` module (HW bridge without hardware)."""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import yaml
+
+from concon.HW_bridge_uniprot import Bridge, BridgeError
+from concon.simulator import UniprotSimulator
+from concon.transport import monotonic
+
+from tests.models import MODEL_FILE
+
+
+class TestBridgeSimulator(unittest.TestCase):
+    """Tests for Bridge talking to simulated firmware."""
+
+    def test_download_settings(self):
+        bridge = Bridge(0, 0, 700,
+                        transport=UniprotSimulator.from_model(MODEL_FILE))
+        self.assertEqual(bridge.get_max_device_id(), 0)
+        self.assertEqual(bridge.device_metadata[0].descriptor,
+                         "Simulated amplifier")
+
+        settings = dict((s.name, s) for s in bridge.all_settings[0])
+        self.assertEqual(settings['gain'].out_value, 42)
+        self.assertEqual(settings['offset'].in_min, -500)
+        self.assertEqual(settings['offset'].out_value, -20)
+        self.assertAlmostEqual(settings['cutoff'].out_value, 1000.0)
+        bridge.close()
+
+    def test_set_setting(self):
+        device = UniprotSimulator.from_model(MODEL_FILE)
+        bridge = Bridge(0, 0, 700, transport=device)
+
+        self.assertEqual(bridge.set_setting_to_device(0, 4, -100), "Success")
+        self.assertEqual(bridge.all_settings[0][4].out_value, -100)
+
+        # Out of range
+        with self.assertRaises(BridgeError):
+            bridge.set_setting_to_device(0, 3, 101)
+
+        # Select group item
+        bridge.set_setting_to_device(0, 2)
+        self.assertEqual(device.handler.devices[0]['settings'][0]['value'], 2)
+
+    def test_json_model_and_protocol_v2(self):
+        with open(MODEL_FILE) as f:
+            model = yaml.safe_load(f)
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            model_file = os.path.join(tmp_dir, 'model.json')
+            with open(model_file, 'w') as f:
+                json.dump(model, f)
+
+            device = UniprotSimulator.from_model(model_file)
+            bridge = Bridge(0, 0, 700, transport=device, protocol_version=2)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        self.assertTrue(bridge.windowed)
+        self.assertEqual([s.name for s in bridge.all_settings[0]],
+                         [s['name'] for s in model['devices'][0]['settings']])
+
+    def test_processing_delay_respects_deadline(self):
+        device = UniprotSimulator(processing_delay=0.05)
+        device.open()
+        # Request frame has same format as response
+        for report in device._build_response([1]):
+            device.write_report(report)
+        # Status of the request is sent immediately
+        self.assertIsNotNone(device.read_report(monotonic()))
+
+        start = time.time()
+        self.assertIsNone(device.read_report(monotonic() + 0.01))
+        self.assertIsNotNone(device.read_report(monotonic() + 1))
+        self.assertGreaterEqual(time.time() - start, 0.04)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.supported_devices` module."""
+
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from concon.supported_devices import SupportedDevices
+from concon.usb_driver import UsbDriver, UsbDevice
+
+# (name, vid, pid, uid) of connected USB devices
+CONNECTED = [("Amp", 0x16d0, 0x0001, 1),
+             ("Bootloader", 0x16d0, 0x0002, 2),
+             ("Keyboard", 0x046d, 0xc31c, 3),
+             ("Codec", 0x03eb, 0x204f, 4)]
+
+
+def list_devices(vid=None, match=None):
+    return [UsbDevice(*dev) for dev in CONNECTED
+            if match is None or match(dev[1], dev[2])]
+
+
+class TestSupportedDevices(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(UsbDriver, 'usb_list_devices',
+                                    side_effect=list_devices)
+        self.list_devices = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.supported = SupportedDevices(supported_vids=[0x16d0, 0x03eb],
+                                          ignored_pids=[0x0002])
+
+    def test_single_pass(self):
+        names = [dev.name for dev in self.supported.get_connected_devices()]
+        self.assertEqual(names, ["Amp", "Codec"])
+        self.assertEqual(self.list_devices.call_count, 1)
+
+    def test_cache(self):
+        self.supported.get_connected_devices()
+        self.assertTrue(self.supported.is_connected(UsbDevice(*CONNECTED[0])))
+        self.assertFalse(
+            self.supported.is_connected(UsbDevice(*CONNECTED[2])))
+        self.assertEqual(self.list_devices.call_count, 1)
+
+        self.supported.get_connected_devices(max_age=0)
+        self.assertEqual(self.list_devices.call_count, 2)
+
+        self.supported.invalidate()
+        self.supported.get_connected_devices()
+        self.assertEqual(self.list_devices.call_count, 3)
+
+    def test_no_supported_vids(self):
+        self.assertEqual(SupportedDevices().get_connected_devices(), [])
+        self.assertEqual(self.list_devices.call_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.transport` package."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from concon.crc16_xmodem import crc_xmodem_update
+from concon.HW_bridge_uniprot import Bridge
+from concon.simulator import UniprotSimulator, SimulatorStreamServer
+from concon.transport import (Transport, TransportException,
+                              available_transports, create_transport,
+                              get_transport_class, register_transport)
+from concon.transport.faults import FaultInjectionTransport
+from concon.transport.replay import (RecordingTransport, ReplayTransport,
+                                     ReplayDiverged, TraceReader, DIR_OPEN,
+                                     DIR_RX, DIR_TX)
+from concon.transport.stream import ReportFramer, SerialTransport
+from concon.transport.usb import UsbTransport
+from concon.uniprot import Uniprot
+
+from tests.models import numbered_model
+
+
+class LoopbackTransport(Transport):
+    """ Sends every written report back."""
+
+    def __init__(self):
+        Transport.__init__(self)
+        self.reports = []
+        self._open = False
+
+    @property
+    def is_open(self):
+        return self._open
+
+    def open(self):
+        self._open = True
+
+    def close(self):
+        self._open = False
+
+    def write_report(self, report):
+        self.reports.append(list(report))
+
+    def read_report(self, deadline=None):
+        return self.reports.pop(0) if self.reports else None
+
+
+class TestTransportRegistry(unittest.TestCase):
+    """Tests for transport registry."""
+
+    def test_builtin_transports(self):
+        self.assertIn('usb', available_transports())
+        self.assertIn('simulator', available_transports())
+        self.assertIs(get_transport_class('usb'), UsbTransport)
+        self.assertIs(get_transport_class('simulator'), UniprotSimulator)
+
+    def test_unknown_transport(self):
+        with self.assertRaises(TransportException):
+            get_transport_class('carrier pigeon')
+
+    def test_register_transport(self):
+        register_transport('loopback', LoopbackTransport)
+        transport = create_transport('loopback')
+        self.assertIsInstance(transport, LoopbackTransport)
+
+        with transport:
+            self.assertTrue(transport.is_open)
+            transport.write_report([1] * transport.report_size)
+            self.assertEqual(transport.read_report(), [1] * 8)
+            self.assertIsNone(transport.read_report())
+        self.assertFalse(transport.is_open)
+
+    def test_uniprot_over_registered_transport(self):
+        transport = create_transport('simulator')
+        self.assertIn(Transport.CAP_SIMULATED, transport.capabilities)
+
+        uniprot = Uniprot(0, 0, transport=transport)
+        uniprot.config_tx_packet(3)
+        uniprot.config_rx_packet(3)
+        uniprot.usb_tx_data([1, 2, 3])
+        self.assertEqual(uniprot.usb_rx_data(), [1, 2, 3])
+        uniprot.close()
+        self.assertFalse(transport.is_open)
+
+
+class TestRecordReplay(unittest.TestCase):
+    """Tests for recording and replaying of sessions."""
+
+    MODEL = {'devices': [{'descriptor': "Dev", 'serial': 3, 'settings': [
+        {'name': 'gain', 'in_type': 'uint8', 'in_max': 100, 'value': 5},
+        {'name': 'offset', 'in_type': 'int8', 'in_min': -10, 'in_max': 10,
+         'value': -1}]}]}
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.trace_file = os.path.join(self.tmp_dir, 'session.cct')
+
+        transport = RecordingTransport(
+            UniprotSimulator.from_model(self.MODEL), self.trace_file)
+        bridge = Bridge(0, 0, 700, transport=transport)
+        bridge.set_setting_to_device(0, 1, 7)
+        bridge.close()
+        transport.finish()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_trace_content(self):
+        trace = TraceReader(self.trace_file)
+        directions = [record[1] for record in trace]
+        self.assertEqual(directions[0], DIR_OPEN)
+        self.assertIn(DIR_TX, directions)
+        self.assertIn(DIR_RX, directions)
+        # Header character of the first request
+        self.assertEqual(trace[1][2][0], Uniprot.UNI_CHAR_HEADER)
+        trace.close()
+
+    def test_replay_session(self):
+        for timing in (False, True):
+            transport = ReplayTransport(self.trace_file, timing=timing,
+                                        speed=10.0)
+            bridge = Bridge(0, 0, 700, transport=transport)
+            self.assertEqual(bridge.set_setting_to_device(0, 1, 7), "Success")
+            self.assertEqual(bridge.all_settings[0][1].out_value, 7)
+            bridge.close()
+            self.assertTrue(transport.finished)
+
+    def test_replay_diverged(self):
+        bridge = Bridge(0, 0, 700,
+                        transport=ReplayTransport(self.trace_file))
+        with self.assertRaises(ReplayDiverged):
+            bridge._uniprot._transport.write_report([0] * 8)
+
+
+class TestFaultInjection(unittest.TestCase):
+    """Tests for recovery from injected faults."""
+
+    MODEL = numbered_model(20, step=10)
+
+    def _download(self, seed, **faults):
+        transport = FaultInjectionTransport(
+            UniprotSimulator.from_model(self.MODEL), seed=seed, **faults)
+        bridge = Bridge(0, 0, 700, transport=transport)
+        values = [s.out_value for s in bridge.all_settings[0]]
+        bridge.close()
+        return values, transport.injected
+
+    def test_recovery(self):
+        expected = [i * 10 for i in range(20)]
+        for fault in ('drop', 'corrupt', 'duplicate'):
+            values, injected = self._download(seed=3, **{fault: 0.02})
+            self.assertEqual(values, expected)
+            self.assertGreater(injected[fault], 0)
+
+    def test_seed_is_deterministic(self):
+        self.assertEqual(self._download(seed=5, corrupt=0.02)[1],
+                         self._download(seed=5, corrupt=0.02)[1])
+
+
+class TestStreamTransport(unittest.TestCase):
+    """Tests for Uniprot over byte stream."""
+
+    # v1 frame: H, length 1, D, data, T, CRC
+    FRAME = [ord('H'), 0, 1, ord('D'), 5, ord('T'), 0x35, 0x0F]
+
+    def test_framer_resync(self):
+        framer = ReportFramer()
+        framer.feed(bytes(bytearray([0x00, 0x13, 0x7F] + self.FRAME)))
+        self.assertEqual(framer.next_report(), self.FRAME)
+        self.assertEqual(framer.dropped_bytes, 3)
+        self.assertIsNone(framer.next_report())
+
+    def test_framer_waits_for_whole_report(self):
+        framer = ReportFramer()
+        framer.feed(bytes(bytearray(self.FRAME[:5])))
+        self.assertIsNone(framer.next_report())
+        framer.feed(bytes(bytearray(self.FRAME[5:])))
+        self.assertEqual(framer.next_report(), self.FRAME)
+
+    def test_framer_v2_length_looks_like_v1(self):
+        # LEN_L of 68 Bytes is 'D' -> header is valid v1 header too
+        payload = list(range(68))
+        frame = [ord('H'), 0, 0, len(payload), ord('D')] + payload + \
+            [ord('T')]
+        crc16 = 0
+        for i_byte in frame:
+            crc16 = crc_xmodem_update(crc16, i_byte)
+        frame += [crc16 >> 8, crc16 & 0xFF]
+        frame += [0xFF] * (-len(frame) % 8)
+
+        framer = ReportFramer()
+        framer.feed(bytes(bytearray([0x13] + frame[:40])))
+        # Not decided until whole frame is received
+        self.assertIsNone(framer.next_report())
+        framer.feed(bytes(bytearray(frame[40:])))
+        reports = []
+        while True:
+            report = framer.next_report()
+            if report is None:
+                break
+            reports.append(report)
+        self.assertEqual(sum(reports, []), frame)
+        self.assertEqual(framer.dropped_bytes, 1)
+
+    @unittest.skipUnless(hasattr(os, 'openpty'), "Requires pseudo-terminal")
+    def test_bridge_over_pty(self):
+        self._bridge_over_pty()
+
+    @unittest.skipUnless(hasattr(os, 'openpty'), "Requires pseudo-terminal")
+    def test_bridge_over_pty_delayed(self):
+        # Responses are ready later than host stops writing
+        self._bridge_over_pty(processing_delay=0.002)
+
+    def _bridge_over_pty(self, **kwargs):
+        master, slave = os.openpty()
+        server = SimulatorStreamServer(
+            UniprotSimulator.from_model(TestFaultInjection.MODEL, **kwargs),
+            master)
+        server.start()
+        try:
+            for version in (1, 2):
+                transport = SerialTransport(os.ttyname(slave))
+                bridge = Bridge(0, 0, 700, transport=transport,
+                                protocol_version=version)
+                self.assertEqual([s.out_value for s in bridge.all_settings[0]],
+                                 [i * 10 for i in range(20)])
+                bridge.close()
+        finally:
+            server.stop()
+            os.close(slave)
+            os.close(master)
+
+
+if __name__ == '__main__':
+    unittest.main()
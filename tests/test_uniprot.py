@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.uniprot` module (with simulated device)."""
+
+import threading
+import time
+import unittest
+
+from concon.HW_bridge_uniprot import Bridge
+from concon.uniprot import Uniprot
+from concon.simulator import UniprotSimulator
+
+from tests.models import numbered_model
+
+
+class LossySimulator(UniprotSimulator):
+    """ Simulator which corrupts first response with given sequence number.
+    """
+
+    def __init__(self, lost_seq, **kwargs):
+        UniprotSimulator.__init__(self, **kwargs)
+        self.lost_seq = lost_seq
+        self.lost = 0
+
+    def _queue_reports(self, reports):
+        first = reports[0]
+        if (not self.lost and self.version >= Uniprot.UNI_PROTOCOL_V2 and
+                first[0] == Uniprot.UNI_CHAR_HEADER and
+                first[1] == self.lost_seq):
+            self.lost += 1
+            reports = [list(r) for r in reports]
+            reports[-1][-1] ^= 0xFF
+        UniprotSimulator._queue_reports(self, reports)
+
+
+class TestUniprot(unittest.TestCase):
+    """Tests for Uniprot framing against in-process simulator."""
+
+    PAYLOADS = [[i, i + 1, i + 2] * (i + 1) for i in range(10)]
+
+    def test_v1_transfer(self):
+        self._transfer_v1(Uniprot(0, 0, transport=UniprotSimulator()))
+
+    def test_v2_window_keeps_order(self):
+        uniprot = Uniprot(0, 0, transport=UniprotSimulator(),
+                          protocol_version=Uniprot.UNI_PROTOCOL_V2)
+        self.assertEqual(uniprot.protocol_version, Uniprot.UNI_PROTOCOL_V2)
+        self.assertEqual(uniprot.window, Uniprot.UNI_DEFAULT_WINDOW)
+
+        responses = list(uniprot.usb_transfer_window(self.PAYLOADS))
+        self.assertEqual(responses, self.PAYLOADS)
+
+    def test_window_limited_by_device(self):
+        uniprot = Uniprot(0, 0, transport=UniprotSimulator(max_window=2),
+                          protocol_version=Uniprot.UNI_PROTOCOL_V2, window=8)
+        self.assertEqual(uniprot.window, 2)
+        self.assertEqual(list(uniprot.usb_transfer_window(self.PAYLOADS)),
+                         self.PAYLOADS)
+
+    def test_fallback_to_v1(self):
+        uniprot = Uniprot(0, 0, transport=UniprotSimulator(max_version=1),
+                          protocol_version=Uniprot.UNI_PROTOCOL_V2)
+        self.assertEqual(uniprot.protocol_version, Uniprot.UNI_PROTOCOL_V1)
+        self.assertEqual(list(uniprot.usb_transfer_window(self.PAYLOADS)),
+                         self.PAYLOADS)
+
+    def test_v2_retransmits_corrupted_response(self):
+        device = LossySimulator(lost_seq=2)
+        uniprot = Uniprot(0, 0, transport=device,
+                          protocol_version=Uniprot.UNI_PROTOCOL_V2)
+
+        self.assertEqual(list(uniprot.usb_transfer_window(self.PAYLOADS)),
+                         self.PAYLOADS)
+        self.assertEqual(device.lost, 1)
+
+    def _transfer_v1(self, uniprot):
+        uniprot.config_rx_packet(64)
+        for payload in self.PAYLOADS:
+            uniprot.config_tx_packet(len(payload))
+            uniprot.usb_tx_data(payload)
+            self.assertEqual(uniprot.usb_rx_data(), payload)
+
+    def test_piggyback_ack(self):
+        device = UniprotSimulator(features=Uniprot.UNI_FEATURE_PIGGYBACK_ACK)
+        uniprot = Uniprot(0, 0, transport=device,
+                          features=Uniprot.UNI_FEATURE_PIGGYBACK_ACK)
+        self.assertTrue(uniprot.piggyback_ack)
+        device.rx_reports = 0
+        self._transfer_v1(uniprot)
+        piggybacked_reports = device.rx_reports
+
+        # Last response is acknowledged explicitly
+        self.assertEqual(device.acknowledged, len(self.PAYLOADS) - 1)
+        uniprot.flush_ack()
+        self.assertEqual(device.acknowledged, len(self.PAYLOADS))
+
+        device = UniprotSimulator()
+        uniprot = Uniprot(0, 0, transport=device)
+        self._transfer_v1(uniprot)
+        # One ACK report per response saved
+        self.assertEqual(device.rx_reports - piggybacked_reports,
+                         len(self.PAYLOADS))
+
+    def test_piggyback_ack_idle_timer(self):
+        device = UniprotSimulator(features=Uniprot.UNI_FEATURE_PIGGYBACK_ACK)
+        uniprot = Uniprot(0, 0, transport=device,
+                          features=Uniprot.UNI_FEATURE_PIGGYBACK_ACK,
+                          ack_idle_timeout=0.01)
+        self._transfer_v1(uniprot)
+        time.sleep(0.2)
+        self.assertEqual(device.acknowledged, len(self.PAYLOADS))
+
+    def test_piggyback_ack_one_timer(self):
+        uniprot = Uniprot(0, 0, transport=UniprotSimulator(
+            features=Uniprot.UNI_FEATURE_PIGGYBACK_ACK),
+            features=Uniprot.UNI_FEATURE_PIGGYBACK_ACK, ack_idle_timeout=10)
+        uniprot._defer_ack()
+        first = uniprot._ack_timer
+        uniprot._defer_ack()
+        first.join(1)
+        self.assertFalse(first.is_alive())
+        self.assertIsNot(uniprot._ack_timer, first)
+        uniprot.close()
+
+    def test_piggyback_ack_not_supported(self):
+        uniprot = Uniprot(0, 0, transport=UniprotSimulator(),
+                          features=Uniprot.UNI_FEATURE_PIGGYBACK_ACK)
+        self.assertFalse(uniprot.piggyback_ack)
+        self._transfer_v1(uniprot)
+
+
+class TestSharedDevice(unittest.TestCase):
+    """More threads using one opened device."""
+
+    MODEL = numbered_model(8, step=0)
+
+    def test_transaction_config_per_thread(self):
+        uniprot = Uniprot(0, 0, transport=UniprotSimulator())
+        uniprot.config_rx_packet(100)
+
+        def configure():
+            uniprot.config_rx_packet(3)
+
+        thread = threading.Thread(target=configure)
+        thread.start()
+        thread.join()
+        self.assertEqual(
+            uniprot._transaction.packet_config.i_rx_max_num_of_data_bytes,
+            100)
+        self.assertEqual(uniprot.transfer([1, 2, 3], 100), [1, 2, 3])
+
+    def _hammer(self, **kwargs):
+        bridge = Bridge(0, 0, 700, transport=UniprotSimulator.from_model(
+            self.MODEL), **kwargs)
+        errors = []
+
+        def worker(cmd_id):
+            try:
+                for value in range(1, 21):
+                    bridge.set_setting_to_device(0, cmd_id, value)
+                    if bridge.get_setting_from_device(
+                            0, cmd_id).out_value != value:
+                        errors.append((cmd_id, value))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(cmd_id,))
+                   for cmd_id in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        values = [s.out_value for s in bridge.all_settings[0]]
+        bridge.close()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(values, [20] * 8)
+
+    def test_threads_v1(self):
+        self._hammer()
+
+    def test_threads_piggyback_ack(self):
+        self._hammer(piggyback_ack=True)
+
+    def test_threads_v2(self):
+        self._hammer(protocol_version=Uniprot.UNI_PROTOCOL_V2)
+
+
+if __name__ == '__main__':
+    unittest.main()
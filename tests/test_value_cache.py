@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.value_cache` module."""
+
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from concon.HW_bridge_uniprot import Bridge
+from concon.simulator import UniprotSimulator
+from concon.value_cache import ValueCache
+from concon.write_behind import WriteBehindQueue
+
+from tests.models import OUTPUT_MODEL as MODEL
+
+GAIN, TEMPERATURE, CALIBRATE = 0, 1, 2
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestValueCache(unittest.TestCase):
+
+    def setUp(self):
+        self.device = UniprotSimulator.from_model(MODEL)
+        self.bridge = Bridge(0, 0, 700, transport=self.device,
+                             download_settings=False)
+        patcher = mock.patch.object(
+            self.bridge, 'get_setting_from_device',
+            wraps=self.bridge.get_setting_from_device)
+        self.requests = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = Clock()
+        self.cache = ValueCache(self.bridge, output_ttl=1.0, config_ttl=None,
+                                clock=self.clock)
+
+    def tearDown(self):
+        self.bridge.close()
+
+    def set_temperature(self, value):
+        self.device.handler.devices[0]['settings'][TEMPERATURE]['value'] = \
+            value
+
+    def test_ttl_per_type(self):
+        for _ in range(5):
+            self.assertEqual(self.cache.get_value(0, GAIN), 42)
+            self.assertEqual(self.cache.get_value(0, TEMPERATURE), 25)
+        self.assertEqual(self.requests.call_count, 2)
+
+        # Output expires, configuration does not
+        self.set_temperature(30)
+        self.clock.now = 1.0
+        self.assertEqual(self.cache.get_value(0, TEMPERATURE), 30)
+        self.assertEqual(self.cache.get_value(0, GAIN), 42)
+        self.assertEqual(self.requests.call_count, 3)
+
+        self.assertEqual(self.cache.get_value(0, GAIN, max_age=0), 42)
+        self.assertEqual(self.requests.call_count, 4)
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (9, 4))
+        self.assertEqual(stats['entries'], 2)
+
+    def test_ttl_per_setting(self):
+        self.cache.ttl[(0, TEMPERATURE)] = 0
+        self.cache.get_value(0, TEMPERATURE)
+        self.cache.get_value(0, TEMPERATURE)
+        self.assertEqual(self.requests.call_count, 2)
+
+    def test_write_updates_cache(self):
+        self.cache.get_value(0, GAIN)
+        self.assertEqual(self.cache.set_setting_to_device(0, GAIN, 7),
+                         "Success")
+        self.requests.reset_mock()
+        self.assertEqual(self.cache.get_value(0, GAIN), 7)
+        self.assertEqual(self.requests.call_count, 0)
+
+        # Function call invalidates outputs
+        self.cache.get_value(0, TEMPERATURE)
+        self.set_temperature(30)
+        self.cache.set_setting_to_device(0, CALIBRATE)
+        self.assertEqual(self.cache.get_value(0, TEMPERATURE), 30)
+
+        self.cache.invalidate(0)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_write_during_read(self):
+        read = Bridge.get_setting_from_device.__get__(self.bridge)
+
+        def write_meanwhile(did, cmd_id):
+            setting = read(did, cmd_id)
+            self.requests.side_effect = None
+            self.cache.set_setting_to_device(did, cmd_id, 7)
+            return setting
+
+        # Value read before the write must not replace written one
+        self.requests.side_effect = write_meanwhile
+        self.assertEqual(self.cache.get_value(0, GAIN), 42)
+        self.requests.reset_mock()
+        self.assertEqual(self.cache.get_value(0, GAIN), 7)
+        self.assertEqual(self.requests.call_count, 0)
+
+        def invalidate_meanwhile(did, cmd_id):
+            setting = read(did, cmd_id)
+            self.requests.side_effect = None
+            self.cache.invalidate(did)
+            return setting
+
+        self.requests.side_effect = invalidate_meanwhile
+        self.cache.get_value(0, TEMPERATURE)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_write_behind(self):
+        writer = WriteBehindQueue(self.cache)
+        writer.set(0, GAIN, 9)
+        writer.close()
+        self.requests.reset_mock()
+        self.assertEqual(self.cache.get_value(0, GAIN), 9)
+        self.assertEqual(self.requests.call_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
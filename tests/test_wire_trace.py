@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.wire_trace` module."""
+
+import os
+import tempfile
+import unittest
+
+from concon.wire_trace import WireTrace
+
+
+class TestWireTrace(unittest.TestCase):
+    """Tests for the raw report ring buffer."""
+
+    def test_records_in_order(self):
+        trace = WireTrace(4)
+        trace.record(WireTrace.DIR_TX, [1, 2, 3])
+        trace.record(WireTrace.DIR_RX, [4, 5, 6])
+
+        records = trace.records()
+        self.assertEqual(len(trace), 2)
+        self.assertEqual([r[1] for r in records],
+                         [WireTrace.DIR_TX, WireTrace.DIR_RX])
+        self.assertEqual(records[1][2], (4, 5, 6))
+
+    def test_ring_overwrites_oldest(self):
+        trace = WireTrace(3)
+        for i in range(5):
+            trace.record(WireTrace.DIR_TX, [i])
+
+        self.assertEqual(len(trace), 3)
+        self.assertEqual(trace.dropped, 2)
+        self.assertEqual([r[2][0] for r in trace.records()], [2, 3, 4])
+
+    def test_record_copies_buffer(self):
+        trace = WireTrace(2)
+        buffer_tx = [0x48, 0x00]
+        trace.record(WireTrace.DIR_TX, buffer_tx)
+        buffer_tx[0] = 0xFF
+
+        self.assertEqual(trace.records()[0][2], (0x48, 0x00))
+
+    def test_dump(self):
+        trace = WireTrace(2)
+        trace.record(WireTrace.DIR_RX, [0x41, 0xFF0])
+
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.assertEqual(trace.dump(filename), 1)
+            with open(filename) as f:
+                lines = f.read().splitlines()
+        finally:
+            os.remove(filename)
+
+        self.assertTrue(lines[0].startswith('#'))
+        self.assertTrue(lines[1].endswith('RX 41 --'))
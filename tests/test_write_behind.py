@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `concon.write_behind` module."""
+
+import threading
+import unittest
+
+from concon.HW_bridge_uniprot import Bridge
+from concon.simulator import UniprotSimulator
+from concon.write_behind import WriteBehindQueue, WriteBehindError
+
+from tests.models import MODEL_FILE
+
+GAIN, OFFSET = 3, 4
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = Bridge(0, 0, 700, transport=UniprotSimulator.from_model(
+            MODEL_FILE, processing_delay=0.005))
+        self.written = []
+        self.writer = WriteBehindQueue(
+            self.bridge,
+            on_written=lambda did, cmd_id, value, code: self.written.append(
+                (cmd_id, value)))
+
+    def tearDown(self):
+        self.writer.close(flush=False)
+        self.bridge.close()
+
+    def test_latest_value_written(self):
+        for value in range(50):
+            self.writer.set(0, GAIN, value)
+            self.writer.set(0, OFFSET, -value)
+        self.assertTrue(self.writer.flush(5))
+
+        self.assertEqual(self.bridge.get_setting_from_device(0, GAIN)
+                         .out_value, 49)
+        self.assertEqual(self.bridge.get_setting_from_device(0, OFFSET)
+                         .out_value, -49)
+        # Intermediate values were dropped
+        stats = self.writer.stats()
+        self.assertEqual(stats['submitted'], 100)
+        self.assertEqual(stats['pending'], 0)
+        self.assertLess(stats['written'], 100)
+        self.assertEqual(stats['written'] + stats['coalesced'], 100)
+        self.assertEqual(self.written[-2:], [(GAIN, 49), (OFFSET, -49)])
+
+    def test_failure_reported_by_flush(self):
+        self.writer.set(0, GAIN, 101)  # out of range
+        self.writer.set(0, OFFSET, 10)
+        with self.assertRaises(WriteBehindError) as cm:
+            self.writer.flush(5)
+        self.assertEqual([f[:3] for f in cm.exception.failures],
+                         [(0, GAIN, 101)])
+        self.assertEqual(self.written, [(OFFSET, 10)])
+        # Failures are reported once
+        self.assertTrue(self.writer.flush(5))
+
+    def test_close_reports_dropped(self):
+        release = threading.Event()
+        self.writer.on_written = lambda *args: release.wait(5)
+        self.writer.set(0, GAIN, 1)
+        self.writer.set(0, OFFSET, 2)
+        # Background thread is blocked after the first write
+        self.assertFalse(self.writer.flush(0.2))
+
+        closer = threading.Timer(0.1, release.set)
+        closer.start()
+        with self.assertRaises(WriteBehindError) as cm:
+            self.writer.close(timeout=0)
+        closer.join()
+        self.assertEqual(cm.exception.failures,
+                         [(0, OFFSET, 2, "Dropped")])
+        self.assertEqual(self.bridge.get_setting_from_device(0, OFFSET)
+                         .out_value, -20)
+
+    def test_closed(self):
+        self.writer.close()
+        with self.assertRaises(WriteBehindError):
+            self.writer.set(0, GAIN, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()